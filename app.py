@@ -1,11 +1,22 @@
+import uuid
+
 import streamlit as st
-import tensorflow as tf
-import numpy as np
-from PIL import Image
-import json
-from tensorflow.keras.preprocessing import image
-from tensorflow.keras.applications.resnet import preprocess_input
-import google.generativeai as genai
+
+# TensorFlow and the Gemini SDK are imported lazily (model_loader.py,
+# gemini_client.py) so pages that don't need them render immediately
+from chat_service import get_chat, session_context
+from chat_stream import format_metrics, mark_interrupted, stream_reply
+from gemini_client import GeminiUnavailable
+import config
+from batching import DynamicBatcher, QueueFull
+from breed_store import open_breed_index
+from history_store import MemoryBudget, SessionHistory, open_history_store
+from image_ingest import ImageTooLarge, ingest
+from model_loader import ModelLoader
+from prediction_cache import PredictionCache, image_key, model_fingerprint
+from similar_images import ImageIndex, match_prediction
+import tracing
+from tracing import span, traced
 
 
 # ------------------------------------------------------
@@ -17,6 +28,10 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Stage timings for this rerun (no-ops unless PAWDENTIFY_TRACING is set)
+tracing.setup_exporters()
+previous_trace = tracing.begin_rerun(st.session_state, "app")
+
 
 # Initialize theme in session state
 if "theme" not in st.session_state:
@@ -56,7 +71,7 @@ def get_theme_colors():
 colors = get_theme_colors()
 
 # Apply dynamic CSS styling
-st.markdown(f"""
+THEME_CSS = f"""
     <style>
     * {{
         margin: 0;
@@ -194,7 +209,9 @@ st.markdown(f"""
         font-weight: 700;
     }}
     </style>
-""", unsafe_allow_html=True)
+"""
+with span("css"):
+    st.markdown(THEME_CSS, unsafe_allow_html=True)
 
 
 # DARK/LIGHT THEME SWITCH
@@ -210,144 +227,402 @@ with st.sidebar:
 # ------------------------------------------------------
 # GEMINI AI CONFIG
 # ------------------------------------------------------
-genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-gemini = genai.GenerativeModel("gemini-2.0-flash")
+# Shared with pages/1_chatbot.py, including the response cache. Built on
+# first use; the SDK itself is only imported for the first question.
+def get_gemini():
+    return get_chat(st.secrets["GEMINI_API_KEY"])
 
 
 # ------------------------------------------------------
 # LOAD MODEL + DATA
 # ------------------------------------------------------
+# Started once per process; the model loads in the background while the
+# first page renders, and only the Breed Detector waits for it
 @st.cache_resource
-def load_model():
-    return tf.keras.models.load_model("dog_breed_resnet.keras")
-
-model = load_model()
-
-
-@st.cache_data
-def load_labels():
-    with open("class_indices.json") as f:
-        classes = json.load(f)
-    # Extract just the breed names (remove ImageNet ID prefix like 'n02085620-')
-    label_dict = {}
-    for k, v in classes.items():
-        # Remove the ImageNet ID prefix (everything before the dash)
-        breed_name = k.split('-', 1)[1] if '-' in k else k
-        label_dict[int(v)] = breed_name
-    return label_dict
-
-label_map = load_labels()
-
-
-@st.cache_data
-def load_info():
-    with open("120_breeds_new.json", "r") as f:
-        data = json.load(f)
-    # Create mappings for different name formats
-    breed_dict = {}
-    for item in data:
-        breed_name = item["Breed"].strip()
-        # Add original breed name
-        breed_dict[breed_name] = item
-        # Add alternative formats for matching
-        breed_dict[breed_name.lower()] = item
-        breed_dict[breed_name.replace("_", " ")] = item
-        breed_dict[breed_name.replace("_", " ").lower()] = item
-    return breed_dict
-
-breed_info = load_info()
-
-
-@st.cache_data
-def load_diet_plans():
-    with open("120_diet_plans.json", "r") as f:
-        data = json.load(f)
-    # Create a dictionary indexed by breed name (lowercase)
-    diet_dict = {}
-    for item in data:
-        breed_name = item["name"].strip().lower()
-        diet_dict[breed_name] = item.get("diet_plan", {})
-    return diet_dict
-
-diet_plans = load_diet_plans()
-
-
-# Create a mapping from model labels to breed info
-def normalize_breed_name(breed):
-    """Normalize breed name for matching with JSON data"""
-    breed = breed.strip()
-    
-    # First, try to find exact match (case-insensitive)
-    for key in breed_info.keys():
-        if key.lower() == breed.lower():
-            return key
-    
-    # Try with underscores/spaces normalization
-    breed_normalized = breed.lower().replace(" ", "_").replace("-", "_")
-    for key in breed_info.keys():
-        key_normalized = key.lower().replace(" ", "_").replace("-", "_")
-        if key_normalized == breed_normalized:
-            return key
-    
-    # If no match found, return original (will return None in get_breed_details)
-    return None
+def start_model_loader():
+    prefetch = () if config.GEMINI_BASE_URL else ("google.generativeai",)
+    return ModelLoader(prefetch_modules=prefetch).start()
+
+model_loader = start_model_loader()
+
+
+def wait_for_model():
+    """Show a warming-up notice until the model is loaded, then return it"""
+    if not model_loader.done:
+        notice = st.empty()
+        while not model_loader.wait(0.25):
+            notice.info(f"🔥 Model warming up... ({model_loader.elapsed():.0f} s)")
+        notice.empty()
+    if model_loader.error is not None:
+        st.error(f"❌ The breed model failed to load: {model_loader.error}")
+        st.stop()
+    return model_loader.model
+
+
+def model_version():
+    model = model_loader.get()
+    return f"{model.name}:{model_fingerprint(model.path)}"
+
+
+# Shared by every session so a re-rendered or re-uploaded image never
+# goes back through the network
+@st.cache_resource
+def load_prediction_cache():
+    return PredictionCache(
+        max_entries=config.PREDICTION_CACHE_SIZE,
+        disk_dir=config.PREDICTION_CACHE_DIR,
+    )
+
+prediction_cache = load_prediction_cache()
+
+
+# Label -> breed details -> diet plan, compiled into breed_data.sqlite and
+# opened read-only; records are decoded per breed on first use
+@st.cache_resource
+def load_breed_index():
+    return open_breed_index()
+
+breed_index = load_breed_index()
+label_map = breed_index.label_map
 
 
 # ------------------------------------------------------
 # PREDICT BREED
 # ------------------------------------------------------
-def predict_breed(img):
-    img = img.resize((224, 224))
-    arr = image.img_to_array(img)
-    arr = np.expand_dims(arr, 0)
-    arr = preprocess_input(arr)
+# One batcher per process: images from every session share forward passes
+# instead of each rerun calling the model on its own
+@st.cache_resource
+def get_scheduler():
+    model = model_loader.get()
+    return DynamicBatcher(
+        model.predict_with_embeddings if model.embedding_dim else model.predict,
+        config.BATCH_MAX_SIZE,
+        config.BATCH_MAX_WAIT_MS,
+        config.BATCH_MAX_QUEUE,
+    )
+
+
+# Near-duplicate signatures and embeddings of every image classified in
+# this process (memory-mapped under EMBEDDING_INDEX_DIR when set)
+@st.cache_resource
+def get_image_index():
+    return ImageIndex(
+        config.EMBEDDING_INDEX_DIR,
+        config.EMBEDDING_INDEX_SIZE,
+        model_version(),
+        model_loader.get().embedding_dim,
+        config.EMBEDDING_DIM,
+        config.NEAR_DUPLICATE_SIMILARITY,
+    )
+
+
+def predict_breeds(images, keys):
+    """Classify several PIL images, batched with other sessions' requests.
+
+    Near-copies of earlier uploads reuse their prediction without a
+    forward pass; everything else is indexed for the similar-dogs panel.
+    Returns the predictions and the set of positions that were near-copies.
+    """
+    import inference
+
+    if not images:
+        return [], set()
+    model = model_loader.get()
+    index = get_image_index()
+    with span("preprocess"):
+        pixels = inference.stack_pixels(images)
+    with span("near_duplicate"):
+        matches = index.find_duplicates(pixels)
+    results = [None] * len(images)
+    near_copies = set()
+    for i, match in enumerate(matches):
+        if match is not None:
+            near_copies.add(i)
+            results[i] = match_prediction(match)
+            index.add_duplicate(keys[i], pixels[i], match)
+
+    todo = [i for i, r in enumerate(results) if r is None]
+    if todo:
+        with span("preprocess"):
+            batch = inference.preprocess_pixels(pixels[todo], model.input_dtype)
+        with span("predict"):
+            outputs = get_scheduler().predict_many(batch, config.INFERENCE_TIMEOUT_S)
+        probs, embeddings = outputs if isinstance(outputs, tuple) else (outputs, None)
+        fresh = inference.decode_predictions(probs, label_map, config.PREDICTION_TOP_K)
+        with span("index"):
+            index.add([keys[i] for i in todo], pixels[todo], fresh, embeddings)
+        for i, r in zip(todo, fresh):
+            results[i] = r
+    return results, near_copies
+
+
+BUSY_MESSAGE = "⏳ The detector is busy with other users' photos right now. Please try again in a moment."
+
+
+def upload_key(uploaded):
+    """Content hash of an uploaded file, shared by the prediction cache and history"""
+    return image_key(uploaded.getvalue(), model_version())
+
+
+@traced("decode")
+def ingest_upload(uploaded):
+    """Decode an upload once into the model input and a display preview"""
+    return ingest(uploaded.getvalue())
+
+
+def predict_breed_cached(img, key):
+    """Predict for an upload_key(), reusing earlier results for the same image"""
+    return predict_breeds_cached([img], [key])[0]
+
+
+def predict_breeds_cached(images, keys):
+    """Batch version of predict_breed_cached: only cache misses reach the model"""
+    with span("cache"):
+        results = [prediction_cache.get(key) for key in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        fresh, near_copies = predict_breeds([images[i] for i in missing], [keys[i] for i in missing])
+        for j, (i, r) in enumerate(zip(missing, fresh)):
+            # A near-copy's result belongs to the other image; only caching
+            # this image's own forward pass keeps a false match from sticking
+            if j not in near_copies:
+                prediction_cache.put(keys[i], r)
+            results[i] = r
+    return results
+
+
+# ------------------------------------------------------
+# HISTORY
+# ------------------------------------------------------
+@st.cache_resource
+def load_history_budget():
+    return MemoryBudget(config.HISTORY_MEMORY_BUDGET_MB * 2**20)
+
+
+@st.cache_resource
+def get_history_store():
+    return open_history_store(config.HISTORY_DB, config.HISTORY_DB_MAX_ENTRIES)
+
+
+def history_owner():
+    """Stable id for this browser's saved history, kept in the page URL"""
+    owner = st.query_params.get("history")
+    if not owner:
+        owner = uuid.uuid4().hex
+        st.query_params["history"] = owner
+    return owner
+
+
+def get_history():
+    if "history" not in st.session_state:
+        st.session_state.history = SessionHistory(
+            max_entries=config.HISTORY_MAX_ENTRIES,
+            budget=load_history_budget(),
+            thumbnail_size=config.HISTORY_THUMBNAIL_SIZE,
+            store=get_history_store(),
+            owner=history_owner(),
+        )
+    return st.session_state.history
+
+
+# ------------------------------------------------------
+# VIDEO + CAMERA
+# ------------------------------------------------------
+def predict_probabilities(images):
+    """Probability rows for PIL frames, through the shared batcher"""
+    import inference
+
+    batch = inference.preprocess_images(images, model_loader.get().input_dtype)
+    outputs = get_scheduler().predict_many(batch, config.INFERENCE_TIMEOUT_S)
+    return outputs[0] if isinstance(outputs, tuple) else outputs
+
+
+def render_video_call(breed, conf, majority, agreement, frames):
+    stable = breed == majority
+    st.markdown(f"""
+        <div class='success-box'>
+            <h3>🎯 {'Detected Breed' if stable else 'Best Guess So Far'}</h3>
+            <h2 style='color: #667eea; margin: 10px 0;'>{breed}</h2>
+            <p><b>Smoothed confidence:</b> {conf:.2f}%</p>
+            <p><b>Top breed in {agreement:.0%} of {frames} frames</b>{'' if stable else f' (majority: {majority})'}</p>
+        </div>
+    """, unsafe_allow_html=True)
+
+
+def render_video_detector():
+    import video
+
+    col1, col2 = st.columns([0.5, 0.5])
+    with col1:
+        clip = st.file_uploader("🎞️ Upload a short video clip", type=list(video.VIDEO_TYPES))
+    with col2:
+        snapshot = st.camera_input("📷 Or take webcam snapshots")
+
+    if clip is None and snapshot is None:
+        if not model_loader.done:
+            st.info("🔥 Model warming up - pick a clip now and it will be analyzed as soon as the model is ready.")
+        return
+    wait_for_model()
+
+    if clip is not None:
+        with st.spinner("🎞️ Analyzing video..."), span("video"):
+            try:
+                result = video.classify_clip(clip.getvalue(), predict_probabilities, label_map)
+            except (QueueFull, TimeoutError):
+                st.error(BUSY_MESSAGE)
+                return
+            except (ValueError, OSError) as e:
+                st.error(f"❌ Could not read this video: {e}")
+                return
+        if result.breed is None:
+            st.warning("⚠️ No frames could be read from this clip.")
+            return
+        render_video_call(result.breed, result.confidence, result.majority,
+                          result.agreement, result.frames_classified)
+        st.caption(
+            f"{result.frames_decoded} frames decoded, {result.frames_classified} classified "
+            f"({result.skipped_similar} near-identical and {result.skipped_rate} over the "
+            f"{config.VIDEO_MAX_FPS:g} fps limit skipped) at {result.fps:.0f} frames/s"
+        )
+        st.line_chart(
+            {"confidence %": [conf for _, _, conf in result.timeline]},
+            height=160,
+        )
+        st.session_state.detected_breed = (result.breed, result.confidence)
+
+    if snapshot is not None:
+        # Every new snapshot is one more frame for this session's smoother
+        smoother = st.session_state.setdefault("camera_smoother", video.TemporalSmoother(config.VIDEO_EMA_ALPHA))
+        key = upload_key(snapshot)
+        if st.session_state.get("camera_last") != key:
+            try:
+                ingested = ingest_upload(snapshot)
+                smoother.update(predict_probabilities([ingested.model_input]))
+            except (QueueFull, TimeoutError):
+                st.error(BUSY_MESSAGE)
+                return
+            except (ValueError, OSError) as e:
+                st.error(f"❌ Could not read this snapshot: {e}")
+                return
+            st.session_state.camera_last = key
+        breed, conf, majority, agreement = smoother.call(label_map)
+        render_video_call(breed, conf, majority, agreement, smoother.frames)
+        if st.button("🔄 Start over with a new dog"):
+            del st.session_state["camera_smoother"]
+            st.rerun()
+        st.session_state.detected_breed = (breed, conf)
+
+
+# ------------------------------------------------------
+# RUNNERS-UP
+# ------------------------------------------------------
+# Top-1 leads below this (0-1) are flagged as a close call
+CLOSE_CALL_MARGIN = 0.2
+
+
+def runners_up_line(runners_up):
+    """Compact "Also: ..." line for result cards"""
+    if not runners_up:
+        return ""
+    return "<p><small>Also: " + ", ".join(f"{b} {c:.0f}%" for b, c in runners_up) + "</small></p>"
+
+
+def render_runners_up(prediction):
+    rows = "".join(
+        f"<p><b>{breed}</b> - {conf:.2f}%</p>" for breed, conf in prediction.runners_up
+    )
+    hint = ""
+    if prediction.margin is not None and prediction.margin < CLOSE_CALL_MARGIN:
+        hint = "<p>🤔 Close call - this could be a mix or one of the breeds above.</p>"
+    st.markdown(f"""
+        <div class='info-box'>
+            <h4>🥈 Runner-up Breeds</h4>
+            {rows}
+            {hint}
+        </div>
+    """, unsafe_allow_html=True)
+
 
-    pred = model.predict(arr)
-    idx = int(np.argmax(pred))
-    breed = label_map[idx].strip()
-    conf = float(np.max(pred) * 100)
-    return breed, conf
+# ------------------------------------------------------
+# SIMILAR DOGS
+# ------------------------------------------------------
+def render_similar_dogs(key):
+    """Earlier dogs closest to this upload in the model's embedding space"""
+    with span("similar"):
+        matches = get_image_index().similar_to(key, config.SIMILAR_DOGS)
+    if not matches:
+        return
+    # Thumbnails are only kept for this session's own uploads
+    thumbnails = {h.key: h.thumbnail for h in get_history()}
+    st.markdown("#### 🐕 Similar dogs seen before")
+    for col, m in zip(st.columns(config.SIMILAR_DOGS), matches):
+        with col:
+            if m.key in thumbnails:
+                st.image(thumbnails[m.key], use_column_width=True)
+            st.markdown(f"""
+                <div class='breed-card'>
+                    <h4>🐶 {m.breed}</h4>
+                    <p>{m.similarity:.0%} similar</p>
+                </div>
+            """, unsafe_allow_html=True)
 
 
 # ------------------------------------------------------
 # BREED DETAILS - ENHANCED
 # ------------------------------------------------------
 def get_breed_details(breed):
-    normalized_breed = normalize_breed_name(breed)
-    if normalized_breed and normalized_breed in breed_info:
-        return breed_info[normalized_breed]
-    return None
+    return breed_index.details_for(breed)
 
 
 # ------------------------------------------------------
 # CHATBOT PAGE LOGIC
 # ------------------------------------------------------
+def user_bubble(text):
+    return f"""
+        <div style='text-align: right; margin: 15px 0;'>
+            <span style='background: #667eea; color: white; padding: 10px 15px; border-radius: 10px; display: inline-block;'>
+            👤 {text}
+            </span>
+        </div>
+    """
+
+
+def bot_bubble(text):
+    return f"""
+        <div style='text-align: left; margin: 15px 0;'>
+            <span style='background: #e3f2fd; color: #333; padding: 10px 15px; border-radius: 10px; display: inline-block; border-left: 3px solid #667eea;'>
+            🤖 {text}
+            </span>
+        </div>
+    """
+
+
 def chatbot_page():
     st.title("🤖 Dog AI Chatbot")
 
     if "chat" not in st.session_state:
         st.session_state.chat = []
 
+    # A reply still marked as streaming was cut off by Stop or a page change
+    mark_interrupted(st.session_state.chat, "msg")
+    gemini = get_gemini()
+    context = session_context(st.session_state, "chat_context", gemini)
+
     # Display chat history with better styling
     chat_container = st.container()
     with chat_container:
         for m in st.session_state.chat:
             if m["role"] == "user":
-                st.markdown(f"""
-                    <div style='text-align: right; margin: 15px 0;'>
-                        <span style='background: #667eea; color: white; padding: 10px 15px; border-radius: 10px; display: inline-block;'>
-                        👤 {m['msg']}
-                        </span>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(user_bubble(m['msg']), unsafe_allow_html=True)
             else:
-                st.markdown(f"""
-                    <div style='text-align: left; margin: 15px 0;'>
-                        <span style='background: #e3f2fd; color: #333; padding: 10px 15px; border-radius: 10px; display: inline-block; border-left: 3px solid #667eea;'>
-                        🤖 {m['msg']}
-                        </span>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(bot_bubble(m['msg']), unsafe_allow_html=True)
+                if m.get("stopped"):
+                    st.caption("⏹ Stopped")
+                elif m.get("metrics"):
+                    st.caption(format_metrics(m["metrics"]))
+
+        # The next reply streams in here
+        live_reply = st.empty()
 
     # Input section
     st.markdown("---")
@@ -359,10 +634,31 @@ def chatbot_page():
 
     if send_clicked and user_msg.strip():
         st.session_state.chat.append({"role": "user", "msg": user_msg})
+        bot_msg = {"role": "bot", "msg": "", "streaming": True}
+        st.session_state.chat.append(bot_msg)
+
+        with live_reply.container():
+            st.markdown(user_bubble(user_msg), unsafe_allow_html=True)
+            bubble = st.empty()
+            bubble.markdown(bot_bubble("Thinking..."), unsafe_allow_html=True)
+            # Clicking Stop reruns the page, which interrupts the stream
+            st.button("⏹ Stop", key="stop_stream")
+
+        def show(text):
+            bot_msg["msg"] = text
+            bubble.markdown(bot_bubble(text + " ▌"), unsafe_allow_html=True)
+
         try:
-            reply = gemini.generate_content(user_msg).text
-            st.session_state.chat.append({"role": "bot", "msg": reply})
+            with span("gemini"):
+                reply, metrics = stream_reply(gemini.stream(user_msg, context), show)
+            tracing.tracer.record("gemini_first_token", metrics["ttft_ms"] / 1000)
+            bot_msg.update(msg=reply, streaming=False, metrics=metrics)
+            context.add_turn(user_msg, reply)
+        except GeminiUnavailable as e:
+            st.session_state.chat.remove(bot_msg)
+            st.warning(str(e))
         except Exception as e:
+            st.session_state.chat.remove(bot_msg)
             st.error(f"Error: {str(e)}")
         st.rerun()
 
@@ -373,6 +669,7 @@ def chatbot_page():
 st.sidebar.markdown("---")
 st.sidebar.title("📋 Navigation")
 page = st.sidebar.radio("Select Page", ["🏠 Home", "🐶 Breed Detector", "📜 History", "💬 Chatbot"], label_visibility="collapsed")
+tracing.label_rerun(st.session_state, page)
 
 
 # ------------------------------------------------------
@@ -464,11 +761,74 @@ elif page == "🐶 Breed Detector":
         </div>
     """, unsafe_allow_html=True)
 
+    video_mode = st.checkbox("🎥 Video clip or webcam")
+    batch_mode = not video_mode and st.checkbox("🗂️ Classify multiple images at once")
+
     col1, col2 = st.columns([0.5, 0.5])
     
     with col1:
-        uploaded = st.file_uploader("📤 Upload a dog image", type=["jpg", "jpeg", "png", "webp"])
+        if video_mode:
+            uploaded, uploads = None, []
+        elif batch_mode:
+            uploaded = None
+            uploads = st.file_uploader(
+                "📤 Upload dog images",
+                type=["jpg", "jpeg", "png", "webp"],
+                accept_multiple_files=True,
+            )
+        else:
+            uploads = []
+            uploaded = st.file_uploader("📤 Upload a dog image", type=["jpg", "jpeg", "png", "webp"])
+
+    if video_mode:
+        render_video_detector()
+    elif uploads or uploaded:
+        wait_for_model()
+    elif not model_loader.done:
+        st.info("🔥 Model warming up - pick an image now and it will be analyzed as soon as the model is ready.")
     
+    if uploads:
+        ingested, accepted = [], []
+        for f in uploads:
+            try:
+                ingested.append(ingest_upload(f))
+                accepted.append(f)
+            except (ImageTooLarge, OSError) as e:
+                st.warning(f"⚠️ Skipped {f.name}: {e}")
+        uploads = accepted
+        images = [i.preview for i in ingested]
+        keys = [upload_key(f) for f in uploads]
+        with st.spinner(f"🔍 Analyzing {len(images)} images..."):
+            try:
+                results = predict_breeds_cached([i.model_input for i in ingested], keys)
+            except (QueueFull, TimeoutError):
+                st.error(BUSY_MESSAGE)
+                st.stop()
+
+        history = get_history()
+        with span("history"):
+            for key, img, prediction in zip(keys, images, results):
+                breed, conf = prediction
+                history.add(key, img, breed, conf, prediction.runners_up)
+
+        # Results grid
+        grid_cols = 4
+        for start in range(0, len(images), grid_cols):
+            cols = st.columns(grid_cols)
+            for col, f, img, prediction in zip(
+                cols, uploads[start:], images[start:start + grid_cols], results[start:]
+            ):
+                breed, conf = prediction
+                with col:
+                    st.image(img, use_column_width=True, caption=f.name)
+                    st.markdown(f"""
+                        <div class='success-box'>
+                            <h4>🐶 {breed}</h4>
+                            <p><b>Confidence:</b> {conf:.2f}%</p>
+                            {runners_up_line(prediction.runners_up)}
+                        </div>
+                    """, unsafe_allow_html=True)
+
     if uploaded:
         with col2:
             st.write("")
@@ -477,14 +837,26 @@ elif page == "🐶 Breed Detector":
         
         col1, col2 = st.columns([0.5, 0.5])
         
+        try:
+            ingested = ingest_upload(uploaded)
+        except (ImageTooLarge, OSError) as e:
+            st.error(f"❌ Could not read this image: {e}")
+            st.stop()
+        img = ingested.preview
+
         with col1:
-            img = Image.open(uploaded).convert("RGB")
             st.image(img, use_column_width=True, caption="Uploaded Image")
         
         with col2:
             st.write("")
+            key = upload_key(uploaded)
             with st.spinner("🔍 Analyzing image..."):
-                breed, conf = predict_breed(img)
+                try:
+                    prediction = predict_breed_cached(ingested.model_input, key)
+                except (QueueFull, TimeoutError):
+                    st.error(BUSY_MESSAGE)
+                    st.stop()
+            breed, conf = prediction
             
             # Display results in styled boxes
             st.markdown(f"""
@@ -500,12 +872,18 @@ elif page == "🐶 Breed Detector":
                     <h3 style='color: #667eea;'>{conf:.2f}%</h3>
                 </div>
             """, unsafe_allow_html=True)
+
+            if prediction.runners_up:
+                render_runners_up(prediction)
             
-            # Save to history
-            if "history" not in st.session_state:
-                st.session_state.history = []
-            
-            st.session_state.history.append({"image": img, "breed": breed, "conf": conf})
+            # Save to history (reruns of the same upload only refresh its entry)
+            with span("history"):
+                get_history().add(key, img, breed, conf, prediction.runners_up)
+            # The chatbot answers follow-up questions about this dog
+            st.session_state.detected_breed = prediction
+
+        if config.SIMILAR_DOGS:
+            render_similar_dogs(key)
         
         # Know More Section
         st.markdown("---")
@@ -520,66 +898,66 @@ elif page == "🐶 Breed Detector":
                     st.session_state.show_diet = False
                     st.rerun()
         
-        if st.session_state.get("show_details", False):
-            breed_details = get_breed_details(breed)
-            if breed_details:
-                st.markdown(f"""
-                    <div class='breed-details'>
-                        <h2>🐾 About {breed}</h2>
-                """, unsafe_allow_html=True)
+        with span("breed_details"):
+            if st.session_state.get("show_details", False):
+                breed_details = get_breed_details(breed)
+                if breed_details:
+                    st.markdown(f"""
+                        <div class='breed-details'>
+                            <h2>🐾 About {breed}</h2>
+                    """, unsafe_allow_html=True)
                 
-                # Display each detail nicely
-                for key, value in breed_details.items():
-                    if key != "Breed":
-                        st.markdown(f"""
-                            <div class='breed-details-item'>
-                                <b>{key}:</b> {value}
-                            </div>
-                        """, unsafe_allow_html=True)
+                    # Display each detail nicely
+                    for key, value in breed_details.items():
+                        if key != "Breed":
+                            st.markdown(f"""
+                                <div class='breed-details-item'>
+                                    <b>{key}:</b> {value}
+                                </div>
+                            """, unsafe_allow_html=True)
                 
-                st.markdown("</div>", unsafe_allow_html=True)
+                    st.markdown("</div>", unsafe_allow_html=True)
                 
-                # Diet Plan Section
-                st.markdown("---")
-                if st.button("🍖 View Diet Plan for This Breed", use_container_width=True):
-                    st.session_state.show_diet = not st.session_state.get("show_diet", False)
+                    # Diet Plan Section
+                    st.markdown("---")
+                    if st.button("🍖 View Diet Plan for This Breed", use_container_width=True):
+                        st.session_state.show_diet = not st.session_state.get("show_diet", False)
                 
-                if st.session_state.get("show_diet", False):
-                    breed_name_lower = normalize_breed_name(breed).lower() if normalize_breed_name(breed) else breed.lower()
+                    if st.session_state.get("show_diet", False):
+                        diet_data = breed_index.diet_for(breed)
                     
-                    if breed_name_lower in diet_plans:
-                        diet_data = diet_plans[breed_name_lower]
+                        if diet_data is not None:
                         
-                        st.markdown(f"""
-                            <div class='breed-details'>
-                                <h2>🍖 Diet Plan - {breed}</h2>
-                        """, unsafe_allow_html=True)
+                            st.markdown(f"""
+                                <div class='breed-details'>
+                                    <h2>🍖 Diet Plan - {breed}</h2>
+                            """, unsafe_allow_html=True)
                         
-                        # Create tabs for puppy, adult, and senior
-                        diet_tabs = st.tabs(["👶 Puppy", "👨 Adult", "👴 Senior"])
+                            # Create tabs for puppy, adult, and senior
+                            diet_tabs = st.tabs(["👶 Puppy", "👨 Adult", "👴 Senior"])
                         
-                        life_stages = ["puppy", "adult", "senior"]
+                            life_stages = ["puppy", "adult", "senior"]
                         
-                        for idx, (tab, stage) in enumerate(zip(diet_tabs, life_stages)):
-                            with tab:
-                                if stage in diet_data:
-                                    st.markdown(f"### {stage.capitalize()} Diet Plan")
-                                    stage_diet = diet_data[stage]
+                            for idx, (tab, stage) in enumerate(zip(diet_tabs, life_stages)):
+                                with tab:
+                                    if stage in diet_data:
+                                        st.markdown(f"### {stage.capitalize()} Diet Plan")
+                                        stage_diet = diet_data[stage]
                                     
-                                    for day, meal in stage_diet.items():
-                                        st.markdown(f"""
-                                            <div class='breed-details-item'>
-                                                <b>{day.capitalize()}:</b> {meal}
-                                            </div>
-                                        """, unsafe_allow_html=True)
-                                else:
-                                    st.warning(f"No {stage} diet plan available")
+                                        for day, meal in stage_diet.items():
+                                            st.markdown(f"""
+                                                <div class='breed-details-item'>
+                                                    <b>{day.capitalize()}:</b> {meal}
+                                                </div>
+                                            """, unsafe_allow_html=True)
+                                    else:
+                                        st.warning(f"No {stage} diet plan available")
                         
-                        st.markdown("</div>", unsafe_allow_html=True)
-                    else:
-                        st.warning(f"❌ No diet plan available for {breed}.")
-            else:
-                st.warning("❌ No detailed information available for this breed.")
+                            st.markdown("</div>", unsafe_allow_html=True)
+                        else:
+                            st.warning(f"❌ No diet plan available for {breed}.")
+                else:
+                    st.warning("❌ No detailed information available for this breed.")
 
 
 # ------------------------------------------------------
@@ -593,26 +971,70 @@ elif page == "📜 History":
         </div>
     """, unsafe_allow_html=True)
 
-    if "history" not in st.session_state or len(st.session_state.history) == 0:
-        st.info("📭 No predictions yet. Start by detecting a breed!")
+    store = get_history_store()
+    owner = history_owner()
+
+    col1, col2 = st.columns([0.6, 0.4])
+    with col1:
+        breeds = ["All breeds"] + sorted(b.strip() for b in breed_index.labels if b)
+        breed_filter = st.selectbox("Breed", breeds)
+    with col2:
+        min_conf = st.slider("Minimum confidence (%)", 0, 100, 0, step=5)
+    breed_filter = None if breed_filter == "All breeds" else breed_filter
+
+    # Cursors of the pages before this one; a filter change starts over
+    filters = (owner, breed_filter, min_conf)
+    if st.session_state.get("history_filters") != filters:
+        st.session_state.history_filters = filters
+        st.session_state.history_cursors = []
+    cursors = st.session_state.history_cursors
+
+    with span("history_page"):
+        entries, next_cursor = store.page(
+            owner, breed_filter, min_conf, cursors[-1] if cursors else None, config.HISTORY_PAGE_SIZE,
+        )
+
+    if not entries and not cursors:
+        if breed_filter or min_conf:
+            st.info("🔎 No predictions match these filters.")
+        else:
+            st.info("📭 No predictions yet. Start by detecting a breed!")
     else:
-        for idx, h in enumerate(reversed(st.session_state.history)):
+        st.caption(f"Page {len(cursors) + 1} · bookmark this page's URL to come back to your history")
+        for idx, h in enumerate(entries):
             with st.container():
                 col1, col2 = st.columns([0.3, 0.7])
                 with col1:
-                    st.image(h["image"], use_column_width=True)
+                    st.image(h.thumbnail, use_column_width=True)
                 with col2:
                     st.markdown(f"""
                         <div class='breed-card'>
-                            <h3>🐶 {h['breed']}</h3>
-                            <p><b>Confidence:</b> {h['conf']:.2f}%</p>
+                            <h3>🐶 {h.breed}</h3>
+                            <p><b>Confidence:</b> {h.conf:.2f}%</p>
+                            {runners_up_line(h.runners_up)}
                         </div>
                     """, unsafe_allow_html=True)
                 st.markdown("---")
 
+        col1, col2 = st.columns(2)
+        with col1:
+            if cursors and st.button("⬅️ Newer", use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            if next_cursor and st.button("Older ➡️", use_container_width=True):
+                cursors.append(next_cursor)
+                st.rerun()
+
 
 # ------------------------------------------------------
 # CHATBOT PAGE
 # ------------------------------------------------------
 elif page == "💬 Chatbot":
     chatbot_page()
+
+
+# ------------------------------------------------------
+# DEBUG PANEL
+# ------------------------------------------------------
+tracing.debug_panel(st.session_state, previous_trace)
@@ -0,0 +1,120 @@
+import bisect
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+import inference
+
+
+# ------------------------------------------------------
+# TFLITE BACKEND
+# ------------------------------------------------------
+class TFLiteBackend:
+    """Runs a converted .tflite model with the same predict() API as CompiledModel.
+
+    Works with float32, float16 and int8 exports. Quantized inputs and
+    outputs are (de)quantized here so callers always deal in float32.
+
+    Each warmed batch size gets its own interpreter, allocated once, and
+    a batch is zero-padded up to the nearest one and the output sliced.
+    Behind the dynamic batcher the batch size changes on almost every
+    call, and resizing a single interpreter would reallocate every time.
+    A batch larger than all of them gets a new interpreter for the next
+    power of two, so only a handful are ever created.
+    """
+
+    name = "tflite"
+
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self.num_threads = num_threads
+        self.warmup_report = {}
+        # Only the classifier output is exported
+        self.embedding_dim = None
+        runner = _Runner(path, num_threads)
+        self._runners = {runner.batch_size: runner}
+        self._sizes = [runner.batch_size]
+        self._runners_lock = threading.Lock()
+        # Raw (unquantized) uint8 input means the export has fused preprocessing
+        scale, _ = runner.input["quantization"]
+        self.input_dtype = np.uint8 if runner.input["dtype"] == np.uint8 and not scale else np.float32
+
+    def _runner(self, batch_size):
+        """The interpreter for the smallest allocated batch size that fits"""
+        i = bisect.bisect_left(self._sizes, batch_size)
+        if i < len(self._sizes):
+            return self._runners[self._sizes[i]]
+        return self._add_runner(1 << (batch_size - 1).bit_length())
+
+    def _add_runner(self, batch_size):
+        with self._runners_lock:
+            if batch_size not in self._runners:
+                self._runners[batch_size] = _Runner(self.path, self.num_threads, batch_size)
+                bisect.insort(self._sizes, batch_size)
+            return self._runners[batch_size]
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=self.input_dtype)
+        n = len(batch)
+        runner = self._runner(n)
+        if runner.batch_size > n:
+            padding = np.zeros((runner.batch_size - n, *batch.shape[1:]), dtype=batch.dtype)
+            batch = np.concatenate([batch, padding])
+        return runner.run(batch, self.input_dtype)[:n]
+
+    def warm_up(self, batch_sizes=(1,)):
+        for size in batch_sizes:
+            self._add_runner(size)
+        self.warmup_report = inference.warm_up(self, batch_sizes)
+        return self.warmup_report
+
+
+class _Runner:
+    """One interpreter allocated for a fixed batch size"""
+
+    def __init__(self, path, num_threads=None, batch_size=None):
+        self.interpreter = tf.lite.Interpreter(model_path=path, num_threads=num_threads)
+        details = self.interpreter.get_input_details()[0]
+        if batch_size is not None and batch_size != details["shape"][0]:
+            self.interpreter.resize_tensor_input(details["index"], [batch_size, *details["shape"][1:]])
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch_size = int(self.input["shape"][0])
+        # An interpreter is not safe to share between session threads
+        self.lock = threading.Lock()
+
+    def run(self, batch, input_dtype):
+        dtype = self.input["dtype"]
+        if dtype != input_dtype:
+            scale, zero_point = self.input["quantization"]
+            info = np.iinfo(dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        with self.lock:
+            self.interpreter.set_tensor(self.input["index"], batch.astype(dtype))
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self.output["index"])
+            if out.dtype != np.float32:
+                scale, zero_point = self.output["quantization"]
+                out = (out.astype(np.float32) - zero_point) * scale
+            return out.copy()
+
+
+# ------------------------------------------------------
+# BACKEND SELECTION
+# ------------------------------------------------------
+BACKENDS = ("keras", "tflite")
+
+
+def load_backend(name, keras_path, tflite_path=None, warmup_batch_sizes=(1,), num_threads=None):
+    """Load and warm the inference backend selected in config"""
+    if name == "keras":
+        return inference.load_compiled_model(keras_path, warmup_batch_sizes)
+    if name == "tflite":
+        if not tflite_path:
+            raise ValueError("The tflite backend needs a .tflite model path")
+        backend = TFLiteBackend(tflite_path, num_threads=num_threads)
+        backend.warm_up(warmup_batch_sizes)
+        return backend
+    raise ValueError(f"Unknown inference backend {name!r}, expected one of {BACKENDS}")
@@ -0,0 +1,176 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+
+class QueueFull(RuntimeError):
+    """More requests are waiting than the batcher accepts"""
+
+
+# ------------------------------------------------------
+# DYNAMIC BATCHER
+# ------------------------------------------------------
+class DynamicBatcher:
+    """Collects single-image requests from many threads into one forward pass.
+
+    submit() takes one preprocessed (224, 224, 3) sample and returns a
+    Future for its output row (a tuple of rows when predict_fn returns
+    a tuple of arrays). A background thread owns the model:
+    it takes the first waiting sample plus everything queued behind it,
+    and while other requests are arriving keeps collecting until
+    max_batch_size samples are queued or max_wait_ms has passed. A lone
+    request is run immediately, so single-user latency is unchanged.
+
+    At most max_queue samples wait at once (QueueFull beyond that), and a
+    request still queued when its timeout passes fails with TimeoutError
+    instead of occupying a batch slot.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, max_queue=0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.samples = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = Counter()
+        self._wait_total = 0.0
+        self._last_batch_size = 0
+        self._queue = queue.Queue(max_queue)
+        self._closed = False
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="dynamic-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, sample, timeout=None):
+        if self._closed:
+            raise RuntimeError("DynamicBatcher is closed")
+        future = Future()
+        now = time.monotonic()
+        deadline = now + timeout if timeout is not None else None
+        try:
+            self._queue.put_nowait((sample, future, now, deadline))
+        except queue.Full:
+            self.rejected += 1
+            raise QueueFull(f"{self._queue.maxsize} requests already waiting") from None
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def predict(self, sample, timeout=None):
+        return self.predict_many([sample], timeout)[0]
+
+    def predict_many(self, samples, timeout=None):
+        """Submit every sample and wait for all rows; raises TimeoutError after timeout.
+
+        With a bounded queue the samples go in chunks of half its size,
+        each once the previous one has finished, so one large upload can
+        neither fill the queue on its own nor fail with QueueFull just for
+        being larger than it.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        maxsize = self._queue.maxsize
+        chunk = max(maxsize // 2, 1) if maxsize > 0 else max(len(samples), 1)
+        rows = []
+        futures = []
+        try:
+            for start in range(0, len(samples), chunk):
+                futures = []
+                for sample in samples[start:start + chunk]:
+                    remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+                    futures.append(self.submit(sample, remaining))
+                for f in futures:
+                    remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+                    rows.append(f.result(remaining))
+        except (FutureTimeout, TimeoutError):
+            for f in futures:
+                f.cancel()
+            raise TimeoutError(f"Prediction did not finish within {timeout} s") from None
+        except QueueFull:
+            for f in futures:
+                f.cancel()
+            raise
+        if rows and isinstance(rows[0], tuple):
+            return tuple(np.stack(column) for column in zip(*rows))
+        return np.stack(rows) if rows else np.empty((0, 0), dtype=np.float32)
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "samples": self.samples,
+            "mean_batch_size": self.samples / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "mean_queue_wait_ms": self._wait_total / self.samples * 1000 if self.samples else 0.0,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def _collect(self):
+        if self._stopping:
+            return None
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        # Only hold the batch open when there is evidence of concurrency
+        wait = self.max_wait if self._last_batch_size > 1 or not self._queue.empty() else 0
+        deadline = time.monotonic() + wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop on the next loop
+                self._stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            now = time.monotonic()
+            live = []
+            for sample, future, enqueued, deadline in batch:
+                if deadline is not None and now > deadline:
+                    self.timed_out += 1
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(TimeoutError("Timed out waiting for a batch slot"))
+                elif future.set_running_or_notify_cancel():
+                    live.append((sample, future, enqueued))
+            self._last_batch_size = len(live)
+            if not live:
+                continue
+            samples = [s for s, _, _ in live]
+            futures = [f for _, f, _ in live]
+            try:
+                outputs = self.predict_fn(np.stack(samples))
+            except Exception as e:
+                for f in futures:
+                    f.set_exception(e)
+                continue
+            # predict_fn may return several arrays (e.g. probabilities and embeddings)
+            rows = zip(*outputs) if isinstance(outputs, tuple) else outputs
+            self.batches += 1
+            self.samples += len(samples)
+            self.batch_sizes[len(samples)] += 1
+            self._wait_total += sum(now - enqueued for _, _, enqueued in live)
+            for f, row in zip(futures, rows):
+                f.set_result(row)
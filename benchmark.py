@@ -0,0 +1,350 @@
+"""Reproducible performance benchmarks for Pawdentify.
+
+    python benchmark.py --out bench.json
+    python benchmark.py --out bench.json --baseline baseline.json --fail-on-regression
+    python benchmark.py --only decode,lookup --save-baseline baseline.json
+
+Every benchmark runs on synthetic, seeded inputs: the stand-in model
+from stand_in_model.py (same input shape, labels and output size as the
+real ResNet) unless --model points at a real one, generated images in
+each supported format and size, the breed data files, the local fake
+Gemini server and clustered random vectors for the similar-image index.
+Results are written as JSON; with --baseline each result is compared to
+the saved run and regressions are reported.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import config
+
+SECTIONS = ("predict", "decode", "lookup", "json", "chat", "vectors")
+DECODE_SIZES = ((640, 480), (1920, 1080), (4032, 3024))
+DECODE_FORMATS = ("JPEG", "PNG", "WEBP")
+
+
+# ------------------------------------------------------
+# TIMING
+# ------------------------------------------------------
+def measure(fn, repeat=20, warmup=2, items=1):
+    """Time repeat calls of fn after warmup calls; items is work per call"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    ms = np.array(times) * 1000
+    return {
+        "repeat": repeat,
+        "items": items,
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "min_ms": float(ms.min()),
+        "items_per_s": float(items * 1000 / ms.mean()),
+    }
+
+
+def synthetic_image(size, seed=0):
+    """Smooth gradients plus noise, so codecs see photo-like content"""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    base = np.stack([x / w, y / h, (x + y) / (w + h)], axis=-1) * 200
+    noise = rng.normal(0, 12, (h, w, 3))
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+
+def encode(img, fmt):
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, quality=90)
+    return buf.getvalue()
+
+
+# ------------------------------------------------------
+# BENCHMARKS
+# ------------------------------------------------------
+def bench_predict(args):
+    import inference
+    from breed_data import load_labels
+
+    if args.model:
+        model = inference.load_compiled_model(args.model)
+    else:
+        from stand_in_model import build_stand_in_model
+
+        model = inference.CompiledModel(build_stand_in_model(seed=args.seed), "stand_in")
+    label_map = load_labels()
+    results = {}
+    for size in args.batch_sizes:
+        images = [synthetic_image((224, 224), seed=args.seed + i) for i in range(size)]
+        model.warm_up((size,))
+        results[f"predict/batch={size}"] = measure(
+            lambda: inference.predict_breeds(model, images, label_map, size),
+            args.repeat, items=size,
+        )
+        # Top-k decoding on its own, over a realistic softmax output
+        logits = np.random.default_rng(args.seed).normal(0, 3, (size, len(label_map)))
+        probs = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+        results[f"postprocess/batch={size}"] = measure(
+            lambda: inference.decode_predictions(probs, label_map, config.PREDICTION_TOP_K),
+            args.repeat * 10, items=size,
+        )
+    return results
+
+
+def bench_decode(args):
+    from image_ingest import ingest
+
+    results = {}
+    for w, h in DECODE_SIZES:
+        img = synthetic_image((w, h), seed=args.seed)
+        for fmt in DECODE_FORMATS:
+            data = encode(img, fmt)
+            result = measure(lambda: ingest(data), max(args.repeat // 4, 3))
+            result["bytes"] = len(data)
+            results[f"decode/{fmt.lower()}/{w}x{h}"] = result
+    return results
+
+
+def bench_lookup(args):
+    from breed_data import BreedIndex, normalize_key
+
+    index = BreedIndex.from_files()
+    labels = [l for l in index.labels if l is not None]
+    # The spellings the app sees: labels, display names and breed record names
+    names = labels + [l.replace("_", " ") for l in labels] + [l.upper() for l in labels]
+    n = len(names)
+
+    def normalize():
+        for name in names:
+            normalize_key(name)
+
+    def details():
+        for name in names:
+            index.details_for(name)
+
+    def diets():
+        for name in names:
+            index.diet_for(name)
+
+    return {
+        "lookup/normalize_key": measure(normalize, args.repeat, items=n),
+        "lookup/details_for": measure(details, args.repeat, items=n),
+        "lookup/diet_for": measure(diets, args.repeat, items=n),
+    }
+
+
+def bench_json(args):
+    from breed_data import BreedIndex, load_breeds, load_diet_plans, load_labels
+
+    return {
+        "json/labels": measure(load_labels, args.repeat),
+        "json/breeds": measure(load_breeds, args.repeat),
+        "json/diet_plans": measure(load_diet_plans, args.repeat),
+        "json/breed_index": measure(BreedIndex.from_files, args.repeat),
+    }
+
+
+def bench_chat(args):
+    import chat_service
+    from chat_stream import stream_reply
+    from fake_gemini import start_fake_server
+    from gemini_client import ResilientClient, RestClient
+
+    server, url = start_fake_server(chunk_delay_ms=args.chunk_delay_ms)
+    try:
+        client = ResilientClient(RestClient("benchmark", config.GEMINI_MODEL, url))
+        chat = chat_service.build_chat(client=RestClient("benchmark", config.GEMINI_MODEL, url))
+        counter = iter(range(10 ** 9))
+        ttft = []
+
+        def unique():
+            return f"Tell me something surprising about dogs #{next(counter)}"
+
+        def streamed():
+            _, metrics = stream_reply(client.generate_stream(unique()), lambda text: None)
+            ttft.append(metrics["ttft_ms"])
+
+        results = {
+            "chat/generate": measure(lambda: client.generate(unique()), args.repeat),
+            "chat/stream": measure(streamed, args.repeat),
+            "chat/cached_reply": measure(lambda: "".join(chat.stream("Are dogs colorblind?")), args.repeat),
+            "chat/local_answer": measure(
+                lambda: "".join(chat.stream("What is the barking level of a beagle?")), args.repeat
+            ),
+        }
+        results["chat/stream"]["ttft_p50_ms"] = float(np.percentile(ttft, 50))
+        return results
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_vectors(args):
+    from vector_index import VectorIndex
+
+    rng = np.random.default_rng(args.seed)
+    dim, k = 256, 5
+    # One cluster per breed, as real embeddings have; uniform noise would flatter IVF less
+    centers = rng.standard_normal((120, dim)).astype(np.float32)
+    results = {}
+    for size in args.vector_sizes:
+        index = VectorIndex(None, dim, capacity=size)
+        keys = [f"{i:064x}" for i in range(size)]
+        chunk = 50_000
+        for start in range(0, size, chunk):
+            n = min(chunk, size - start)
+            vectors = centers[rng.integers(0, 120, n)] + rng.standard_normal((n, dim)).astype(np.float32)
+            index.add(vectors, keys[start:start + n], ["beagle"] * n, [90.0] * n)
+        index.train()
+        queries = centers[rng.integers(0, 120, 50)] + rng.standard_normal((50, dim)).astype(np.float32)
+        it = iter(range(10 ** 9))
+
+        def query():
+            return queries[next(it) % len(queries)]
+
+        exact = [{m.slot for m in index.search(q, k, exact=True)[0]} for q in queries]
+        approx = [{m.slot for m in index.search(q, k, exact=False)[0]} for q in queries]
+        results[f"vectors/exact/{size}"] = measure(lambda: index.search(query(), k, exact=True), args.repeat)
+        results[f"vectors/ivf/{size}"] = measure(lambda: index.search(query(), k, exact=False), args.repeat)
+        results[f"vectors/ivf/{size}"]["recall_at_5"] = float(
+            np.mean([len(a & e) / k for a, e in zip(approx, exact)]))
+        one = centers[:1]
+        results[f"vectors/add/{size}"] = measure(
+            lambda: index.add(one, [keys[0]], ["beagle"], [90.0]), args.repeat)
+        del index
+    return results
+
+
+BENCHMARKS = {
+    "predict": bench_predict,
+    "decode": bench_decode,
+    "lookup": bench_lookup,
+    "json": bench_json,
+    "chat": bench_chat,
+    "vectors": bench_vectors,
+}
+
+
+# ------------------------------------------------------
+# REPORTING
+# ------------------------------------------------------
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    versions = {"python": platform.python_version(), "numpy": np.__version__}
+    tf = sys.modules.get("tensorflow")
+    if tf is not None:
+        versions["tensorflow"] = getattr(tf, "__version__", "unknown")
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Rows of (name, baseline p50, current p50, ratio, regressed)"""
+    rows = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if not base or not base.get("p50_ms"):
+            continue
+        ratio = result["p50_ms"] / base["p50_ms"]
+        rows.append((name, base["p50_ms"], result["p50_ms"], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def print_results(results):
+    print(f"{'benchmark':<32} {'p50 ms':>10} {'p99 ms':>10} {'items/s':>12}")
+    for name, r in sorted(results.items()):
+        print(f"{name:<32} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} {r['items_per_s']:>12.1f}")
+
+
+def print_comparison(rows, tolerance):
+    print(f"\n{'benchmark':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, base, current, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<32} {base:>10.3f} {current:>10.3f} {(ratio - 1) * 100:>+7.1f}%{flag}")
+    regressions = sum(r[4] for r in rows)
+    print(f"\n{regressions} regression(s) beyond {tolerance:.0%} of {len(rows)} compared")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", default=",".join(SECTIONS), help=f"comma-separated subset of {SECTIONS}")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", help="benchmark this .keras model instead of the stand-in")
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--vector-sizes", default="10000,100000,1000000")
+    parser.add_argument("--chunk-delay-ms", type=float, default=0, help="fake Gemini pause between streamed words")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--save-baseline", help="also write the results here")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown (0.2 = 20%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+    args.batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    args.vector_sizes = [int(n) for n in args.vector_sizes.split(",")]
+
+    sections = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown section(s): {', '.join(sorted(unknown))}")
+
+    np.random.seed(args.seed)
+    results, skipped = {}, {}
+    for section in sections:
+        print(f"Running {section}...", file=sys.stderr)
+        try:
+            results.update(BENCHMARKS[section](args))
+        except ImportError as e:
+            skipped[section] = f"missing dependency: {e.name or e}"
+            print(f"Skipped {section}: {skipped[section]}", file=sys.stderr)
+
+    report = {"environment": environment(), "args": {
+        "repeat": args.repeat, "seed": args.seed, "model": args.model or "stand_in",
+        "batch_sizes": args.batch_sizes, "vector_sizes": args.vector_sizes,
+    }, "skipped": skipped, "results": results}
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    print_results(results)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        rows = compare(results, baseline, args.tolerance)
+        print_comparison(rows, args.tolerance)
+        if args.fail_on_regression and any(r[4] for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
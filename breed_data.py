@@ -0,0 +1,120 @@
+"""Join model labels to breed records and diet plans.
+
+    python breed_data.py    # print the join report
+"""
+import json
+import logging
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------
+# RAW LOADERS
+# ------------------------------------------------------
+def load_labels(path=config.LABELS_PATH):
+    with open(path) as f:
+        classes = json.load(f)
+    # Extract just the breed names (remove ImageNet ID prefix like 'n02085620-')
+    label_dict = {}
+    for k, v in classes.items():
+        # Remove the ImageNet ID prefix (everything before the dash)
+        breed_name = k.split('-', 1)[1] if '-' in k else k
+        label_dict[int(v)] = breed_name
+    return label_dict
+
+
+def load_breeds(path=config.BREEDS_PATH):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_diet_plans(path=config.DIET_PLANS_PATH):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def normalize_key(name):
+    """Canonical form used to match names across the three files"""
+    return name.strip().lower().replace(" ", "_").replace("-", "_")
+
+
+# ------------------------------------------------------
+# JOIN TABLE
+# ------------------------------------------------------
+class BreedIndex:
+    """Model class index -> label, breed record and diet plan.
+
+    Built once at startup. labels, details and diets are plain lists
+    indexed by class index, and by_name maps every normalized spelling
+    of a breed to that index, so every lookup is a dict hit plus an
+    array index instead of a scan over the JSON data.
+    """
+
+    def __init__(self, label_map, breeds, diet_plans):
+        size = max(label_map) + 1 if label_map else 0
+        self.label_map = label_map
+        self.labels = [None] * size
+        self.details = [None] * size
+        self.diets = [None] * size
+        self.by_name = {}
+        self.missing_details = []
+        self.missing_diets = []
+
+        breeds_by_key = {normalize_key(b["Breed"]): b for b in breeds}
+        diets_by_key = {normalize_key(d["name"]): d.get("diet_plan", {}) for d in diet_plans}
+
+        for idx, label in sorted(label_map.items()):
+            label = label.strip()
+            key = normalize_key(label)
+            self.labels[idx] = label
+            self.details[idx] = breeds_by_key.get(key)
+            self.diets[idx] = diets_by_key.get(key)
+            self.by_name[key] = idx
+            if self.details[idx] is None:
+                self.missing_details.append(label)
+            else:
+                self.by_name[normalize_key(self.details[idx]["Breed"])] = idx
+            if self.diets[idx] is None:
+                self.missing_diets.append(label)
+
+    @classmethod
+    def from_files(cls, labels_path=config.LABELS_PATH, breeds_path=config.BREEDS_PATH,
+                   diet_plans_path=config.DIET_PLANS_PATH):
+        index = cls(load_labels(labels_path), load_breeds(breeds_path),
+                    load_diet_plans(diet_plans_path))
+        for line in index.report():
+            logger.warning(line)
+        return index
+
+    def __len__(self):
+        return len(self.labels)
+
+    def resolve(self, breed):
+        """Class index for any spelling of a breed name, or None"""
+        return self.by_name.get(normalize_key(breed))
+
+    def details_for(self, breed):
+        idx = self.resolve(breed)
+        return self.details[idx] if idx is not None else None
+
+    def diet_for(self, breed):
+        idx = self.resolve(breed)
+        return self.diets[idx] if idx is not None else None
+
+    def report(self):
+        """One line per label that failed to join, empty when everything matched"""
+        lines = [f"No breed details for model label {label!r}" for label in self.missing_details]
+        lines += [f"No diet plan for model label {label!r}" for label in self.missing_diets]
+        return lines
+
+
+if __name__ == "__main__":
+    index = BreedIndex.from_files()
+    problems = index.report()
+    print(f"{len(index)} labels, "
+          f"{len(index) - len(index.missing_details)} with breed details, "
+          f"{len(index) - len(index.missing_diets)} with diet plans")
+    for line in problems:
+        print(line)
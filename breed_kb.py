@@ -0,0 +1,381 @@
+"""Answer breed fact questions from the local breed data.
+
+    python breed_kb.py "what is the barking level of a basset"
+"""
+import math
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it its me my of on or "
+    "should the their they this to what when which who why will with you your".split()
+)
+
+# Question words -> breed record fields they ask about
+ATTRIBUTE_KEYWORDS = {
+    "Height": {"height", "tall", "big", "size", "large", "small"},
+    "Weight": {"weight", "weigh", "heavy", "big", "size", "large", "small"},
+    "Colors": {"color", "colors", "colour", "colours"},
+    "Coat Type": {"coat", "fur", "hair"},
+    "Shedding Level": {"shed", "sheds", "shedding", "hypoallergenic"},
+    "Scientific Name": {"scientific"},
+    "Origin": {"origin", "originate", "country"},
+    "Breed Group": {"group"},
+    "Temperament Traits": {"temperament", "personality", "friendly", "character", "nature"},
+    "Intelligence Level": {"intelligent", "intelligence", "smart", "clever"},
+    "Training Difficulty": {"train", "training", "trainable", "obedient"},
+    "Exercise Needs": {"exercise", "walk", "walks", "active", "energy"},
+    "Barking Level": {"bark", "barks", "barking", "barker", "noisy", "loud"},
+    "Common Diseases": {"disease", "diseases", "health", "illness", "illnesses"},
+    "Grooming Requirements": {"groom", "grooming", "brush", "brushing"},
+    "Long Description": {"about", "describe", "description", "overview", "info", "information"},
+}
+DIET_KEYWORDS = {"diet", "eat", "eats", "food", "feed", "feeding", "meal", "meals", "nutrition"}
+LIFE_STAGES = ("puppy", "adult", "senior")
+DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+DIET_WORDS = DIET_KEYWORDS | set(LIFE_STAGES) | set(DAYS) | {"plan", "schedule", "week", "weekly", "menu"}
+# Anything comparative or open-ended goes to Gemini even when a breed is named
+OPEN_ENDED = {"compare", "vs", "versus", "better", "best", "why", "recommend"}
+# Advice, permission and safety questions ("can a beagle eat ...", "is it
+# safe to ...") and anything about a sick dog or a possibly toxic food get
+# a grounded Gemini answer, never a canned breed field
+MODAL_WORDS = {"can", "could", "should", "would", "may", "might", "must", "safe", "safely",
+               "ok", "okay", "allowed", "harmful", "dangerous", "bad"}
+HEALTH_TERMS = {
+    "sick", "ill", "vomit", "vomiting", "diarrhea", "poison", "poisoned", "poisonous", "toxic",
+    "chocolate", "grape", "grapes", "raisin", "raisins", "xylitol", "onion", "onions", "garlic",
+    "avocado", "alcohol", "medicine", "medication", "dose", "pain", "bleeding", "injured",
+    "injury", "emergency", "vet", "symptom", "symptoms", "allergic", "allergy", "pregnant",
+}
+# Question words that never change which field is asked about; any other
+# word a matched field doesn't cover sends the question to Gemini
+FILLER_WORDS = frozenset(
+    "what how much many level kind type typical typically usual usually normal need get "
+    "tell know like often average common problem issue come have has day daily per require "
+    "required requirement list give show please generally dog breed amount".split()
+)
+# A question with one of these and no breed name is about the breed in context
+REFERRING_WORDS = {"it", "its", "they", "them", "their", "he", "him", "his", "she", "her", "this", "that"}
+
+NICKNAMES = {
+    "lab": "Labrador_retriever",
+    "labrador": "Labrador_retriever",
+    "golden": "golden_retriever",
+    "husky": "Siberian_husky",
+    "yorkie": "Yorkshire_terrier",
+    "westie": "West_Highland_white_terrier",
+    "corgi": "Pembroke",
+    "frenchie": "French_bulldog",
+    "rottie": "Rottweiler",
+    "dobermann": "Doberman",
+    "pom": "Pomeranian",
+    "st bernard": "Saint_Bernard",
+    "gsd": "German_shepherd",
+}
+
+
+# ------------------------------------------------------
+# TEXT PROCESSING
+# ------------------------------------------------------
+def words(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def stem(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [stem(w) for w in words(text) if w not in STOPWORDS]
+
+
+def stems(ws):
+    return {stem(w) for w in ws}
+
+
+def display_name(label):
+    return label.replace("_", " ")
+
+
+# ------------------------------------------------------
+# BM25 INDEX
+# ------------------------------------------------------
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring"""
+
+    def __init__(self, docs, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for doc_id, text in enumerate(docs):
+            terms = Counter(tokenize(text))
+            self.lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings[term].append((doc_id, tf))
+        n = len(self.lengths)
+        self.avg_length = sum(self.lengths) / n if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    def search(self, query, k=3, allowed=None):
+        """Top-k (score, doc_id), optionally restricted to a set of doc ids"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(((s, d) for d, s in scores.items()), reverse=True)[:k]
+
+
+# ------------------------------------------------------
+# KNOWLEDGE BASE
+# ------------------------------------------------------
+class BreedKnowledgeBase:
+    """Breed and attribute recognition plus BM25 retrieval over a BreedIndex"""
+
+    def __init__(self, breed_index, snippets=3, snippet_chars=300):
+        self.index = breed_index
+        self.snippets = snippets
+        self.snippet_chars = snippet_chars
+        self.docs = []
+        self.doc_breed = []
+        self.breed_docs = defaultdict(set)
+        self.aliases = {}
+        # Stemmed words of every name a breed can be asked about by
+        self.alias_words = defaultdict(set)
+
+        for idx, label in enumerate(breed_index.labels):
+            if label is None:
+                continue
+            details = breed_index.details[idx] or {}
+            for field, value in details.items():
+                if field != "Breed":
+                    self._add_doc(idx, f"{display_name(label)} {field}: {value}")
+            for stage, plan in (breed_index.diets[idx] or {}).items():
+                meals = "; ".join(f"{day}: {meal}" for day, meal in plan.items())
+                self._add_doc(idx, f"{display_name(label)} {stage} diet plan: {meals}")
+            for name in (label, details.get("Breed", label)):
+                alias = tuple(words(name))
+                self.aliases[alias] = idx
+                if len(alias) > 1 and alias[-1] == "dog":
+                    self.aliases[alias[:-1]] = idx
+        for nickname, label in NICKNAMES.items():
+            idx = breed_index.resolve(label)
+            if idx is not None:
+                self.aliases.setdefault(tuple(nickname.split()), idx)
+        for alias, idx in self.aliases.items():
+            self.alias_words[idx].update(stems(alias))
+
+        self.bm25 = BM25Index(self.docs)
+        self.max_alias = max((len(a) for a in self.aliases), default=1)
+
+    def _add_doc(self, idx, text):
+        self.breed_docs[idx].add(len(self.docs))
+        self.docs.append(text)
+        self.doc_breed.append(idx)
+
+    # Recognition
+    def find_breeds(self, question):
+        """Class indexes of the breeds named in a question, longest match first"""
+        ws = words(question)
+        found = []
+        i = 0
+        while i < len(ws):
+            for n in range(min(self.max_alias, len(ws) - i), 0, -1):
+                gram = tuple(ws[i:i + n])
+                idx = self.aliases.get(gram)
+                if idx is None:
+                    idx = self.aliases.get(gram[:-1] + (stem(gram[-1]),))
+                if idx is not None:
+                    if idx not in found:
+                        found.append(idx)
+                    i += n
+                    break
+            else:
+                i += 1
+        return found
+
+    def find_attributes(self, question):
+        ws = set(words(question))
+        return [field for field, keys in ATTRIBUTE_KEYWORDS.items() if ws & keys]
+
+    # Local answers
+    def uncovered_words(self, question, idx, covered):
+        """Content words of the question that neither name the breed nor are covered"""
+        skip = self.alias_words[idx] | stems(covered) | stems(FILLER_WORDS)
+        return [w for w in tokenize(question) if w not in skip]
+
+    def answer(self, question, breeds=None):
+        """A direct answer when one breed's matched fields cover the whole question, else None"""
+        ws = set(words(question))
+        if ws & (OPEN_ENDED | MODAL_WORDS | HEALTH_TERMS):
+            return None
+        if breeds is None:
+            breeds = self.find_breeds(question)
+        if len(breeds) != 1:
+            return None
+        idx = breeds[0]
+        name = display_name(self.index.labels[idx])
+
+        if ws & DIET_KEYWORDS:
+            if self.uncovered_words(question, idx, DIET_WORDS):
+                return None
+            return self._diet_answer(idx, name, ws)
+
+        details = self.index.details[idx]
+        fields = [f for f in self.find_attributes(question) if details and f in details]
+        if not fields:
+            return None
+        if len(fields) > 1 and "Long Description" in fields:
+            fields.remove("Long Description")
+        covered = set().union(*(ATTRIBUTE_KEYWORDS[f] for f in fields))
+        if self.uncovered_words(question, idx, covered):
+            return None
+        lines = [f"**{field}** of the {name}: {details[field]}" for field in fields]
+        return "\n\n".join(lines)
+
+    def _diet_answer(self, idx, name, ws):
+        plans = self.index.diets[idx]
+        if not plans:
+            return None
+        stage = next((s for s in LIFE_STAGES if s in ws), "adult")
+        plan = plans.get(stage)
+        if not plan:
+            return None
+        days = [d for d in DAYS if d in ws]
+        if days:
+            lines = [f"**{d.capitalize()}:** {plan[d]}" for d in days if d in plan]
+        else:
+            lines = [f"**{d.capitalize()}:** {meal}" for d, meal in plan.items()]
+        return f"🍖 {stage.capitalize()} diet plan for the {name}:\n\n" + "\n\n".join(lines)
+
+    # Grounding for Gemini
+    def grounding(self, question, breeds=None):
+        """Top matching snippets for each breed named in the question"""
+        if breeds is None:
+            breeds = self.find_breeds(question)
+        breeds = breeds[:self.snippets]
+        if not breeds:
+            return []
+        # Every candidate doc already contains the breed name, so only the
+        # rest of the question is useful for ranking
+        name_words = set()
+        for idx in breeds:
+            name_words.update(stem(w) for w in words(self.index.labels[idx]))
+        query = [w for w in words(question) if stem(w) not in name_words]
+        if set(query) & DIET_KEYWORDS:
+            query.append("diet")
+        query = " ".join(query)
+
+        per_breed = max(1, self.snippets // len(breeds))
+        snippets = []
+        for idx in breeds:
+            hits = self.bm25.search(query, per_breed, self.breed_docs[idx])
+            if hits:
+                snippets += [self.docs[d][:self.snippet_chars] for _, d in hits]
+            else:
+                # Nothing matched the wording: fall back to the breed's overview
+                snippets.append(self._overview(idx))
+        return snippets
+
+    def _overview(self, idx):
+        details = self.index.details[idx] or {}
+        text = details.get("Long Description", "")
+        return f"{display_name(self.index.labels[idx])}: {text}"[:self.snippet_chars]
+
+    def grounded_prompt(self, question, breeds=None):
+        snippets = self.grounding(question, breeds)
+        if not snippets:
+            return question
+        facts = "\n".join(f"- {s}" for s in snippets)
+        return f"Relevant facts from the Pawdentify breed database:\n{facts}\n\nQuestion: {question}"
+
+
+# ------------------------------------------------------
+# CHAT WRAPPER
+# ------------------------------------------------------
+class GroundedChat:
+    """Answers breed fact questions locally and grounds everything else.
+
+    With a ConversationContext, a question that names no breed is grounded
+    in the facts of the breed last discussed or detected, and the prompt
+    sent to Gemini carries the recent turns and a summary. That breed is
+    only answered about locally when the question refers back to it
+    ("how much does it weigh?").
+    """
+
+    def __init__(self, chat, kb, answer_locally=True):
+        self.chat = chat
+        self.kb = kb
+        self.answer_locally = answer_locally
+        self.local_answers = 0
+        self.remote_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self):
+        return self.chat.model_name
+
+    def _count(self, local):
+        with self._lock:
+            if local:
+                self.local_answers += 1
+            else:
+                self.remote_calls += 1
+
+    def _route(self, question, context):
+        """(local reply or None, prompt for Gemini)"""
+        named = breeds = self.kb.find_breeds(question)
+        if context is not None:
+            if named:
+                context.topic_breed = self.kb.index.labels[named[-1]]
+            elif context.topic_breed is not None:
+                idx = self.kb.index.resolve(context.topic_breed)
+                breeds = [idx] if idx is not None else []
+        # The topic breed always grounds the prompt, but only answers locally
+        # for a question that points back at it
+        local = named or (breeds if set(words(question)) & REFERRING_WORDS else [])
+        reply = self.kb.answer(question, local) if self.answer_locally and local else None
+        self._count(reply is not None)
+        if reply is not None:
+            return reply, None
+        prompt = self.kb.grounded_prompt(question, breeds)
+        if context is not None:
+            prompt = context.build_prompt(prompt)
+        return None, prompt
+
+    def generate(self, question, context=None):
+        reply, prompt = self._route(question, context)
+        if reply is None:
+            reply = self.chat.generate(prompt)
+        return reply
+
+    def stream(self, question, context=None):
+        reply, prompt = self._route(question, context)
+        if reply is not None:
+            yield reply
+            return
+        yield from self.chat.stream(prompt)
+
+
+if __name__ == "__main__":
+    from breed_data import BreedIndex
+
+    kb = BreedKnowledgeBase(BreedIndex.from_files())
+    question = " ".join(sys.argv[1:]) or "what is the barking level of a basset"
+    local = kb.answer(question)
+    print(local if local is not None else kb.grounded_prompt(question))
@@ -0,0 +1,273 @@
+"""Compile the breed JSON files into one read-only SQLite artifact.
+
+    python breed_store.py build            # writes config.BREED_STORE_PATH
+    python breed_store.py build --strict   # fail if any label doesn't join
+    python breed_store.py check            # validate an existing artifact
+
+The artifact holds class_indices.json, 120_breeds_new.json and
+120_diet_plans.json already joined by class index, plus a schema
+version and the SHA-256 of each source file. BreedStore opens it
+read-only and immutable, so every process maps the same pages from the
+OS cache, and decodes a breed's details or diet plan only when it is
+first asked for.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import config
+from breed_data import BreedIndex, load_breeds, load_diet_plans, load_labels, normalize_key
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+
+class InvalidBreedData(ValueError):
+    pass
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_paths(labels_path=None, breeds_path=None, diet_plans_path=None):
+    return {
+        "labels": labels_path or config.LABELS_PATH,
+        "breeds": breeds_path or config.BREEDS_PATH,
+        "diet_plans": diet_plans_path or config.DIET_PLANS_PATH,
+    }
+
+
+# ------------------------------------------------------
+# VALIDATION
+# ------------------------------------------------------
+def validate(label_map, breeds, diet_plans, index, strict=False):
+    """Raise InvalidBreedData for malformed input; returns the warnings"""
+    errors = []
+    if sorted(label_map) != list(range(len(label_map))):
+        errors.append("class indices are not contiguous from 0")
+
+    seen = {}
+    for i, breed in enumerate(breeds):
+        name = breed.get("Breed") if isinstance(breed, dict) else None
+        if not isinstance(name, str) or not name.strip():
+            errors.append(f"breed record {i} has no Breed name")
+            continue
+        key = normalize_key(name)
+        if key in seen:
+            errors.append(f"breed {name!r} appears twice (records {seen[key]} and {i})")
+        seen[key] = i
+
+    for i, diet in enumerate(diet_plans):
+        name = diet.get("name") if isinstance(diet, dict) else None
+        if not isinstance(name, str):
+            errors.append(f"diet record {i} has no name")
+            continue
+        plan = diet.get("diet_plan")
+        if not isinstance(plan, dict):
+            errors.append(f"diet plan for {name!r} is not an object")
+            continue
+        for stage, days in plan.items():
+            if not isinstance(days, dict) or not all(isinstance(m, str) for m in days.values()):
+                errors.append(f"diet plan for {name!r} has a malformed {stage!r} stage")
+
+    warnings = index.report()
+    if strict:
+        errors += warnings
+    if errors:
+        more = f"; and {len(errors) - 5} more" if len(errors) > 5 else ""
+        raise InvalidBreedData("; ".join(errors[:5]) + more)
+    return warnings
+
+
+# ------------------------------------------------------
+# BUILD
+# ------------------------------------------------------
+def build_store(out_path=None, strict=False, **paths):
+    """Validate the JSON sources and atomically write the SQLite artifact"""
+    out_path = out_path or config.BREED_STORE_PATH
+    paths = source_paths(**paths)
+    label_map = load_labels(paths["labels"])
+    breeds = load_breeds(paths["breeds"])
+    diet_plans = load_diet_plans(paths["diet_plans"])
+    index = BreedIndex(label_map, breeds, diet_plans)
+    warnings = validate(label_map, breeds, diet_plans, index, strict)
+
+    tmp_path = f"{out_path}.tmp{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript("""
+            PRAGMA journal_mode = OFF;
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE breeds (
+                idx INTEGER PRIMARY KEY,
+                label TEXT NOT NULL,
+                details TEXT,
+                diet TEXT
+            );
+            CREATE TABLE names (key TEXT PRIMARY KEY, idx INTEGER NOT NULL) WITHOUT ROWID;
+        """)
+        db.executemany(
+            "INSERT INTO breeds VALUES (?, ?, ?, ?)",
+            [
+                (idx, label,
+                 json.dumps(index.details[idx]) if index.details[idx] is not None else None,
+                 json.dumps(index.diets[idx]) if index.diets[idx] is not None else None)
+                for idx, label in enumerate(index.labels)
+            ],
+        )
+        db.executemany("INSERT INTO names VALUES (?, ?)", sorted(index.by_name.items()))
+        meta = {
+            "schema_version": str(SCHEMA_VERSION),
+            "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "warnings": json.dumps(warnings),
+            "missing_details": json.dumps(index.missing_details),
+            "missing_diets": json.dumps(index.missing_diets),
+        }
+        meta.update({f"sha256:{name}": file_sha256(path) for name, path in paths.items()})
+        db.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+        db.commit()
+        db.execute("VACUUM")
+    finally:
+        db.close()
+    os.replace(tmp_path, out_path)
+    return warnings
+
+
+# ------------------------------------------------------
+# READ-ONLY STORE
+# ------------------------------------------------------
+class _LazyColumn:
+    """Sequence view of one JSON column, decoded row by row on first access"""
+
+    def __init__(self, store, column):
+        self._store = store
+        self._get = lru_cache(maxsize=None)(lambda idx: store._fetch(column, idx))
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, idx):
+        if not 0 <= idx < len(self._store):
+            raise IndexError(idx)
+        return self._get(idx)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class BreedStore(BreedIndex):
+    """Read-only BreedIndex backed by the compiled SQLite artifact.
+
+    labels, label_map and by_name are loaded up front (a few KB);
+    details and diets are sequences that decode one breed at a time.
+    Decoded records are shared, so callers must not modify them.
+    """
+
+    def __init__(self, path=None):
+        # Not BreedIndex.__init__: everything is already joined in the file
+        self.path = path or config.BREED_STORE_PATH
+        uri = Path(self.path).resolve().as_uri() + "?mode=ro&immutable=1"
+        self._db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        version = int(self.meta.get("schema_version", 0))
+        if version != SCHEMA_VERSION:
+            self._db.close()
+            raise InvalidBreedData(f"{self.path} has schema {version}, expected {SCHEMA_VERSION}")
+        self.labels = [row[0] for row in self._db.execute("SELECT label FROM breeds ORDER BY idx")]
+        self.label_map = dict(enumerate(self.labels))
+        self.by_name = dict(self._db.execute("SELECT key, idx FROM names"))
+        self.missing_details = json.loads(self.meta["missing_details"])
+        self.missing_diets = json.loads(self.meta["missing_diets"])
+        self.details = _LazyColumn(self, "details")
+        self.diets = _LazyColumn(self, "diet")
+
+    def _fetch(self, column, idx):
+        with self._lock:
+            row = self._db.execute(f"SELECT {column} FROM breeds WHERE idx = ?", (idx,)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def is_current(self, **paths):
+        """True when every source file still has the hash it was built from"""
+        for name, path in source_paths(**paths).items():
+            try:
+                if file_sha256(path) != self.meta.get(f"sha256:{name}"):
+                    return False
+            except OSError:
+                # Sources not deployed next to the artifact: trust the artifact
+                continue
+        return True
+
+    def close(self):
+        self._db.close()
+
+
+def open_breed_index(path=None):
+    """The compiled store, rebuilt first when missing or older than the JSON sources.
+
+    Falls back to an in-memory BreedIndex when the artifact can't be
+    written (e.g. a read-only deployment without a prebuilt file).
+    """
+    path = path or config.BREED_STORE_PATH
+    try:
+        store = BreedStore(path) if os.path.exists(path) else None
+        if store is not None and not store.is_current():
+            store.close()
+            store = None
+        if store is None:
+            logger.info("Building %s from the breed JSON files", path)
+            build_store(path)
+            store = BreedStore(path)
+    except (OSError, sqlite3.Error, InvalidBreedData) as e:
+        logger.warning("Breed store unavailable (%s); loading the JSON files instead", e)
+        return BreedIndex.from_files()
+    for line in store.report():
+        logger.warning(line)
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("build", "check"))
+    parser.add_argument("--out", default=config.BREED_STORE_PATH)
+    parser.add_argument("--strict", action="store_true", help="fail when a label has no details or diet")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        try:
+            warnings = build_store(args.out, strict=args.strict)
+        except InvalidBreedData as e:
+            print(f"Invalid breed data: {e}", file=sys.stderr)
+            return 1
+        for line in warnings:
+            print(line)
+        print(f"Wrote {args.out} ({os.path.getsize(args.out) // 1024} KB)")
+        return 0
+
+    store = BreedStore(args.out)
+    current = store.is_current()
+    print(f"{args.out}: schema {store.meta['schema_version']}, built {store.meta['built']}, "
+          f"{len(store)} labels, {'up to date' if current else 'STALE - rebuild'}")
+    for line in store.report():
+        print(line)
+    return 0 if current else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
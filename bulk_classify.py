@@ -0,0 +1,226 @@
+"""Classify a whole directory or tar/zip archive of dog photos.
+
+    python bulk_classify.py photos/ -o results.jsonl
+    python bulk_classify.py archive.tar.gz -o results.csv --top-k 3
+
+Images stream through a bounded pipeline: the source is walked lazily,
+decoding and preprocessing run in a thread (or process) pool a few
+batches ahead of the model, and results are appended to the output as
+each batch finishes. A <output>.ckpt file records progress after every
+batch, so re-running the same command resumes where it stopped.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+import config
+import inference
+from image_ingest import load_model_input
+from inference import IMAGE_EXTENSIONS
+
+
+# ------------------------------------------------------
+# SOURCES
+# ------------------------------------------------------
+def iter_directory(path):
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                full = os.path.join(root, name)
+                yield full, full
+
+
+def iter_tar(path):
+    # Streaming mode reads members in archive order without seeking
+    with tarfile.open(path, "r|*") as tar:
+        for member in tar:
+            if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield f"{path}::{member.name}", tar.extractfile(member).read()
+
+
+def iter_zip(path):
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield f"{path}::{info.filename}", zf.read(info)
+
+
+def iter_source(path):
+    """Yield (item_id, payload) where payload is a file path or the image bytes"""
+    if os.path.isdir(path):
+        return iter_directory(path)
+    if zipfile.is_zipfile(path):
+        return iter_zip(path)
+    if tarfile.is_tarfile(path):
+        return iter_tar(path)
+    raise SystemExit(f"{path} is not a directory, tar or zip archive")
+
+
+# ------------------------------------------------------
+# DECODE (runs in the worker pool)
+# ------------------------------------------------------
+def load_sample(payload, dtype):
+    """Decode and preprocess one image; returns (array, None) or (None, error)"""
+    try:
+        if isinstance(payload, str):
+            with open(payload, "rb") as f:
+                payload = f.read()
+        return inference.preprocess_images([load_model_input(payload)], dtype)[0], None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def decoded_batches(source, pool, batch_size, prefetch, dtype):
+    """Yield (ids, [(sample, error), ...]) with at most `prefetch` batches decoding at once"""
+    pending = deque()
+    for chunk in chunked(source, batch_size):
+        ids = [item_id for item_id, _ in chunk]
+        pending.append((ids, [pool.submit(load_sample, payload, dtype) for _, payload in chunk]))
+        if len(pending) >= prefetch:
+            ids, futures = pending.popleft()
+            yield ids, [f.result() for f in futures]
+    while pending:
+        ids, futures = pending.popleft()
+        yield ids, [f.result() for f in futures]
+
+
+# ------------------------------------------------------
+# OUTPUT + CHECKPOINT
+# ------------------------------------------------------
+class ResultWriter:
+    """Appends results as JSONL or CSV and checkpoints (count, byte offset)"""
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.ckpt_path = f"{path}.ckpt"
+        self.csv = path.lower().endswith(".csv")
+        self.done = 0
+        offset = 0
+        if resume and os.path.exists(self.ckpt_path) and os.path.exists(path):
+            with open(self.ckpt_path) as f:
+                ckpt = json.load(f)
+            self.done, offset = ckpt["done"], ckpt["offset"]
+        self._file = open(path, "a+" if offset else "w", newline="")
+        # Drop anything written after the last checkpoint
+        self._file.truncate(offset)
+        self._file.seek(offset)
+        self._csv = csv.writer(self._file) if self.csv else None
+        if self.csv and not offset:
+            self._csv.writerow(["id", "breed", "confidence", "top_k", "error"])
+
+    def write(self, row):
+        if self._csv:
+            top = ";".join(f"{t['breed']}:{t['confidence']:.2f}" for t in row.get("top_k", []))
+            conf = row.get("confidence")
+            self._csv.writerow([row["id"], row.get("breed", ""),
+                                f"{conf:.2f}" if conf is not None else "", top, row.get("error", "")])
+        else:
+            self._file.write(json.dumps(row) + "\n")
+
+    def checkpoint(self, count):
+        self.done += count
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        tmp = f"{self.ckpt_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"done": self.done, "offset": self._file.tell()}, f)
+        os.replace(tmp, self.ckpt_path)
+
+    def close(self):
+        self._file.close()
+
+
+# ------------------------------------------------------
+# PIPELINE
+# ------------------------------------------------------
+def classify(source_path, output, model, label_map, batch_size=32, top_k=5,
+             workers=None, processes=False, prefetch=2, resume=True, progress_every=5.0):
+    writer = ResultWriter(output, resume)
+    if writer.done:
+        print(f"Resuming after {writer.done} images", file=sys.stderr)
+    source = itertools.islice(iter_source(source_path), writer.done, None)
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    start = last_report = time.perf_counter()
+    processed = 0
+
+    with executor(max_workers=workers) as pool:
+        for ids, decoded in decoded_batches(source, pool, batch_size, prefetch, model.input_dtype):
+            ok = [i for i, (sample, _) in enumerate(decoded) if sample is not None]
+            rows = [{"id": item_id, "error": err} for item_id, (_, err) in zip(ids, decoded)]
+            if ok:
+                batch = np.stack([decoded[i][0] for i in ok])
+                probs = model.predict(batch)
+                for row_i, pred in zip(ok, inference.decode_predictions(probs, label_map, top_k)):
+                    candidates = [{"breed": b, "confidence": p * 100}
+                                  for b, p in zip(pred.breeds, pred.probs)]
+                    rows[row_i] = {"id": ids[row_i], "breed": pred.breed, "confidence": pred.confidence,
+                                   "top_k": candidates, "margin": pred.margin, "entropy": pred.entropy}
+            for row in rows:
+                writer.write(row)
+            writer.checkpoint(len(rows))
+            processed += len(rows)
+
+            now = time.perf_counter()
+            if now - last_report >= progress_every:
+                rate = processed / (now - start)
+                print(f"{writer.done} images done, {rate:.1f} img/s", file=sys.stderr)
+                last_report = now
+
+    writer.close()
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"Finished: {processed} images in {elapsed:.1f}s ({rate:.1f} img/s), "
+          f"{writer.done} total in {output}", file=sys.stderr)
+    return processed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="directory, .tar(.gz/.bz2/.xz) or .zip")
+    parser.add_argument("-o", "--output", default="results.jsonl", help=".jsonl or .csv")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--backend", default=config.INFERENCE_BACKEND)
+    parser.add_argument("--batch-size", type=int, default=config.INFERENCE_BATCH_SIZE)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--workers", type=int, help="decode workers (default: CPU count)")
+    parser.add_argument("--processes", action="store_true", help="decode in processes instead of threads")
+    parser.add_argument("--prefetch", type=int, default=2, help="batches decoded ahead of the model")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args(argv)
+
+    import backends
+    from breed_data import load_labels
+
+    model = backends.load_backend(
+        args.backend,
+        keras_path=args.model,
+        tflite_path=config.TFLITE_MODEL_PATH,
+        warmup_batch_sizes=(args.batch_size,),
+        num_threads=config.TFLITE_NUM_THREADS,
+    )
+    classify(args.source, args.output, model, load_labels(), args.batch_size, args.top_k,
+             args.workers, args.processes, args.prefetch, resume=not args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Two-stage cascade: a small first-stage model, the ResNet only when unsure.
+
+    python cascade.py calibrate labeled/ --fast dog_breed_mobilenet.keras
+    python cascade.py calibrate labeled/ --fast stage1.tflite --max-accuracy-drop 0.005
+
+The first stage must predict the same class_indices.json labels as
+MODEL_PATH (e.g. a MobileNet fine-tuned or distilled on them) and should
+take raw uint8 pixels with its own preprocessing in the graph; a float32
+input gets the ResNet preprocessing. An image is escalated to the full
+model when the first stage's top-1 probability is below min_confidence
+or its lead over the runner-up is below min_margin.
+
+calibrate runs both models over a folder whose sub-folder names are
+breeds and prints accuracy, escalation rate and mean latency for a grid
+of thresholds, so they can be picked for a target accuracy.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import config
+from prediction_cache import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+CONFIDENCE_GRID = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98)
+MARGIN_GRID = (0.0, 0.1, 0.2, 0.3, 0.5)
+
+
+def top2(probs):
+    """Top-1 probability and its lead over the runner-up, per row"""
+    if probs.shape[1] < 2:
+        return probs[:, 0], probs[:, 0]
+    best = np.partition(probs, -2, axis=1)[:, -2:]
+    return best[:, 1], best[:, 1] - best[:, 0]
+
+
+def is_confident(probs, min_confidence, min_margin):
+    """Rows the first stage can answer on its own"""
+    confidence, margin = top2(probs)
+    return (confidence >= min_confidence) & (margin >= min_margin)
+
+
+# ------------------------------------------------------
+# CASCADE MODEL
+# ------------------------------------------------------
+class CascadeModel:
+    """Backend-shaped wrapper running fast first and full only on unsure rows.
+
+    Takes raw uint8 pixels (input_dtype is np.uint8) and preprocesses
+    them for each stage, so it can replace the model anywhere a backend
+    is used, including behind the DynamicBatcher. Escalated rows get the
+    full model's probabilities, the rest keep the first stage's.
+    """
+
+    def __init__(self, fast, full, min_confidence=0.85, min_margin=0.3):
+        self.fast = fast
+        self.full = full
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.path = full.path
+        # Part of the prediction cache key: cascade answers differ from the ResNet's
+        self.name = (f"cascade:{model_fingerprint(fast.path)}:"
+                     f"{min_confidence:g}:{min_margin:g}:{full.name}")
+        self.input_dtype = np.uint8
+        # Embeddings come from the first stage, which sees every image
+        self.embedding_dim = getattr(fast, "embedding_dim", None)
+        self.warmup_report = {}
+        self.images = 0
+        self.escalated = 0
+        self._lock = threading.Lock()
+
+    def predict(self, batch, verbose=0):
+        return self._predict(batch, embeddings=False)[0]
+
+    def predict_with_embeddings(self, batch):
+        return self._predict(batch, embeddings=True)
+
+    def _predict(self, batch, embeddings):
+        import inference
+
+        pixels = np.asarray(batch, dtype=np.uint8)
+        fast_input = inference.preprocess_pixels(pixels, self.fast.input_dtype)
+        if embeddings:
+            probs, features = self.fast.predict_with_embeddings(fast_input)
+        else:
+            probs, features = self.fast.predict(fast_input), None
+        probs = np.array(probs, dtype=np.float32)
+        unsure = ~is_confident(probs, self.min_confidence, self.min_margin)
+        if unsure.any():
+            probs[unsure] = self.full.predict(
+                inference.preprocess_pixels(pixels[unsure], self.full.input_dtype)
+            )
+        with self._lock:
+            self.images += len(pixels)
+            self.escalated += int(unsure.sum())
+        return probs, features
+
+    def warm_up(self, batch_sizes=(1,)):
+        """Warm both stages and check that they predict the same classes"""
+        fast = self.fast.warm_up(batch_sizes)
+        full = self.full.warm_up(batch_sizes)
+        self.warmup_report = {
+            size: {key: fast[size][key] + full[size][key] for key in fast[size]}
+            for size in batch_sizes
+        }
+        self.check_outputs()
+        return self.warmup_report
+
+    def check_outputs(self):
+        import inference
+
+        probe = np.zeros((1, *inference.IMAGE_SIZE[::-1], 3), dtype=np.uint8)
+        fast = self.fast.predict(inference.preprocess_pixels(probe, self.fast.input_dtype))
+        full = self.full.predict(inference.preprocess_pixels(probe, self.full.input_dtype))
+        if fast.shape != full.shape:
+            raise ValueError(
+                f"First-stage model predicts {fast.shape[1]} classes, the full model {full.shape[1]}"
+            )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "images": self.images,
+                "escalated": self.escalated,
+                "escalation_rate": self.escalated / self.images if self.images else 0.0,
+                "min_confidence": self.min_confidence,
+                "min_margin": self.min_margin,
+            }
+
+
+def load_stage(path, warmup_batch_sizes=(1,), num_threads=None):
+    """Load a .keras or .tflite model as a backend"""
+    import backends
+
+    if path.endswith(".tflite"):
+        return backends.load_backend("tflite", None, tflite_path=path,
+                                     warmup_batch_sizes=warmup_batch_sizes, num_threads=num_threads)
+    return backends.load_backend("keras", path, warmup_batch_sizes=warmup_batch_sizes)
+
+
+def with_fast_model(model, fast_path=None, min_confidence=None, min_margin=None,
+                    warmup_batch_sizes=(1,), num_threads=None):
+    """Put a first stage in front of model when the fast model file exists"""
+    fast_path = fast_path if fast_path is not None else config.FAST_MODEL_PATH
+    if not fast_path or not os.path.exists(fast_path):
+        return model
+    fast = load_stage(fast_path, warmup_batch_sizes, num_threads)
+    cascade = CascadeModel(
+        fast, model,
+        config.CASCADE_MIN_CONFIDENCE if min_confidence is None else min_confidence,
+        config.CASCADE_MIN_MARGIN if min_margin is None else min_margin,
+    )
+    cascade.check_outputs()
+    logger.info("Cascade enabled: %s first, %s below %.2f confidence or %.2f margin",
+                fast_path, model.name, cascade.min_confidence, cascade.min_margin)
+    return cascade
+
+
+# ------------------------------------------------------
+# CALIBRATION
+# ------------------------------------------------------
+def labeled_images(folder, breed_index):
+    """(path, class index) for every image whose folder names a known breed"""
+    import inference
+
+    samples, unknown = [], set()
+    for path in inference.list_images(folder):
+        label = os.path.basename(os.path.dirname(path))
+        idx = breed_index.resolve(label)
+        if idx is None and label[:1] == "n" and "-" in label:
+            # Stanford Dogs folders: n02085620-Chihuahua
+            idx = breed_index.resolve(label.split("-", 1)[1])
+        if idx is None:
+            unknown.add(label)
+        else:
+            samples.append((path, idx))
+    for label in sorted(unknown):
+        logger.warning("Skipping folder %r: not a known breed", label)
+    return samples
+
+
+def run_stage(model, paths):
+    """Probabilities and per-image latency (ms) of one model, one image per call"""
+    import inference
+    from image_ingest import load_model_input
+
+    probs, latencies = [], []
+    for path in paths:
+        with open(path, "rb") as f:
+            batch = inference.preprocess_images([load_model_input(f.read())], model.input_dtype)
+        start = time.perf_counter()
+        probs.append(model.predict(batch)[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.stack(probs), np.array(latencies)
+
+
+def sweep(fast_probs, full_probs, truth, fast_ms, full_ms,
+          confidences=CONFIDENCE_GRID, margins=MARGIN_GRID):
+    """Accuracy / escalation / latency rows for every threshold pair.
+
+    Latency is the mean first-stage time plus the mean full-model time
+    for the escalated share, i.e. what a request costs on average.
+    """
+    fast_top = fast_probs.argmax(axis=1)
+    full_top = full_probs.argmax(axis=1)
+    rows = []
+    for min_confidence in confidences:
+        for min_margin in margins:
+            keep = is_confident(fast_probs, min_confidence, min_margin)
+            pred = np.where(keep, fast_top, full_top)
+            escalation = 1.0 - keep.mean()
+            rows.append({
+                "min_confidence": min_confidence,
+                "min_margin": min_margin,
+                "accuracy": float((pred == truth).mean()),
+                "escalation_rate": float(escalation),
+                "mean_ms": float(fast_ms + escalation * full_ms),
+            })
+    return rows
+
+
+def recommend(rows, target_accuracy):
+    """Cheapest row meeting the target accuracy, or the most accurate one"""
+    good = [r for r in rows if r["accuracy"] >= target_accuracy]
+    if good:
+        return min(good, key=lambda r: (r["mean_ms"], -r["accuracy"]))
+    return max(rows, key=lambda r: (r["accuracy"], -r["mean_ms"]))
+
+
+def calibrate(folder, fast_path, model_path, max_accuracy_drop=0.01, limit=None):
+    from breed_store import open_breed_index
+
+    samples = labeled_images(folder, open_breed_index())[:limit]
+    if not samples:
+        raise SystemExit(f"No labeled images found in {folder} (expected <breed>/<image> folders)")
+    paths = [p for p, _ in samples]
+    truth = np.array([idx for _, idx in samples])
+
+    fast_probs, fast_ms = run_stage(load_stage(fast_path), paths)
+    full_probs, full_ms = run_stage(load_stage(model_path), paths)
+    if fast_probs.shape != full_probs.shape:
+        raise SystemExit(f"{fast_path} and {model_path} predict different numbers of classes")
+
+    full_accuracy = float((full_probs.argmax(axis=1) == truth).mean())
+    rows = sweep(fast_probs, full_probs, truth, fast_ms.mean(), full_ms.mean())
+    return {
+        "images": len(samples),
+        "fast": {"model": fast_path, "accuracy": float((fast_probs.argmax(axis=1) == truth).mean()),
+                 "mean_ms": float(fast_ms.mean())},
+        "full": {"model": model_path, "accuracy": full_accuracy, "mean_ms": float(full_ms.mean())},
+        "grid": rows,
+        "recommended": recommend(rows, full_accuracy - max_accuracy_drop),
+    }
+
+
+def print_report(report):
+    fast, full = report["fast"], report["full"]
+    print(f"{report['images']} labeled images")
+    print(f"first stage {fast['model']}: accuracy {fast['accuracy']:.1%}, {fast['mean_ms']:.1f} ms")
+    print(f"full model  {full['model']}: accuracy {full['accuracy']:.1%}, {full['mean_ms']:.1f} ms\n")
+    print(f"{'confidence':>10} {'margin':>7} {'accuracy':>9} {'escalated':>10} {'mean ms':>8}")
+    for r in report["grid"]:
+        print(f"{r['min_confidence']:>10.2f} {r['min_margin']:>7.2f} {r['accuracy']:>9.1%} "
+              f"{r['escalation_rate']:>10.1%} {r['mean_ms']:>8.1f}")
+    best = report["recommended"]
+    print(f"\nRecommended: PAWDENTIFY_CASCADE_MIN_CONFIDENCE={best['min_confidence']:g} "
+          f"PAWDENTIFY_CASCADE_MIN_MARGIN={best['min_margin']:g} "
+          f"({best['accuracy']:.1%} accuracy, {best['escalation_rate']:.0%} escalated, "
+          f"{best['mean_ms']:.1f} ms vs {full['mean_ms']:.1f} ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("calibrate", help="accuracy / escalation / latency for a grid of thresholds")
+    p.add_argument("images", help="folder of <breed>/<image> files")
+    p.add_argument("--fast", default=config.FAST_MODEL_PATH, help="first-stage .keras or .tflite model")
+    p.add_argument("--model", default=config.MODEL_PATH)
+    p.add_argument("--max-accuracy-drop", type=float, default=0.01,
+                   help="accuracy the recommendation may give up against the full model")
+    p.add_argument("--limit", type=int)
+    p.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = calibrate(args.images, args.fast, args.model, args.max_accuracy_drop, args.limit)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
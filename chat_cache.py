@@ -0,0 +1,149 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+# ------------------------------------------------------
+# CACHE KEYS
+# ------------------------------------------------------
+def normalize_prompt(prompt):
+    """Case, whitespace and trailing punctuation don't change the answer"""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    return " ".join(text.split()).rstrip("?!. ")
+
+
+def prompt_key(prompt, model_name):
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(normalize_prompt(prompt).encode("utf-8"))
+    return h.hexdigest()
+
+
+# ------------------------------------------------------
+# RESPONSE CACHE
+# ------------------------------------------------------
+class ResponseCache:
+    """LRU + TTL cache of chatbot replies with an optional SQLite tier"""
+
+    def __init__(self, max_entries=1024, ttl=86400.0, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL)"
+            )
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remember(self, key, response, created):
+        self._entries[key] = (created, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, response = entry
+                if now - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+                self.expired += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] < self.ttl:
+                    self._remember(key, row[0], row[1])
+                    self.db_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, response, model_name=""):
+        created = time.time()
+        with self._lock:
+            self._remember(key, response, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, model_name, response, created),
+                )
+                self._db.commit()
+
+    def purge_expired(self):
+        """Drop expired rows from the SQLite tier"""
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.db_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": (self.hits + self.db_hits) / lookups if lookups else 0.0,
+            }
+
+
+# ------------------------------------------------------
+# CACHED CHAT
+# ------------------------------------------------------
+class CachedChat:
+    """Gemini client wrapper that answers repeated questions from the cache"""
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+
+    @property
+    def model_name(self):
+        return self.client.model_name
+
+    def generate(self, prompt):
+        key = prompt_key(prompt, self.client.model_name)
+        reply = self.cache.get(key)
+        if reply is None:
+            reply = self.client.generate(prompt)
+            self.cache.put(key, reply, self.client.model_name)
+        return reply
+
+    def stream(self, prompt):
+        """Yield reply chunks; only a reply streamed to the end is cached"""
+        key = prompt_key(prompt, self.client.model_name)
+        reply = self.cache.get(key)
+        if reply is not None:
+            yield reply
+            return
+        chunks = []
+        for chunk in self.client.generate_stream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(key, "".join(chunks), self.client.model_name)
+
@@ -0,0 +1,123 @@
+import re
+
+# Breed fields worth sending along with every question about a detected dog
+CONTEXT_FIELDS = (
+    "Height", "Weight", "Temperament Traits", "Exercise Needs",
+    "Shedding Level", "Common Diseases",
+)
+
+
+# ------------------------------------------------------
+# TOKEN ESTIMATES
+# ------------------------------------------------------
+def estimate_tokens(text):
+    """Rough Gemini token count (~4 characters per token for English)"""
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text, max_tokens):
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+def first_sentence(text, max_chars=160):
+    text = " ".join(text.split())
+    match = re.search(r"(?<=[.!?])\s", text)
+    sentence = text[:match.start()] if match else text
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars - 1] + "…"
+
+
+def summarize_turn(user, assistant):
+    """Extractive one-line summary of a turn; runs locally, no model call"""
+    return f"User asked: {first_sentence(user, 100)} Answer: {first_sentence(assistant)}"
+
+
+# ------------------------------------------------------
+# CONVERSATION CONTEXT
+# ------------------------------------------------------
+class ConversationContext:
+    """Per-session chat context that fits in a fixed token budget.
+
+    Recent turns are kept verbatim, newest first, while they fit in the
+    budget left after the breed block, the summary and the question.
+    Older turns are folded into a rolling summary of one line per turn,
+    itself capped at summary_tokens. The prompt size therefore stays
+    flat however long the conversation runs.
+    """
+
+    def __init__(self, max_tokens=1200, summary_tokens=200, summarizer=summarize_turn):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.turns = []
+        self.summary = []
+        self.detected = None
+        self.topic_breed = None
+
+    def set_detected_breed(self, breed, confidence=None, details=None, runners_up=()):
+        """Attach the breed from the detector as structured context"""
+        if self.detected and self.detected[0] == breed:
+            return
+        self.detected = (breed, confidence, details or {}, tuple(runners_up))
+        self.topic_breed = breed
+
+    def add_turn(self, user, assistant):
+        self.turns.append((user, assistant))
+
+    def _fold_oldest(self):
+        user, assistant = self.turns.pop(0)
+        self.summary.append(self.summarizer(user, assistant))
+        while self.summary and estimate_tokens("\n".join(self.summary)) > self.summary_tokens:
+            self.summary.pop(0)
+
+    def _breed_block(self):
+        if not self.detected:
+            return ""
+        breed, confidence, details, runners_up = self.detected
+        line = f"Detected breed: {breed.replace('_', ' ')}"
+        if confidence is not None:
+            line += f" (detector confidence {confidence:.1f}%)"
+        lines = [line]
+        if runners_up:
+            lines.append("Other possible breeds: " + ", ".join(
+                f"{b.replace('_', ' ')} ({c:.1f}%)" for b, c in runners_up))
+        facts = [f"{f}: {details[f]}" for f in CONTEXT_FIELDS if f in details]
+        return truncate_tokens("\n".join([*lines, *facts]), self.max_tokens // 4)
+
+    @staticmethod
+    def _turn_text(turn, max_tokens):
+        user, assistant = turn
+        return f"User: {user}\nAssistant: {truncate_tokens(assistant, max_tokens)}"
+
+    def build_prompt(self, question):
+        """Prompt with breed context, summary and as many recent turns as fit"""
+        breed = self._breed_block()
+        if not breed and not self.turns and not self.summary:
+            return question
+
+        # A single long reply must not crowd out everything else
+        per_turn = self.max_tokens // 3
+        fixed = estimate_tokens(breed) + estimate_tokens(question) + self.summary_tokens
+        available = max(self.max_tokens - fixed, 0)
+        recent = []
+        for turn in reversed(self.turns):
+            text = self._turn_text(turn, per_turn)
+            cost = estimate_tokens(text)
+            if cost > available:
+                break
+            recent.insert(0, text)
+            available -= cost
+        while len(self.turns) > len(recent):
+            self._fold_oldest()
+
+        sections = []
+        if breed:
+            sections.append(f"[Dog in the user's photo]\n{breed}")
+        if self.summary or recent:
+            history = []
+            if self.summary:
+                history.append("Earlier: " + " ".join(self.summary))
+            history += recent
+            sections.append("[Conversation so far]\n" + "\n".join(history))
+        sections.append(f"[Current question]\n{question}")
+        return "\n\n".join(sections)
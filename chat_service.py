@@ -0,0 +1,61 @@
+import threading
+
+import config
+from breed_kb import BreedKnowledgeBase, GroundedChat
+from breed_store import open_breed_index
+from chat_cache import CachedChat, ResponseCache
+from chat_context import ConversationContext
+from gemini_client import CircuitBreaker, ResilientClient, make_client
+
+
+# ------------------------------------------------------
+# SHARED CHAT STACK
+# ------------------------------------------------------
+# Gemini client -> timeouts/retries/limits -> response cache -> local
+# breed knowledge base, built once per process and shared by app.py and
+# pages/1_chatbot.py, so every session goes through one connection pool,
+# concurrency limit and circuit breaker.
+_shared_chat = None
+_shared_lock = threading.Lock()
+
+
+def build_chat(api_key=None, client=None):
+    client = client or make_client(api_key or config.GEMINI_API_KEY, config.GEMINI_MODEL,
+                                   config.GEMINI_BASE_URL)
+    client = ResilientClient(
+        client,
+        timeout=config.GEMINI_TIMEOUT_S,
+        max_retries=config.GEMINI_MAX_RETRIES,
+        max_concurrency=config.GEMINI_MAX_CONCURRENCY,
+        breaker=CircuitBreaker(config.GEMINI_BREAKER_FAILURES, config.GEMINI_BREAKER_RESET_S),
+    )
+    cache = ResponseCache(config.CHAT_CACHE_SIZE, config.CHAT_CACHE_TTL_S, config.CHAT_CACHE_DB)
+    chat = CachedChat(client, cache)
+    kb = BreedKnowledgeBase(open_breed_index())
+    return GroundedChat(chat, kb, answer_locally=config.CHAT_LOCAL_ANSWERS)
+
+
+def get_chat(api_key=None):
+    global _shared_chat
+    with _shared_lock:
+        if _shared_chat is None:
+            _shared_chat = build_chat(api_key)
+        return _shared_chat
+
+
+def session_context(state, key, chat):
+    """The session's ConversationContext with the detector's latest breed attached.
+
+    state is st.session_state; the Breed Detector stores its last single
+    image result there as detected_breed: a Prediction, or a (breed,
+    confidence) pair for video calls.
+    """
+    if key not in state:
+        state[key] = ConversationContext(config.CHAT_CONTEXT_TOKENS, config.CHAT_SUMMARY_TOKENS)
+    context = state[key]
+    detected = state.get("detected_breed")
+    if detected:
+        breed, conf = detected
+        context.set_detected_breed(breed, conf, chat.kb.index.details_for(breed),
+                                   getattr(detected, "runners_up", ()))
+    return context
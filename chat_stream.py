@@ -0,0 +1,45 @@
+import time
+
+
+# ------------------------------------------------------
+# STREAMED REPLIES
+# ------------------------------------------------------
+def stream_reply(chunks, on_text):
+    """Consume a chunk iterator, calling on_text(reply_so_far) after each chunk.
+
+    Returns (reply, metrics) where metrics holds the time to first token
+    and the total latency in milliseconds. If the caller stops early
+    (Streamlit raises inside on_text when the user clicks Stop), the
+    chunk iterator is closed and nothing is cached.
+    """
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    try:
+        for chunk in chunks:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(chunk)
+            on_text("".join(parts))
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+    total = time.perf_counter() - start
+    return "".join(parts), {
+        "ttft_ms": (ttft if ttft is not None else total) * 1000,
+        "total_ms": total * 1000,
+    }
+
+
+def format_metrics(metrics):
+    return f"⚡ first token {metrics['ttft_ms']:.0f} ms · total {metrics['total_ms']:.0f} ms"
+
+
+def mark_interrupted(history, text_key):
+    """Flag a reply left half-streamed by a Stop click or page change"""
+    if history and history[-1].get("streaming"):
+        history[-1]["streaming"] = False
+        history[-1]["stopped"] = True
+        if not history[-1][text_key]:
+            history[-1][text_key] = "…"
@@ -0,0 +1,185 @@
+import os
+
+
+# ------------------------------------------------------
+# ENVIRONMENT HELPERS
+# ------------------------------------------------------
+# Every setting can be overridden with a PAWDENTIFY_<NAME> environment
+# variable so the Streamlit app, scripts and workers share one config.
+def env_str(name, default=None):
+    value = os.environ.get(f"PAWDENTIFY_{name}")
+    return value if value not in (None, "") else default
+
+
+def env_int(name, default):
+    value = env_str(name)
+    return int(value) if value is not None else default
+
+
+def env_float(name, default):
+    value = env_str(name)
+    return float(value) if value is not None else default
+
+
+def env_bool(name, default=False):
+    value = env_str(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# ------------------------------------------------------
+# MODEL + DATA FILES
+# ------------------------------------------------------
+MODEL_PATH = env_str("MODEL_PATH", "dog_breed_resnet.keras")
+LABELS_PATH = env_str("LABELS_PATH", "class_indices.json")
+BREEDS_PATH = env_str("BREEDS_PATH", "120_breeds_new.json")
+DIET_PLANS_PATH = env_str("DIET_PLANS_PATH", "120_diet_plans.json")
+# The three files above compiled by breed_store.py; rebuilt when they change
+BREED_STORE_PATH = env_str("BREED_STORE_PATH", "breed_data.sqlite")
+
+
+# ------------------------------------------------------
+# PREDICTION CACHE
+# ------------------------------------------------------
+PREDICTION_CACHE_SIZE = env_int("PREDICTION_CACHE_SIZE", 512)
+# Leave unset to keep the cache in memory only
+PREDICTION_CACHE_DIR = env_str("PREDICTION_CACHE_DIR")
+
+
+# ------------------------------------------------------
+# IMAGE INGEST
+# ------------------------------------------------------
+# Uploads above this many pixels are rejected before decoding
+INGEST_MAX_PIXELS = env_int("INGEST_MAX_PIXELS", 40_000_000)
+# Longest side of the preview shown next to the prediction
+INGEST_PREVIEW_SIZE = env_int("INGEST_PREVIEW_SIZE", 800)
+
+
+# ------------------------------------------------------
+# INFERENCE
+# ------------------------------------------------------
+# Images per forward pass in bulk_classify.py; the app and serve.py batch
+# through BATCH_MAX_SIZE instead
+INFERENCE_BATCH_SIZE = env_int("INFERENCE_BATCH_SIZE", 32)
+# Batch sizes run through the model once at startup so the first real
+# request does not pay graph tracing
+WARMUP_BATCH_SIZES = tuple(
+    int(size) for size in env_str("WARMUP_BATCH_SIZES", f"1,{INFERENCE_BATCH_SIZE}").split(",")
+)
+
+# "keras" (default) or "tflite"; convert_model.py produces the .tflite files
+INFERENCE_BACKEND = env_str("INFERENCE_BACKEND", "keras")
+TFLITE_MODEL_PATH = env_str("TFLITE_MODEL_PATH", "dog_breed_resnet_int8.tflite")
+TFLITE_NUM_THREADS = env_int("TFLITE_NUM_THREADS", os.cpu_count() or 1)
+
+# Two-stage cascade: when this .keras/.tflite file exists every image goes
+# through it first, and only images it is unsure about reach the model
+# above. `python cascade.py calibrate` picks the two thresholds.
+FAST_MODEL_PATH = env_str("FAST_MODEL_PATH", "dog_breed_mobilenet.keras")
+CASCADE_MIN_CONFIDENCE = env_float("CASCADE_MIN_CONFIDENCE", 0.85)
+CASCADE_MIN_MARGIN = env_float("CASCADE_MIN_MARGIN", 0.3)
+
+# Breeds kept per prediction; the ones after the first are shown as runners-up
+PREDICTION_TOP_K = env_int("PREDICTION_TOP_K", 3)
+
+
+# ------------------------------------------------------
+# SIMILAR IMAGES
+# ------------------------------------------------------
+# Signatures and embeddings of classified images (similar_images.py);
+# leave unset to keep them in memory only
+EMBEDDING_INDEX_DIR = env_str("EMBEDDING_INDEX_DIR")
+# Images kept per index; the oldest are overwritten beyond this
+EMBEDDING_INDEX_SIZE = env_int("EMBEDDING_INDEX_SIZE", 10_000)
+# Embeddings wider than this are random-projected down before indexing
+EMBEDDING_DIM = env_int("EMBEDDING_DIM", 256)
+# Signature similarity above which an upload reuses an earlier prediction (0 = off)
+NEAR_DUPLICATE_SIMILARITY = env_float("NEAR_DUPLICATE_SIMILARITY", 0.995)
+# Earlier dogs shown in the "similar dogs" panel (0 = hide it)
+SIMILAR_DOGS = env_int("SIMILAR_DOGS", 4)
+
+
+# ------------------------------------------------------
+# VIDEO
+# ------------------------------------------------------
+# Frames classified per second of video at most; in between, frames whose
+# thumbnail changed less than VIDEO_MIN_CHANGE gray levels are skipped,
+# but a frame is still classified every VIDEO_MAX_GAP_S
+VIDEO_MAX_FPS = env_float("VIDEO_MAX_FPS", 5.0)
+VIDEO_MIN_CHANGE = env_float("VIDEO_MIN_CHANGE", 3.0)
+VIDEO_MAX_GAP_S = env_float("VIDEO_MAX_GAP_S", 2.0)
+VIDEO_MAX_FRAMES = env_int("VIDEO_MAX_FRAMES", 300)
+VIDEO_BATCH_SIZE = env_int("VIDEO_BATCH_SIZE", 8)
+# Weight of the newest frame in the smoothed probabilities
+VIDEO_EMA_ALPHA = env_float("VIDEO_EMA_ALPHA", 0.3)
+
+
+# ------------------------------------------------------
+# HISTORY
+# ------------------------------------------------------
+HISTORY_MAX_ENTRIES = env_int("HISTORY_MAX_ENTRIES", 50)
+HISTORY_THUMBNAIL_SIZE = env_int("HISTORY_THUMBNAIL_SIZE", 256)
+# Thumbnail bytes kept across every session of one server process
+HISTORY_MEMORY_BUDGET_MB = env_int("HISTORY_MEMORY_BUDGET_MB", 64)
+# SQLite file the History page reads from; every entry is also written here
+HISTORY_DB = env_str("HISTORY_DB", "history.sqlite")
+# Entries kept per browser in HISTORY_DB, and entries per History page
+HISTORY_DB_MAX_ENTRIES = env_int("HISTORY_DB_MAX_ENTRIES", 10_000)
+HISTORY_PAGE_SIZE = env_int("HISTORY_PAGE_SIZE", 10)
+
+
+# ------------------------------------------------------
+# HTTP SERVICE (serve.py)
+# ------------------------------------------------------
+SERVER_HOST = env_str("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = env_int("SERVER_PORT", 8000)
+SERVER_WORKERS = env_int("SERVER_WORKERS", 1)
+SERVER_MAX_BODY_MB = env_int("SERVER_MAX_BODY_MB", 50)
+# Dynamic batching (serve.py and the Streamlit app): flush when this many
+# images are queued or after this wait
+BATCH_MAX_SIZE = env_int("BATCH_MAX_SIZE", 32)
+BATCH_MAX_WAIT_MS = env_float("BATCH_MAX_WAIT_MS", 5.0)
+# Images allowed to wait for a batch before new requests are turned away
+BATCH_MAX_QUEUE = env_int("BATCH_MAX_QUEUE", 256)
+INFERENCE_TIMEOUT_S = env_float("INFERENCE_TIMEOUT_S", 30.0)
+
+
+# ------------------------------------------------------
+# TRACING (tracing.py)
+# ------------------------------------------------------
+# Off by default; spans then cost one attribute check each
+TRACING = env_bool("TRACING", False)
+# Prometheus text format at http://METRICS_HOST:METRICS_PORT/metrics (0 = off)
+METRICS_HOST = env_str("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = env_int("METRICS_PORT", 0)
+# One JSON line per rerun with its stage breakdown, rotated at TRACE_LOG_MAX_MB
+TRACE_LOG = env_str("TRACE_LOG")
+TRACE_LOG_MAX_MB = env_int("TRACE_LOG_MAX_MB", 10)
+
+
+# ------------------------------------------------------
+# CHATBOT
+# ------------------------------------------------------
+GEMINI_MODEL = env_str("GEMINI_MODEL", "gemini-2.0-flash")
+# Streamlit pages pass st.secrets["GEMINI_API_KEY"]; scripts fall back to this
+GEMINI_API_KEY = env_str("GEMINI_API_KEY")
+# Set to a server speaking the Gemini REST API (e.g. fake_gemini.py) to bypass the SDK
+GEMINI_BASE_URL = env_str("GEMINI_BASE_URL")
+# Whole-call deadline, including queueing and retries
+GEMINI_TIMEOUT_S = env_float("GEMINI_TIMEOUT_S", 30.0)
+GEMINI_MAX_RETRIES = env_int("GEMINI_MAX_RETRIES", 3)
+# Concurrent Gemini calls per process, shared by all sessions
+GEMINI_MAX_CONCURRENCY = env_int("GEMINI_MAX_CONCURRENCY", 8)
+# Consecutive failures before failing fast, and the cool-down before a retry probe
+GEMINI_BREAKER_FAILURES = env_int("GEMINI_BREAKER_FAILURES", 5)
+GEMINI_BREAKER_RESET_S = env_float("GEMINI_BREAKER_RESET_S", 30.0)
+CHAT_CACHE_SIZE = env_int("CHAT_CACHE_SIZE", 1024)
+CHAT_CACHE_TTL_S = env_float("CHAT_CACHE_TTL_S", 24 * 3600)
+# Leave unset to keep cached replies in memory only
+CHAT_CACHE_DB = env_str("CHAT_CACHE_DB")
+# Answer breed fact questions from the local breed data before calling Gemini
+CHAT_LOCAL_ANSWERS = env_bool("CHAT_LOCAL_ANSWERS", True)
+# Prompt budget for follow-up context; older turns are folded into a summary
+CHAT_CONTEXT_TOKENS = env_int("CHAT_CONTEXT_TOKENS", 1200)
+CHAT_SUMMARY_TOKENS = env_int("CHAT_SUMMARY_TOKENS", 200)
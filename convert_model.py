@@ -0,0 +1,211 @@
+"""Export the Keras ResNet to TFLite and compare backends.
+
+    python convert_model.py fuse
+    python convert_model.py convert --calibration-dir samples/
+    python convert_model.py parity --images samples/ \
+        --backend keras --backend tflite:dog_breed_resnet_int8.tflite
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import config
+
+
+# ------------------------------------------------------
+# CONVERSION
+# ------------------------------------------------------
+def representative_dataset(image_paths, samples, dtype):
+    """Calibration generator for int8 quantization.
+
+    dtype is the model's input dtype, so a fused uint8-input model is
+    calibrated on raw pixels and a float32 one on ResNet-preprocessed input.
+    """
+    import inference
+    from image_ingest import load_model_input
+
+    paths = list(image_paths)
+    random.Random(0).shuffle(paths)
+
+    def gen():
+        for path in paths[:samples]:
+            with open(path, "rb") as f:
+                yield [inference.preprocess_images([load_model_input(f.read())], dtype)]
+
+    return gen
+
+
+def convert(model_path, out_dir, variants, calibration_dir=None, samples=200):
+    import tensorflow as tf
+
+    import inference
+
+    model = tf.keras.models.load_model(model_path)
+    base = os.path.splitext(os.path.basename(model_path))[0]
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for variant in variants:
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        if variant == "float16":
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.target_spec.supported_types = [tf.float16]
+        elif variant == "int8":
+            if not calibration_dir:
+                raise SystemExit("int8 conversion needs --calibration-dir with sample images")
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = representative_dataset(
+                inference.list_images(calibration_dir), samples, inference.model_input_dtype(model)
+            )
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        elif variant != "float32":
+            raise SystemExit(f"Unknown variant {variant!r}")
+        path = os.path.join(out_dir, f"{base}_{variant}.tflite")
+        with open(path, "wb") as f:
+            f.write(converter.convert())
+        size_mb = os.path.getsize(path) / 2**20
+        print(f"Wrote {path} ({size_mb:.1f} MB)")
+        written.append(path)
+    return written
+
+
+def fuse(model_path, out_path=None):
+    """Save a variant with ResNet preprocessing inside the graph (uint8 input)"""
+    import tensorflow as tf
+
+    import inference
+
+    out_path = out_path or f"{os.path.splitext(model_path)[0]}_uint8.keras"
+    fused = inference.fuse_preprocessing(tf.keras.models.load_model(model_path))
+    fused.save(out_path)
+    print(f"Wrote {out_path}")
+    return out_path
+
+
+# ------------------------------------------------------
+# PARITY CHECK
+# ------------------------------------------------------
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(spec, image_paths):
+    """Load one backend and time it image by image (runs in a fresh process)"""
+    import backends
+    import inference
+    from image_ingest import load_model_input
+
+    name, _, path = spec.partition(":")
+    rss_before = current_rss_mb()
+    backend = backends.load_backend(
+        name,
+        keras_path=path or config.MODEL_PATH,
+        tflite_path=path or config.TFLITE_MODEL_PATH,
+        num_threads=config.TFLITE_NUM_THREADS,
+    )
+    rss_loaded = current_rss_mb()
+
+    top1, latencies = [], []
+    for p in image_paths:
+        with open(p, "rb") as f:
+            batch = inference.preprocess_images([load_model_input(f.read())], backend.input_dtype)
+        start = time.perf_counter()
+        probs = backend.predict(batch)
+        latencies.append((time.perf_counter() - start) * 1000)
+        top1.append(int(probs[0].argmax()))
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "backend": spec,
+        "top1": top1,
+        "p50_ms": latencies[n // 2] if n else 0.0,
+        "p99_ms": latencies[min(n - 1, int(n * 0.99))] if n else 0.0,
+        "model_rss_mb": rss_loaded - rss_before,
+        "total_rss_mb": current_rss_mb(),
+    }
+
+
+def parity(specs, image_dir, limit=None):
+    import inference
+
+    image_paths = inference.list_images(image_dir)[:limit]
+    if not image_paths:
+        raise SystemExit(f"No images found in {image_dir}")
+    # A fresh process per backend keeps the RSS numbers independent
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for spec in specs:
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(run_backend, (spec, image_paths)))
+
+    reference = results[0]["top1"]
+    report = []
+    for r in results:
+        agree = sum(a == b for a, b in zip(reference, r["top1"])) / len(reference)
+        report.append({
+            "backend": r["backend"],
+            "top1_agreement": agree,
+            "p50_ms": r["p50_ms"],
+            "p99_ms": r["p99_ms"],
+            "model_rss_mb": r["model_rss_mb"],
+            "total_rss_mb": r["total_rss_mb"],
+        })
+    return report
+
+
+# ------------------------------------------------------
+# CLI
+# ------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("fuse", help="save a uint8-input model with preprocessing in the graph")
+    p.add_argument("--model", default=config.MODEL_PATH)
+    p.add_argument("--out", help="default: <model>_uint8.keras")
+
+    p = sub.add_parser("convert", help="export TFLite variants of the Keras model")
+    p.add_argument("--model", default=config.MODEL_PATH)
+    p.add_argument("--out-dir", default=".")
+    p.add_argument("--variants", nargs="+", default=["float16", "int8"],
+                   choices=["float32", "float16", "int8"])
+    p.add_argument("--calibration-dir", help="sample images for int8 calibration")
+    p.add_argument("--calibration-samples", type=int, default=200)
+
+    p = sub.add_parser("parity", help="compare top-1 agreement, latency and RSS")
+    p.add_argument("--images", required=True, help="folder of test images")
+    p.add_argument("--backend", action="append", dest="backends",
+                   help="keras[:path] or tflite:path; the first one is the reference")
+    p.add_argument("--limit", type=int)
+    p.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    args = parser.parse_args(argv)
+    if args.command == "fuse":
+        fuse(args.model, args.out)
+    elif args.command == "convert":
+        convert(args.model, args.out_dir, args.variants,
+                args.calibration_dir, args.calibration_samples)
+    else:
+        report = parity(args.backends or ["keras"], args.images, args.limit)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print(f"{'backend':45} {'top1':>7} {'p50 ms':>8} {'p99 ms':>8} {'model MB':>9} {'RSS MB':>8}")
+            for r in report:
+                print(f"{r['backend']:45} {r['top1_agreement']:7.2%} {r['p50_ms']:8.2f} "
+                      f"{r['p99_ms']:8.2f} {r['model_rss_mb']:9.1f} {r['total_rss_mb']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
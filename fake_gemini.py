@@ -0,0 +1,153 @@
+"""Local stand-in for the Gemini REST API.
+
+    python fake_gemini.py --port 8765
+    PAWDENTIFY_GEMINI_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Answers POST /v1beta/models/<model>:generateContent and
+:streamGenerateContent?alt=sse with a canned reply (streamed word by
+word) and counts requests at GET /stats, so the chat flow and response
+cache can be exercised without network access or an API key.
+
+--latency-ms delays every reply and --error-rate answers that fraction
+of requests with --error-status, to exercise client timeouts, retries
+and the circuit breaker:
+
+    python fake_gemini.py --latency-ms 2000 --error-rate 0.3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def fake_reply(model, prompt):
+    return f"[{model}] Woof! You asked: {prompt}"
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can reuse connections; without TCP_NODELAY the
+    # separate header and body writes stall ~40 ms on delayed ACKs
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats["connections"] += 1
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/stats":
+            self._send_json(HTTPStatus.OK, dict(self.server.stats))
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        # Read the body first so the connection stays usable whatever the reply
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        path = urlparse(self.path).path
+        prefix = "/v1beta/models/"
+        if not path.startswith(prefix) or ":" not in path:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": {"message": "Not found"}})
+            return
+        model, _, method = path[len(prefix):].partition(":")
+        prompt = "".join(
+            p.get("text", "")
+            for c in payload.get("contents", [])[-1:]
+            for p in c.get("parts", [])
+        )
+        server = self.server
+        with server.lock:
+            server.stats["requests"] += 1
+            fail = server.random.random() < server.error_rate
+            if fail:
+                server.stats["errors"] += 1
+
+        time.sleep(server.latency)
+        if fail:
+            self._send_json(server.error_status, {"error": {"message": "Injected failure"}})
+            return
+
+        if method == "generateContent":
+            self._send_json(HTTPStatus.OK, candidate(self.server.reply(model, prompt)))
+        elif method == "streamGenerateContent":
+            self._stream(self.server.reply(model, prompt))
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": {"message": f"Unknown method {method}"}})
+
+    def _stream(self, text):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            chunk = word if i == len(words) - 1 else word + " "
+            self.wfile.write(b"data: " + json.dumps(candidate(chunk)).encode("utf-8") + b"\r\n\r\n")
+            self.wfile.flush()
+            time.sleep(self.server.chunk_delay)
+        self.close_connection = True
+
+
+def candidate(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+def start_fake_server(host="127.0.0.1", port=0, reply=fake_reply, chunk_delay_ms=20,
+                      latency_ms=0, error_rate=0.0, error_status=503, seed=None):
+    """Start the fake server in a daemon thread; returns (server, base_url).
+
+    latency, error_rate and error_status can be changed on the returned
+    server while it runs.
+    """
+    server = ThreadingHTTPServer((host, port), FakeGeminiHandler)
+    server.daemon_threads = True
+    server.reply = reply
+    server.chunk_delay = chunk_delay_ms / 1000
+    server.latency = latency_ms / 1000
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.random = random.Random(seed)
+    server.stats = {"requests": 0, "errors": 0, "connections": 0}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chunk-delay-ms", type=float, default=20, help="pause between streamed words")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay before every reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    args = parser.parse_args(argv)
+    server, url = start_fake_server(
+        args.host, args.port, chunk_delay_ms=args.chunk_delay_ms, latency_ms=args.latency_ms,
+        error_rate=args.error_rate, error_status=args.error_status,
+    )
+    print(f"Fake Gemini listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
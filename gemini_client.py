@@ -0,0 +1,350 @@
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Shown in the chat instead of a stack trace when Gemini can't be reached
+UNAVAILABLE_MESSAGE = "🐾 The dog expert is taking a short nap - Gemini isn't responding right now. Please try again in a minute."
+BUSY_MESSAGE = "🐾 Lots of dog questions right now! Please try again in a moment."
+
+# Rate limits, timeouts and server-side failures are worth another attempt
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+# ------------------------------------------------------
+# ERRORS
+# ------------------------------------------------------
+class GeminiError(RuntimeError):
+    """Non-200 response from the Gemini REST API"""
+
+    def __init__(self, code, message):
+        super().__init__(f"Gemini returned HTTP {code}: {message}")
+        self.code = code
+
+
+class GeminiUnavailable(RuntimeError):
+    """Gemini is down, overloaded or the circuit breaker is open; str() is user-facing"""
+
+
+def is_retryable(exc):
+    if isinstance(exc, (TimeoutError, ConnectionError, http.client.HTTPException)):
+        return True
+    # GeminiError and google.api_core exceptions both carry the HTTP status as .code
+    return getattr(exc, "code", None) in RETRY_STATUSES
+
+
+# ------------------------------------------------------
+# GEMINI CLIENTS
+# ------------------------------------------------------
+# Both clients expose model_name, generate(prompt, timeout) -> str and
+# generate_stream(prompt, timeout) -> iterator of text chunks, so the chat
+# pages, the response cache and the fake server tests share one interface.
+class GenAIClient:
+    """google.generativeai SDK client.
+
+    The SDK (and the gRPC stack under it) is imported on the first call,
+    so building the chat stack doesn't slow down app startup.
+    """
+
+    def __init__(self, api_key, model_name):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    @staticmethod
+    def _options(timeout):
+        return {"timeout": timeout} if timeout else None
+
+    def generate(self, prompt, timeout=None):
+        return self.model.generate_content(prompt, request_options=self._options(timeout)).text
+
+    def generate_stream(self, prompt, timeout=None):
+        response = self.model.generate_content(
+            prompt, stream=True, request_options=self._options(timeout)
+        )
+        for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, reused across threads"""
+
+    def __init__(self, base_url, max_idle=8):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self, timeout):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=timeout)
+
+    def request(self, path, body, headers, timeout):
+        """POST and return (connection, response) once the status line arrives"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request("POST", self.prefix + path, body, headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle connection; retry once on a fresh one
+                conn.close()
+        conn = self._connect(timeout)
+        try:
+            conn.request("POST", self.prefix + path, body, headers)
+            return conn, conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+
+    def release(self, conn, response):
+        """Return a fully read connection to the pool, or close it"""
+        if not response.will_close and response.isclosed():
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(conn)
+                    return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class RestClient:
+    """Plain REST client for the generateContent endpoint.
+
+    Points at any server speaking the Gemini v1beta REST API, such as
+    the local stand-in in fake_gemini.py. Connections are kept alive and
+    shared through a ConnectionPool.
+    """
+
+    def __init__(self, api_key, model_name, base_url, max_idle=8):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.pool = ConnectionPool(base_url, max_idle)
+
+    def _post(self, method, prompt, timeout, query=""):
+        path = f"/v1beta/models/{self.model_name}:{method}{query}"
+        body = json.dumps(prompt_payload(prompt)).encode("utf-8")
+        headers = {"Content-Type": "application/json", "x-goog-api-key": self.api_key or ""}
+        conn, resp = self.pool.request(path, body, headers, timeout)
+        if resp.status != 200:
+            data = resp.read()
+            self.pool.release(conn, resp)
+            raise GeminiError(resp.status, error_message(data))
+        return conn, resp
+
+    def generate(self, prompt, timeout=None):
+        conn, resp = self._post("generateContent", prompt, timeout)
+        try:
+            data = json.loads(resp.read())
+        except BaseException:
+            conn.close()
+            raise
+        self.pool.release(conn, resp)
+        return response_text(data)
+
+    def generate_stream(self, prompt, timeout=None):
+        # alt=sse returns one "data: {...}" server-sent event per chunk;
+        # timeout applies to each read, so a long reply isn't cut off
+        conn, resp = self._post("streamGenerateContent", prompt, timeout, "?alt=sse")
+        try:
+            for line in resp:
+                if line.startswith(b"data:"):
+                    text = response_text(json.loads(line[5:]))
+                    if text:
+                        yield text
+        except BaseException:
+            conn.close()
+            raise
+        self.pool.release(conn, resp)
+
+
+def prompt_payload(prompt):
+    return {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+
+
+def response_text(data):
+    """Concatenate the text parts of the first candidate of a REST response"""
+    candidates = data.get("candidates") or []
+    if not candidates:
+        raise ValueError("Gemini returned no candidates")
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(p.get("text", "") for p in parts)
+
+
+def error_message(data):
+    try:
+        return json.loads(data)["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        return data[:200].decode("utf-8", "replace")
+
+
+def make_client(api_key, model_name, base_url=None):
+    """REST client when a base URL is configured, the official SDK otherwise"""
+    if base_url:
+        return RestClient(api_key, model_name, base_url)
+    return GenAIClient(api_key, model_name)
+
+
+# ------------------------------------------------------
+# RESILIENCE
+# ------------------------------------------------------
+class CircuitBreaker:
+    """Fails fast after failure_threshold consecutive failures.
+
+    While open, calls are rejected for reset_after seconds. After that one
+    call is let through as a probe (and the rest held back for another
+    cool-down); a success closes the breaker, a failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_after=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.reset_after else "half-open"
+
+    def check(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_after:
+                self.rejected += 1
+                raise GeminiUnavailable(UNAVAILABLE_MESSAGE)
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ResilientClient:
+    """Deadline, retries, concurrency limit and circuit breaker around a client.
+
+    Every call gets timeout seconds in total, including time spent queued
+    for one of max_concurrency slots (shared by all sessions of the
+    process) and backoff between attempts. Retryable failures are retried
+    up to max_retries times with full-jitter exponential backoff. A stream
+    is only retried before its first chunk; after that, the per-read
+    timeout bounds each wait. Exhausted retries, a full queue and an open
+    breaker raise GeminiUnavailable with a message fit for the chat.
+    """
+
+    def __init__(self, client, timeout=30.0, max_retries=3, backoff=0.5, max_backoff=8.0,
+                 max_concurrency=8, breaker=None):
+        self.client = client
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.retries = 0
+
+    @property
+    def model_name(self):
+        return self.client.model_name
+
+    def _admit(self, deadline):
+        """Take a concurrency slot; returns the time left for the attempt"""
+        self.breaker.check()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not self._slots.acquire(timeout=remaining):
+            raise GeminiUnavailable(BUSY_MESSAGE)
+        return max(deadline - time.monotonic(), 0.001)
+
+    def _backoff_after(self, exc, attempt, deadline):
+        """Delay before the next attempt; raises when exc should not be retried"""
+        if not is_retryable(exc):
+            # Gemini answered (bad request, auth...): the service itself is up
+            self.breaker.record_success()
+            raise exc
+        self.breaker.record_failure()
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+            raise GeminiUnavailable(UNAVAILABLE_MESSAGE) from exc
+        self.retries += 1
+        return delay
+
+    def generate(self, prompt):
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = self._admit(deadline)
+            try:
+                reply = self.client.generate(prompt, timeout=remaining)
+            except Exception as e:
+                delay = self._backoff_after(e, attempt, deadline)
+            else:
+                self.breaker.record_success()
+                return reply
+            finally:
+                self._slots.release()
+            time.sleep(delay)
+            attempt += 1
+
+    def generate_stream(self, prompt):
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = self._admit(deadline)
+            chunks = self.client.generate_stream(prompt, timeout=remaining)
+            started = False
+            try:
+                for chunk in chunks:
+                    if not started:
+                        started = True
+                        self.breaker.record_success()
+                    yield chunk
+                if not started:
+                    self.breaker.record_success()
+                return
+            except Exception as e:
+                if started:
+                    raise
+                delay = self._backoff_after(e, attempt, deadline)
+            finally:
+                chunks.close()
+                self._slots.release()
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,292 @@
+import io
+import json
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------
+# THUMBNAILS
+# ------------------------------------------------------
+def make_thumbnail(img, size=256, quality=80):
+    """Compress a PIL image into a small JPEG thumbnail"""
+    thumb = img.copy()
+    thumb.thumbnail((size, size))
+    if thumb.mode != "RGB":
+        thumb = thumb.convert("RGB")
+    buf = io.BytesIO()
+    thumb.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+# ------------------------------------------------------
+# HISTORY ENTRIES
+# ------------------------------------------------------
+class HistoryEntry:
+    __slots__ = ("key", "breed", "conf", "thumbnail", "created", "runners_up")
+
+    def __init__(self, key, breed, conf, thumbnail, created=None, runners_up=()):
+        self.key = key
+        self.breed = breed
+        self.conf = conf
+        self.thumbnail = thumbnail
+        self.created = created if created is not None else time.time()
+        # (breed, confidence %) pairs after the top-1
+        self.runners_up = tuple(runners_up)
+
+    @property
+    def nbytes(self):
+        return len(self.thumbnail)
+
+
+# ------------------------------------------------------
+# PROCESS-WIDE MEMORY BUDGET
+# ------------------------------------------------------
+class MemoryBudget:
+    """Caps the thumbnail bytes held by every session history in the process.
+
+    Histories are tracked through weak references, so a history is
+    forgotten as soon as its Streamlit session goes away. When the total
+    goes over max_bytes the oldest entries across all sessions are dropped.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._histories = weakref.WeakSet()
+        self.lock = threading.RLock()
+
+    def register(self, history):
+        with self.lock:
+            self._histories.add(history)
+
+    def used_bytes(self):
+        with self.lock:
+            return sum(h.nbytes for h in self._histories)
+
+    def enforce(self):
+        with self.lock:
+            used = self.used_bytes()
+            while used > self.max_bytes:
+                candidates = [h for h in self._histories if len(h)]
+                if not candidates:
+                    break
+                oldest = min(candidates, key=lambda h: h.oldest().created)
+                used -= oldest.evict_oldest().nbytes
+
+
+# ------------------------------------------------------
+# SESSION HISTORY
+# ------------------------------------------------------
+class SessionHistory:
+    """Per-session prediction history, deduplicated by image content hash.
+
+    With a HistoryStore every entry is also written there under owner,
+    so it outlives the session and the in-memory limits. Re-adding an
+    image only rewrites its row once STORE_REFRESH_S has passed since the
+    last write, so reruns of the same upload don't each cost a commit.
+    """
+
+    STORE_REFRESH_S = 60
+
+    def __init__(self, max_entries=50, budget=None, thumbnail_size=256, store=None, owner=None):
+        self.max_entries = max_entries
+        self.thumbnail_size = thumbnail_size
+        self.budget = budget
+        self.store = store
+        self.owner = owner
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._stored_at = {}
+        self._lock = budget.lock if budget else threading.RLock()
+        if budget:
+            budget.register(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        """Entries from newest to oldest"""
+        with self._lock:
+            return iter(list(reversed(self._entries.values())))
+
+    def oldest(self):
+        return next(iter(self._entries.values()))
+
+    def evict_oldest(self):
+        with self._lock:
+            key, entry = self._entries.popitem(last=False)
+            self._stored_at.pop(key, None)
+            self.nbytes -= entry.nbytes
+            return entry
+
+    def add(self, key, img, breed, conf, runners_up=()):
+        """Record a prediction; re-adding a known image only refreshes its position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.created = time.time()
+                self._entries.move_to_end(key)
+        if entry is not None:
+            self._store(entry)
+            return entry
+
+        thumbnail = make_thumbnail(img, self.thumbnail_size)
+        entry = HistoryEntry(key, breed, conf, thumbnail, runners_up=runners_up)
+        with self._lock:
+            self._entries[key] = entry
+            self.nbytes += entry.nbytes
+            while len(self._entries) > self.max_entries:
+                self.evict_oldest()
+        self._store(entry)
+        if self.budget:
+            self.budget.enforce()
+        return entry
+
+    def _store(self, entry):
+        if self.store is None:
+            return
+        with self._lock:
+            stored_at = self._stored_at.get(entry.key)
+            if stored_at is not None and entry.created - stored_at < self.STORE_REFRESH_S:
+                return
+            self._stored_at[entry.key] = entry.created
+        self.store.add(self.owner, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stored_at.clear()
+            self.nbytes = 0
+
+
+# ------------------------------------------------------
+# PERSISTENT STORE
+# ------------------------------------------------------
+class HistoryStore:
+    """Every owner's history in one SQLite (WAL) file, read a page at a time.
+
+    Pages are keyset-paginated on (created, id) and both indexes carry
+    conf, so a page costs the same however long the history is, and the
+    breed and confidence filters are answered from the index without
+    touching thumbnails. Each owner keeps about max_entries rows: the
+    excess is trimmed on the owner's first write in this process and then
+    every PRUNE_EVERY of its writes, since finding the cutoff walks
+    max_entries index entries.
+    path=None keeps the store in memory for the life of the process.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path=None, max_entries=10_000):
+        self.max_entries = max_entries
+        # Writes per owner since the process started
+        self._writes = Counter()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        try:
+            if path:
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+            self._create_tables()
+        except sqlite3.Error:
+            self._db.close()
+            raise
+
+    def _create_tables(self):
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY,
+                owner TEXT NOT NULL,
+                key TEXT NOT NULL,
+                breed TEXT NOT NULL,
+                conf REAL NOT NULL,
+                runners_up TEXT NOT NULL DEFAULT '[]',
+                created REAL NOT NULL,
+                thumbnail BLOB NOT NULL,
+                UNIQUE (owner, key)
+            );
+            CREATE INDEX IF NOT EXISTS history_recent ON history (owner, created, id, conf);
+            CREATE INDEX IF NOT EXISTS history_breed ON history (owner, breed, created, id, conf);
+        """)
+        self._db.commit()
+
+    def add(self, owner, entry):
+        """Insert an entry, or move an image already in the owner's history to the top"""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO history (owner, key, breed, conf, runners_up, created, thumbnail) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (owner, key) DO UPDATE SET created = excluded.created",
+                (owner, entry.key, entry.breed, entry.conf, json.dumps(entry.runners_up),
+                 entry.created, entry.thumbnail),
+            )
+            self._writes[owner] += 1
+            if (self._writes[owner] - 1) % self.PRUNE_EVERY == 0:
+                self._prune(owner)
+            self._db.commit()
+
+    def _prune(self, owner):
+        # The newest row past max_entries; it and everything older is dropped
+        cutoff = self._db.execute(
+            "SELECT created, id FROM history WHERE owner = ? "
+            "ORDER BY created DESC, id DESC LIMIT 1 OFFSET ?",
+            (owner, self.max_entries),
+        ).fetchone()
+        if cutoff:
+            self._db.execute(
+                "DELETE FROM history WHERE owner = ? AND (created, id) <= (?, ?)", (owner, *cutoff))
+
+    def page(self, owner, breed=None, min_conf=0.0, cursor=None, limit=10):
+        """(entries newest first, cursor for the next page or None)
+
+        cursor is the value returned with the previous page.
+        """
+        where, params = ["owner = ?"], [owner]
+        if breed:
+            where.append("breed = ?")
+            params.append(breed)
+        if min_conf:
+            where.append("conf >= ?")
+            params.append(min_conf)
+        if cursor:
+            where.append("(created, id) < (?, ?)")
+            params.extend(cursor)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, key, breed, conf, runners_up, created, thumbnail FROM history "
+                f"WHERE {' AND '.join(where)} ORDER BY created DESC, id DESC LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        entries = [
+            HistoryEntry(key, breed, conf, thumbnail, created, [tuple(r) for r in json.loads(runners_up)])
+            for _, key, breed, conf, runners_up, created, thumbnail in rows[:limit]
+        ]
+        next_cursor = (rows[limit - 1][5], rows[limit - 1][0]) if len(rows) > limit else None
+        return entries, next_cursor
+
+    def count(self, owner):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM history WHERE owner = ?", (owner,)).fetchone()[0]
+
+    def clear(self, owner):
+        with self._lock:
+            self._db.execute("DELETE FROM history WHERE owner = ?", (owner,))
+            self._db.commit()
+
+
+def open_history_store(path, max_entries=10_000):
+    """HistoryStore at path, or an in-memory one when the file can't be opened.
+
+    A read-only or missing directory then costs persistence across
+    restarts, not the History page.
+    """
+    try:
+        return HistoryStore(path, max_entries)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("History store %s unavailable (%s); keeping history in memory", path, e)
+        return HistoryStore(None, max_entries)
@@ -0,0 +1,78 @@
+import io
+
+from PIL import Image
+
+import config
+
+MODEL_SIZE = (224, 224)
+# The decode is kept at least this large so the final resize to
+# MODEL_SIZE still does the antialiasing, whatever the preview size
+MODEL_DECODE_SIZE = 2 * MODEL_SIZE[0]
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+# ------------------------------------------------------
+# INGESTED IMAGE
+# ------------------------------------------------------
+class IngestedImage:
+    """One decode of an upload: the 224x224 model input plus a display preview"""
+
+    __slots__ = ("model_input", "preview", "original_size", "format")
+
+    def __init__(self, model_input, preview, original_size, format):
+        self.model_input = model_input
+        self.preview = preview
+        self.original_size = original_size
+        self.format = format
+
+
+# ------------------------------------------------------
+# DECODING
+# ------------------------------------------------------
+def ingest(data, preview_size=config.INGEST_PREVIEW_SIZE, max_pixels=config.INGEST_MAX_PIXELS):
+    """Decode image bytes at the smallest resolution the preview and model need.
+
+    Only the header is read before the pixel-count check. JPEGs are then
+    decoded with draft(), which lets libjpeg scale by 1/2, 1/4 or 1/8
+    while decoding, so a 12 MP photo never exists at full size in memory.
+    Other formats are decoded once and reduce()d by an integer factor.
+    Either way both sides stay at least max(preview_size,
+    MODEL_DECODE_SIZE), and the model input is resized straight from that
+    decode, so it is the same image (up to resampling noise) with or
+    without a preview. Pass preview_size=None when only the model input
+    is needed.
+    """
+    img = Image.open(io.BytesIO(data))
+    width, height = img.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(
+            f"Image is {width}x{height} ({width * height / 1e6:.0f} MP); "
+            f"the limit is {max_pixels / 1e6:.0f} MP"
+        )
+    fmt = img.format
+
+    target = max(preview_size or 0, MODEL_DECODE_SIZE)
+    if fmt == "JPEG":
+        img.draft("RGB", (target, target))
+    if img.mode not in ("RGB", "RGBA", "L"):
+        img = img.convert("RGB")
+    factor = min(img.size) // target
+    if factor > 1:
+        img = img.reduce(factor)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    model_input = img.resize(MODEL_SIZE, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    preview = None
+    if preview_size:
+        img.thumbnail((preview_size, preview_size), Image.Resampling.BILINEAR)
+        preview = img
+    return IngestedImage(model_input, preview, (width, height), fmt)
+
+
+def load_model_input(data):
+    """224x224 RGB image for the model, decoded at reduced resolution"""
+    return ingest(data, preview_size=None).model_input
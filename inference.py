@@ -0,0 +1,218 @@
+import logging
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from predictions import decode_batch
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+IMAGE_SIZE = (224, 224)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+# ImageNet channel means in BGR order, as used by keras' ResNet preprocess_input
+RESNET_MEAN_BGR = np.array([103.939, 116.779, 123.68], dtype=np.float32)
+
+
+# ------------------------------------------------------
+# PREPROCESSING
+# ------------------------------------------------------
+def list_images(folder):
+    """Sorted paths of every supported image file below folder"""
+    paths = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def stack_pixels(images):
+    """Resize PIL images into one contiguous (N, 224, 224, 3) uint8 batch"""
+    pixels = np.empty((len(images), IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.uint8)
+    for i, img in enumerate(images):
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != IMAGE_SIZE:
+            img = img.resize(IMAGE_SIZE)
+        pixels[i] = np.asarray(img)
+    return pixels
+
+
+def preprocess_pixels(pixels, dtype=np.float32):
+    """Prepare a uint8 RGB batch for a model taking `dtype` input.
+
+    Models with preprocessing fused into the graph take the uint8 pixels
+    as they are. Otherwise this matches keras' ResNet preprocess_input
+    (RGB -> BGR, minus the ImageNet channel means) with one float32 copy
+    and an in-place subtraction over the whole batch.
+    """
+    if dtype == np.uint8:
+        return pixels
+    batch = pixels[..., ::-1].astype(np.float32)
+    batch -= RESNET_MEAN_BGR
+    return batch
+
+
+def preprocess_images(images, dtype=np.float32):
+    return preprocess_pixels(stack_pixels(images), dtype)
+
+
+# ------------------------------------------------------
+# FUSED PREPROCESSING
+# ------------------------------------------------------
+@tf.keras.utils.register_keras_serializable(package="pawdentify")
+class ResNetPreprocess(tf.keras.layers.Layer):
+    """In-graph ResNet preprocessing for raw uint8 RGB input"""
+
+    def call(self, inputs):
+        x = tf.cast(inputs, tf.float32)
+        return tf.reverse(x, axis=[-1]) - tf.constant(RESNET_MEAN_BGR)
+
+
+def fuse_preprocessing(model):
+    """Wrap a float32 ResNet so it accepts uint8 pixels directly"""
+    inputs = tf.keras.Input(shape=(IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype="uint8")
+    outputs = model(ResNetPreprocess()(inputs))
+    return tf.keras.Model(inputs, outputs, name=f"{model.name}_uint8")
+
+
+def model_input_dtype(model):
+    """np.uint8 for models with fused preprocessing, np.float32 otherwise"""
+    return np.uint8 if tf.as_dtype(model.inputs[0].dtype) == tf.uint8 else np.float32
+
+
+def embedding_model(model):
+    """Model returning (probabilities, input of the final layer), or None.
+
+    Descends into a nested model in the last position (e.g. the ResNet
+    wrapped by fuse_preprocessing) by replaying the layers before it.
+    """
+    last = model.layers[-1]
+    if isinstance(last, tf.keras.Model):
+        inner = embedding_model(last)
+        if inner is None:
+            return None
+        x = model.inputs[0]
+        for layer in model.layers[:-1]:
+            if not isinstance(layer, tf.keras.layers.InputLayer):
+                x = layer(x)
+        return tf.keras.Model(model.inputs, inner(x))
+    features = last.input
+    if len(features.shape) != 2:
+        return None
+    return tf.keras.Model(model.inputs, [model.outputs[0], features])
+
+
+# ------------------------------------------------------
+# COMPILED MODEL
+# ------------------------------------------------------
+class CompiledModel:
+    """Keras model behind a tf.function with a fixed (None, 224, 224, 3) signature.
+
+    Calling the graph directly skips the data adapter and callback setup
+    that model.predict() builds on every call, and warm_up() pays graph
+    tracing and first-run kernel setup before the first real request.
+    """
+
+    name = "keras"
+
+    def __init__(self, model, path=None):
+        self.model = model
+        self.path = path
+        self.warmup_report = {}
+        self.input_dtype = model_input_dtype(model)
+        self._tf_dtype = tf.as_dtype(self.input_dtype)
+        signature = [tf.TensorSpec((None, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), self._tf_dtype)]
+        self._fn = tf.function(lambda x: model(x, training=False), input_signature=signature)
+        # Same forward pass, also returning the input of the classifier layer
+        self.embedding_dim = None
+        self._embed_fn = None
+        try:
+            dual = embedding_model(model)
+        except (AttributeError, ValueError, TypeError):
+            dual = None
+        if dual is not None:
+            self.embedding_dim = int(dual.outputs[1].shape[-1])
+            self._embed_fn = tf.function(lambda x: dual(x, training=False), input_signature=signature)
+        else:
+            logger.info("No penultimate-layer embedding available for %s", path)
+
+    def predict(self, batch, verbose=0):
+        return self._fn(tf.convert_to_tensor(batch, dtype=self._tf_dtype)).numpy()
+
+    def predict_with_embeddings(self, batch):
+        """(probabilities, penultimate-layer embeddings) from one forward pass"""
+        probs, features = self._embed_fn(tf.convert_to_tensor(batch, dtype=self._tf_dtype))
+        return probs.numpy(), features.numpy()
+
+    def warm_up(self, batch_sizes=(1,)):
+        self.warmup_report = warm_up(self, batch_sizes)
+        if self._embed_fn is not None:
+            for size in batch_sizes:
+                self.predict_with_embeddings(
+                    np.zeros((size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=self.input_dtype))
+        return self.warmup_report
+
+
+def warm_up(model, batch_sizes=(1,)):
+    """Run each batch size twice and record the cold-start cost removed"""
+    report = {}
+    for size in batch_sizes:
+        dummy = np.zeros((size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=model.input_dtype)
+        start = time.perf_counter()
+        model.predict(dummy)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        model.predict(dummy)
+        steady = time.perf_counter() - start
+        report[size] = {
+            "first_call_ms": first * 1000,
+            "steady_ms": steady * 1000,
+            "removed_ms": max(first - steady, 0.0) * 1000,
+        }
+        logger.info(
+            "Warmed batch size %d: first call %.1f ms, steady %.1f ms",
+            size, first * 1000, steady * 1000,
+        )
+    return report
+
+
+def load_compiled_model(path, warmup_batch_sizes=(1,)):
+    """Load a Keras model, wrap it in CompiledModel and warm it up"""
+    model = CompiledModel(tf.keras.models.load_model(path), path)
+    model.warm_up(warmup_batch_sizes)
+    return model
+
+
+# ------------------------------------------------------
+# PREDICTION
+# ------------------------------------------------------
+def predict_batch(model, batch, batch_size=32):
+    """Run the model over a preprocessed batch in micro-batches of batch_size"""
+    outputs = []
+    for start in range(0, len(batch), batch_size):
+        chunk = batch[start:start + batch_size]
+        outputs.append(np.asarray(model.predict(chunk, verbose=0)))
+    if not outputs:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.concatenate(outputs, axis=0)
+
+
+def decode_predictions(probs, label_map, k=5):
+    """Turn a (N, classes) probability array into top-k Prediction objects"""
+    return decode_batch(probs, label_map, k)
+
+
+def predict_breeds(model, images, label_map, batch_size=32):
+    """Classify a list of PIL images with one preprocessing pass"""
+    if not images:
+        return []
+    with span("preprocess"):
+        batch = preprocess_images(images, model.input_dtype)
+    with span("predict"):
+        probs = predict_batch(model, batch, batch_size)
+    return decode_predictions(probs, label_map)
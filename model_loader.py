@@ -0,0 +1,130 @@
+"""Load the inference backend in a background thread.
+
+    python model_loader.py     # prints the startup breakdown
+
+Importing TensorFlow and deserializing ResNet take seconds, so app.py
+starts a ModelLoader once per process and only the Breed Detector waits
+for it; every other page renders straight away.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class ModelLoader:
+    """Imports TensorFlow and loads + warms the configured backend off the main thread.
+
+    timings holds the startup breakdown in milliseconds: one
+    "import <module>" entry per heavy import, then "load model" and
+    "warm-up" for the backend itself, and "load first stage" when a
+    cascade first-stage model is configured.
+    """
+
+    def __init__(self, backend=None, keras_path=None, tflite_path=None,
+                 warmup_batch_sizes=None, num_threads=None, prefetch_modules=(), fast_path=None):
+        self.backend = backend or config.INFERENCE_BACKEND
+        self.keras_path = keras_path or config.MODEL_PATH
+        # First stage of the cascade; skipped when the file is not there
+        self.fast_path = fast_path if fast_path is not None else config.FAST_MODEL_PATH
+        self.tflite_path = tflite_path or config.TFLITE_MODEL_PATH
+        self.warmup_batch_sizes = warmup_batch_sizes or config.WARMUP_BATCH_SIZES
+        self.num_threads = num_threads or config.TFLITE_NUM_THREADS
+        # Imported after the model so later requests don't pay for them either
+        self.prefetch_modules = prefetch_modules
+        self.model = None
+        self.error = None
+        self.timings = {}
+        self.started = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self.started = time.perf_counter()
+            self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    def _timed(self, name, fn):
+        start = time.perf_counter()
+        result = fn()
+        self.timings[name] = (time.perf_counter() - start) * 1000
+        return result
+
+    def _load(self):
+        try:
+            for module in ("numpy", "tensorflow", "backends"):
+                self._timed(f"import {module}", lambda: importlib.import_module(module))
+            backends = importlib.import_module("backends")
+            model = self._timed("load model", lambda: backends.load_backend(
+                self.backend,
+                keras_path=self.keras_path,
+                tflite_path=self.tflite_path,
+                warmup_batch_sizes=self.warmup_batch_sizes,
+                num_threads=self.num_threads,
+            ))
+            # load_backend also warms up; report that part separately
+            warm = sum(r["first_call_ms"] + r["steady_ms"] for r in model.warmup_report.values())
+            self.timings["load model"] -= warm
+            self.timings["warm-up"] = warm
+            if self.fast_path and os.path.exists(self.fast_path):
+                cascade = importlib.import_module("cascade")
+                model = self._timed("load first stage", lambda: cascade.with_fast_model(
+                    model, self.fast_path,
+                    warmup_batch_sizes=self.warmup_batch_sizes,
+                    num_threads=self.num_threads,
+                ))
+            self.model = model
+            logger.info("Model ready: %s", self.summary())
+        except Exception as e:
+            self.error = e
+            logger.exception("Model failed to load")
+        finally:
+            self._done.set()
+
+        for module in self.prefetch_modules:
+            try:
+                self._timed(f"import {module}", lambda: importlib.import_module(module))
+            except ImportError:
+                pass
+
+    @property
+    def ready(self):
+        return self.model is not None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started if self.started else 0.0
+
+    def wait(self, timeout=None):
+        """Block until loading finishes; True when it did within timeout"""
+        return self._done.wait(timeout)
+
+    def get(self, timeout=None):
+        """The loaded model, raising the load error if there was one"""
+        if not self.wait(timeout):
+            raise TimeoutError(f"Model still loading after {self.elapsed():.1f} s")
+        if self.error is not None:
+            raise self.error
+        return self.model
+
+    def summary(self):
+        parts = [f"{name} {ms / 1000:.2f} s" for name, ms in self.timings.items()]
+        return ", ".join(parts) + f" (total {sum(self.timings.values()) / 1000:.2f} s)"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    loader = ModelLoader().start()
+    loader.get()
+    for name, ms in loader.timings.items():
+        print(f"{name:<24} {ms:9.1f} ms")
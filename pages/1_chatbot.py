@@ -1,5 +1,10 @@
 import streamlit as st
-import google.generativeai as genai
+
+from chat_service import get_chat, session_context
+from chat_stream import format_metrics, mark_interrupted, stream_reply
+from gemini_client import GeminiUnavailable
+import tracing
+from tracing import span
 
 st.set_page_config(
     page_title="🐾 Dog Chatbot",
@@ -7,8 +12,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Stage timings for this rerun (no-ops unless PAWDENTIFY_TRACING is set)
+tracing.setup_exporters()
+previous_trace = tracing.begin_rerun(st.session_state, "chatbot")
+
 # Modern CSS styling for ChatGPT-like interface
-st.markdown("""
+CHAT_CSS = """
     <style>
     .main-header {
         text-align: center;
@@ -103,10 +112,11 @@ st.markdown("""
         margin: 15px 0;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+with span("css"):
+    st.markdown(CHAT_CSS, unsafe_allow_html=True)
 
-genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-model = genai.GenerativeModel("gemini-2.0-flash")
+model = get_chat(st.secrets["GEMINI_API_KEY"])
 
 st.markdown("""
     <div class='main-header'>
@@ -118,6 +128,30 @@ st.markdown("""
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+# A reply still marked as streaming was cut off by Stop or a page change
+mark_interrupted(st.session_state.chat_history, "text")
+context = session_context(st.session_state, "chat_history_context", model)
+
+
+def user_bubble(text):
+    return f"""
+        <div class='chat-message-user'>
+            <div class='user-bubble'>
+                {text}
+            </div>
+        </div>
+    """
+
+
+def bot_bubble(text):
+    return f"""
+        <div class='chat-message-bot'>
+            <div class='bot-bubble'>
+                {text}
+            </div>
+        </div>
+    """
+
 # Chat display container
 with st.container():
     st.markdown('<div class="chat-container">', unsafe_allow_html=True)
@@ -132,21 +166,16 @@ with st.container():
     else:
         for msg in st.session_state.chat_history:
             if msg["role"] == "user":
-                st.markdown(f"""
-                    <div class='chat-message-user'>
-                        <div class='user-bubble'>
-                            {msg['text']}
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(user_bubble(msg['text']), unsafe_allow_html=True)
             else:
-                st.markdown(f"""
-                    <div class='chat-message-bot'>
-                        <div class='bot-bubble'>
-                            {msg['text']}
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(bot_bubble(msg['text']), unsafe_allow_html=True)
+                if msg.get("stopped"):
+                    st.caption("⏹ Stopped")
+                elif msg.get("metrics"):
+                    st.caption(format_metrics(msg["metrics"]))
+
+    # The next reply streams in here
+    live_reply = st.empty()
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -171,15 +200,36 @@ if send_btn:
     if query.strip():
         # Add user message
         st.session_state.chat_history.append({"role": "user", "text": query})
-        
-        # Get AI response
+        bot_msg = {"role": "bot", "text": "", "streaming": True}
+        st.session_state.chat_history.append(bot_msg)
+
+        with live_reply.container():
+            st.markdown(user_bubble(query), unsafe_allow_html=True)
+            bubble = st.empty()
+            bubble.markdown(bot_bubble("🤖 Thinking..."), unsafe_allow_html=True)
+            # Clicking Stop reruns the page, which interrupts the stream
+            st.button("⏹ Stop", key="stop_stream")
+
+        def show(text):
+            bot_msg["text"] = text
+            bubble.markdown(bot_bubble(text + " ▌"), unsafe_allow_html=True)
+
+        # Get AI response, rendered as it arrives
         try:
-            with st.spinner("🤖 Thinking..."):
-                reply = model.generate_content(query).text
-                st.session_state.chat_history.append({"role": "bot", "text": reply})
+            with span("gemini"):
+                reply, metrics = stream_reply(model.stream(query, context), show)
+            tracing.tracer.record("gemini_first_token", metrics["ttft_ms"] / 1000)
+            bot_msg.update(text=reply, streaming=False, metrics=metrics)
+            context.add_turn(query, reply)
+        except GeminiUnavailable as e:
+            st.session_state.chat_history.remove(bot_msg)
+            st.warning(str(e))
         except Exception as e:
+            st.session_state.chat_history.remove(bot_msg)
             st.error(f"Error: {str(e)}")
         
         st.rerun()
     else:
         st.warning("Please type a message first!")
+
+tracing.debug_panel(st.session_state, previous_trace)
@@ -0,0 +1,103 @@
+"""Top-k prediction results, post-processed for a whole batch at once.
+
+decode_batch() does one argpartition, one entropy reduction and one
+label lookup over the (N, classes) output, so post-processing stays in
+the microseconds next to the forward pass. Each row becomes a
+Prediction, which still unpacks as the (breed, confidence %) pair the
+rest of the app has always used.
+"""
+import numpy as np
+
+_label_arrays = {}
+
+
+def label_array(label_map):
+    """Class index -> stripped label as a NumPy array, built once per label map"""
+    cached = _label_arrays.get(id(label_map))
+    if cached is None or cached[0] is not label_map:
+        names = np.array([label_map[i].strip() for i in range(len(label_map))], dtype=object)
+        cached = _label_arrays[id(label_map)] = (label_map, names)
+    return cached[1]
+
+
+def top_k(probs, k=5):
+    """Per-row top-k class indices and probabilities, highest first"""
+    k = min(k, probs.shape[1])
+    idx = np.argpartition(-probs, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(probs, idx, axis=1)
+    order = np.argsort(-vals, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+# ------------------------------------------------------
+# PREDICTION
+# ------------------------------------------------------
+class Prediction:
+    """The top-k breeds for one image, highest first.
+
+    probs are probabilities (0-1); confidence is the top one in percent.
+    entropy is over the full output in nats (0 = certain), margin is the
+    top-1 minus the top-2 probability.
+    """
+
+    __slots__ = ("breeds", "probs", "entropy", "margin")
+
+    def __init__(self, breeds, probs, entropy=None, margin=None):
+        self.breeds = tuple(breeds)
+        self.probs = tuple(probs)
+        self.entropy = entropy
+        self.margin = margin
+
+    @classmethod
+    def from_pair(cls, breed, confidence):
+        """A top-1-only result, e.g. from an older cache entry"""
+        return cls((breed,), (confidence / 100,))
+
+    @property
+    def breed(self):
+        return self.breeds[0]
+
+    @property
+    def confidence(self):
+        return self.probs[0] * 100
+
+    @property
+    def runners_up(self):
+        """(breed, confidence %) for every candidate after the first"""
+        return [(b, p * 100) for b, p in zip(self.breeds[1:], self.probs[1:])]
+
+    def __iter__(self):
+        return iter((self.breed, self.confidence))
+
+    def __eq__(self, other):
+        if isinstance(other, Prediction):
+            return self.breeds == other.breeds and self.probs == other.probs
+        return tuple(self) == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Prediction({self.breed!r}, {self.confidence:.1f}%, runners_up={len(self.breeds) - 1})"
+
+    def to_dict(self):
+        return {"breeds": list(self.breeds), "probs": list(self.probs),
+                "entropy": self.entropy, "margin": self.margin}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["breeds"], data["probs"], data.get("entropy"), data.get("margin"))
+
+
+def decode_batch(probs, label_map, k=5):
+    """A Prediction per row of a (N, classes) probability array"""
+    probs = np.asarray(probs, dtype=np.float32)
+    if not len(probs):
+        return []
+    idx, vals = top_k(probs, max(k, 2))
+    names = label_array(label_map)[idx[:, :k]].tolist()
+    margins = (vals[:, 0] - vals[:, 1]).tolist() if vals.shape[1] > 1 else [1.0] * len(probs)
+    # 0 * log(0) counts as 0, so clipping only avoids the warning
+    entropy = (-(probs * np.log(np.clip(probs, 1e-12, None))).sum(axis=1)).tolist()
+    vals = vals[:, :k].tolist()
+    return [Prediction(n, v, e, m) for n, v, e, m in zip(names, vals, entropy, margins)]
+
@@ -0,0 +1,270 @@
+"""Headless HTTP inference service for the breed classifier.
+
+    python serve.py --port 8000 --workers 4
+
+Endpoints:
+    POST /predict          image body (single) or multipart/form-data (batch)
+    GET  /breeds/<name>    breed details and diet plan
+    GET  /health           model, batcher and cache status
+
+For local testing without the real ResNet:
+    python stand_in_model.py stand_in.keras
+    python serve.py --model stand_in.keras
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import socket
+from email import policy
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import config
+from batching import QueueFull
+from breed_store import open_breed_index
+from image_ingest import ImageTooLarge, load_model_input
+from prediction_cache import PredictionCache, image_key, model_fingerprint
+
+logger = logging.getLogger("pawdentify.serve")
+
+
+# ------------------------------------------------------
+# INFERENCE SERVICE
+# ------------------------------------------------------
+class InferenceService:
+    """Model, label join and dynamic batcher shared by every request thread"""
+
+    def __init__(self, model, breed_index, max_batch_size=32, max_wait_ms=5.0, cache=None):
+        from batching import DynamicBatcher
+
+        self.model = model
+        self.breed_index = breed_index
+        self.cache = cache
+        self.model_version = f"{model.name}:{model_fingerprint(model.path)}"
+        self.batcher = DynamicBatcher(model.predict, max_batch_size, max_wait_ms,
+                                      config.BATCH_MAX_QUEUE)
+
+    def _result(self, prediction):
+        breed, conf = prediction
+        return {
+            "breed": breed,
+            "confidence": conf,
+            "class_index": self.breed_index.resolve(breed),
+            "top_k": [{"breed": b, "confidence": p * 100}
+                      for b, p in zip(prediction.breeds, prediction.probs)],
+            "margin": prediction.margin,
+            "entropy": prediction.entropy,
+        }
+
+    def predict(self, datas):
+        """Classify raw image bytes; each image is batched with concurrent requests"""
+        import inference
+
+        keys = [image_key(data, self.model_version) for data in datas]
+        predictions = [self.cache.get(key) if self.cache is not None else None for key in keys]
+        todo = [i for i, p in enumerate(predictions) if p is None]
+        if todo:
+            batch = inference.preprocess_images([load_model_input(datas[i]) for i in todo],
+                                                self.model.input_dtype)
+            # predict_many feeds large requests to the queue in chunks and
+            # cancels whatever is still queued if the request fails
+            probs = self.batcher.predict_many(batch, config.INFERENCE_TIMEOUT_S)
+            decoded = inference.decode_predictions(probs, self.breed_index.label_map,
+                                                   config.PREDICTION_TOP_K)
+            for i, prediction in zip(todo, decoded):
+                predictions[i] = prediction
+                if self.cache is not None:
+                    self.cache.put(keys[i], prediction)
+        return [self._result(p) for p in predictions]
+
+    def breed(self, name):
+        idx = self.breed_index.resolve(name)
+        if idx is None:
+            return None
+        return {
+            "breed": self.breed_index.labels[idx],
+            "class_index": idx,
+            "details": self.breed_index.details[idx],
+            "diet_plan": self.breed_index.diets[idx],
+        }
+
+    def health(self):
+        return {
+            "status": "ok",
+            "backend": self.model.name,
+            "model_version": self.model_version,
+            "batching": self.batcher.stats(),
+            "cascade": self.model.stats() if hasattr(self.model, "stats") else None,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+
+def build_service(args):
+    import backends
+    import cascade
+
+    model = backends.load_backend(
+        args.backend,
+        keras_path=args.model,
+        tflite_path=config.TFLITE_MODEL_PATH,
+        warmup_batch_sizes=config.WARMUP_BATCH_SIZES,
+        num_threads=config.TFLITE_NUM_THREADS,
+    )
+    model = cascade.with_fast_model(
+        model,
+        warmup_batch_sizes=config.WARMUP_BATCH_SIZES,
+        num_threads=config.TFLITE_NUM_THREADS,
+    )
+    cache = PredictionCache(config.PREDICTION_CACHE_SIZE, config.PREDICTION_CACHE_DIR)
+    return InferenceService(model, open_breed_index(), args.max_batch_size,
+                            args.max_wait_ms, cache)
+
+
+# ------------------------------------------------------
+# HTTP HANDLER
+# ------------------------------------------------------
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "Pawdentify/1.0"
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send_json(status, {"error": message})
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        service = self.server.service
+        if path == "/health":
+            self._send_json(HTTPStatus.OK, service.health())
+        elif path.startswith("/breeds/"):
+            info = service.breed(unquote(path[len("/breeds/"):]))
+            if info is None:
+                self._error(HTTPStatus.NOT_FOUND, "Unknown breed")
+            else:
+                self._send_json(HTTPStatus.OK, info)
+        else:
+            self._error(HTTPStatus.NOT_FOUND, "Not found")
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/predict":
+            self._error(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._error(HTTPStatus.BAD_REQUEST, "Empty request body")
+            return
+        if length > config.SERVER_MAX_BODY_MB * 2**20:
+            self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+            return
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", "")
+
+        if content_type.startswith("multipart/form-data"):
+            names, datas = parse_multipart(content_type, body)
+            if not datas:
+                self._error(HTTPStatus.BAD_REQUEST, "No image files in form data")
+                return
+        else:
+            names, datas = None, [body]
+
+        try:
+            results = self.server.service.predict(datas)
+        except (QueueFull, TimeoutError) as e:
+            self._error(HTTPStatus.SERVICE_UNAVAILABLE, f"Server busy: {e}")
+            return
+        except ImageTooLarge as e:
+            self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, str(e))
+            return
+        except Exception as e:
+            logger.exception("Prediction failed")
+            self._error(HTTPStatus.BAD_REQUEST, f"Could not classify image: {e}")
+            return
+
+        if names is None:
+            self._send_json(HTTPStatus.OK, results[0])
+        else:
+            for name, result in zip(names, results):
+                result["filename"] = name
+            self._send_json(HTTPStatus.OK, {"results": results})
+
+
+def parse_multipart(content_type, body):
+    """Return (filenames, payloads) for every file part of a multipart body"""
+    msg = BytesParser(policy=policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    names, datas = [], []
+    for part in msg.iter_parts():
+        data = part.get_payload(decode=True)
+        if data:
+            names.append(part.get_filename() or part.get_param("name", header="content-disposition"))
+            datas.append(data)
+    return names, datas
+
+
+# ------------------------------------------------------
+# WORKERS
+# ------------------------------------------------------
+def run_worker(sock, args):
+    """Serve on an already-bound socket; each worker process owns its own model"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(message)s")
+    service = build_service(args)
+    server = ThreadingHTTPServer(sock.getsockname()[:2], RequestHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.service = service
+    logger.info("Worker ready on %s:%s (%s backend)", *sock.getsockname()[:2], service.model.name)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.batcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS)
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--backend", default=config.INFERENCE_BACKEND)
+    parser.add_argument("--max-batch-size", type=int, default=config.BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=config.BATCH_MAX_WAIT_MS)
+    args = parser.parse_args(argv)
+
+    # Bind once in the parent; forked workers accept from the same socket.
+    # TensorFlow is only imported inside the workers, after the fork.
+    sock = socket.create_server((args.host, args.port), backlog=128)
+    if args.workers <= 1:
+        run_worker(sock, args)
+        return
+
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=run_worker, args=(sock, args)) for _ in range(args.workers)]
+    for w in workers:
+        w.start()
+    try:
+        for w in workers:
+            w.join()
+    except KeyboardInterrupt:
+        for w in workers:
+            w.terminate()
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
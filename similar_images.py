@@ -0,0 +1,159 @@
+"""Near-duplicate and similar-dog lookups over classified images.
+
+Two VectorIndex instances share the same keys:
+
+- duplicates holds a pixel signature of each model input: a 32x32
+  grayscale thumbnail for shape plus an 8x8 colour one, so two scenes
+  with the same layout but different colours don't match. It costs
+  microseconds to compute, so a re-compressed, resized or very lightly
+  cropped copy of an earlier upload is recognised and reuses that
+  prediction (stored whole, runners-up included) without running the
+  model at all. Re-encodes and resizes score ~1.0 and a 2% crop ~0.997.
+  The same scene with the dog slightly moved scores ~0.99, distinct
+  silhouettes on the same background ~0.97 and unrelated photos far
+  lower. The index is shared by every session,
+  so the default threshold of 0.995 only accepts near-exact copies.
+- similar holds the model's penultimate-layer embedding (random-projected
+  down to at most EMBEDDING_DIM dimensions) and answers "which earlier
+  dogs look most like this one". The embedding comes out of the same
+  forward pass as the prediction, so it is only stored for images the
+  model actually classified.
+"""
+import json
+import os
+
+import numpy as np
+
+from predictions import Prediction
+from vector_index import VectorIndex
+
+SIGNATURE_SIDE = 32
+COLOR_SIDE = 8
+SIGNATURE_DIM = SIGNATURE_SIDE * SIGNATURE_SIDE + COLOR_SIDE * COLOR_SIDE * 3
+# Room for a top-5 Prediction as JSON; longer ones keep only the top-1 pair
+PREDICTION_BYTES = 512
+
+
+def block_means(images, side):
+    """(N, side, side, ...) mean of each block of an (N, H, W, ...) array"""
+    n, h, w = images.shape[:3]
+    block_h, block_w = h // side, w // side
+    images = images[:, :block_h * side, :block_w * side]
+    return images.reshape(n, side, block_h, side, block_w, *images.shape[3:]).mean(axis=(2, 4))
+
+
+def pixel_signature(pixels):
+    """(N, SIGNATURE_DIM) signatures of (N, 224, 224, 3) uint8 inputs.
+
+    A zero-mean 32x32 grayscale thumbnail and a zero-mean 8x8 RGB one,
+    each scaled to unit length, so the cosine similarity of two
+    signatures is the mean of the shape and colour similarities.
+    """
+    pixels = np.asarray(pixels, dtype=np.float32)
+    n = len(pixels)
+    gray = block_means(pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32), SIGNATURE_SIDE)
+    color = block_means(pixels, COLOR_SIDE)
+    parts = []
+    for part in (gray.reshape(n, -1), color.reshape(n, -1)):
+        part = part - part.mean(axis=1, keepdims=True)
+        parts.append(part / np.maximum(np.linalg.norm(part, axis=1, keepdims=True), 1e-6))
+    return np.concatenate(parts, axis=1)
+
+
+def encode_prediction(prediction):
+    """Compact JSON bytes for a Prediction, or b"" when it does not fit"""
+    if not isinstance(prediction, Prediction):
+        return b""
+    data = prediction.to_dict()
+    data["probs"] = [round(p, 6) for p in data["probs"]]
+    for name in ("entropy", "margin"):
+        if data[name] is not None:
+            data[name] = round(data[name], 6)
+    payload = json.dumps(data, separators=(",", ":")).encode()
+    return payload if len(payload) <= PREDICTION_BYTES else b""
+
+
+def match_prediction(match):
+    """The full Prediction stored with a duplicates match"""
+    if match.payload:
+        return Prediction.from_dict(json.loads(match.payload))
+    return Prediction.from_pair(match.breed, match.confidence)
+
+
+def random_projection(dim_in, dim_out, seed=0):
+    """Fixed Gaussian projection; cosine similarity is approximately preserved"""
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((dim_in, dim_out)).astype(np.float32) / np.sqrt(dim_out)
+
+
+class ImageIndex:
+    """Signature and embedding indexes for one model version.
+
+    directory=None keeps both in memory. Entries from another model
+    version are discarded on open, because its predictions and
+    embeddings no longer apply.
+    """
+
+    def __init__(self, directory=None, capacity=10_000, model_version="", embedding_dim=None,
+                 project_dim=256, duplicate_similarity=0.995):
+        self.duplicate_similarity = duplicate_similarity
+        self.duplicates = VectorIndex(
+            os.path.join(directory, "duplicates") if directory else None,
+            SIGNATURE_DIM, capacity, model_version, payload_bytes=PREDICTION_BYTES,
+        )
+        self.similar = None
+        self._projection = None
+        if embedding_dim:
+            if embedding_dim > project_dim:
+                self._projection = random_projection(embedding_dim, project_dim)
+            self.similar = VectorIndex(
+                os.path.join(directory, "similar") if directory else None,
+                min(embedding_dim, project_dim), capacity, model_version,
+            )
+
+    def find_duplicates(self, pixels):
+        """The earlier match for each image that is a near-copy of one, else None"""
+        if self.duplicate_similarity <= 0 or not len(self.duplicates):
+            return [None] * len(pixels)
+        found = []
+        for matches in self.duplicates.search(pixel_signature(pixels), k=1):
+            best = matches[0] if matches else None
+            found.append(best if best and best.similarity >= self.duplicate_similarity else None)
+        return found
+
+    def add(self, keys, pixels, predictions, embeddings=None):
+        """Index freshly classified images; predictions are Predictions or (breed, conf) pairs"""
+        breeds = [breed for breed, _ in predictions]
+        confs = [conf for _, conf in predictions]
+        self.duplicates.add(pixel_signature(pixels), keys, breeds, confs,
+                            [encode_prediction(p) for p in predictions])
+        if self.similar is not None and embeddings is not None:
+            if self._projection is not None:
+                embeddings = np.asarray(embeddings, dtype=np.float32) @ self._projection
+            self.similar.add(embeddings, keys, breeds, confs)
+
+    def add_duplicate(self, key, pixels, match):
+        """Index a near-copy under its own key, sharing the original's embedding"""
+        self.duplicates.add(pixel_signature(pixels[None]), [key], [match.breed], [match.confidence],
+                            [match.payload])
+        if self.similar is not None:
+            slot = self.similar.slot_of(match.key)
+            if slot is not None:
+                self.similar.add(self.similar.vector(slot)[None], [key],
+                                 [match.breed], [match.confidence])
+
+    def similar_to(self, key, k=4):
+        """The k most similar earlier dogs (excluding near-copies of this one)"""
+        if self.similar is None:
+            return []
+        slot = self.similar.slot_of(key)
+        if slot is None:
+            return []
+        matches = self.similar.search(self.similar.vector(slot), k * 2, exclude={key})[0]
+        return [m for m in matches if m.similarity < 0.9999][:k]
+
+    def stats(self):
+        return {
+            "duplicates": self.duplicates.stats(),
+            "similar": self.similar.stats() if self.similar is not None else None,
+        }
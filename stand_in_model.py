@@ -0,0 +1,43 @@
+"""Build a tiny Keras model shaped like dog_breed_resnet.keras.
+
+The real ResNet is not shipped with the repo. This model takes the same
+(224, 224, 3) input and returns a softmax over the class_indices.json
+labels, so the server, scripts and benchmarks can run end to end.
+
+    python stand_in_model.py stand_in.keras
+"""
+import argparse
+import json
+
+import config
+
+
+def num_classes(labels_path=config.LABELS_PATH):
+    with open(labels_path) as f:
+        return len(json.load(f))
+
+
+def build_stand_in_model(classes=None, seed=0):
+    import tensorflow as tf
+
+    classes = classes or num_classes()
+    tf.keras.utils.set_random_seed(seed)
+    inputs = tf.keras.Input(shape=(224, 224, 3))
+    x = tf.keras.layers.Conv2D(8, 3, strides=4, activation="relu")(inputs)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(classes, activation="softmax")(x)
+    return tf.keras.Model(inputs, outputs, name="stand_in_resnet")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out", nargs="?", default="stand_in.keras")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    model = build_stand_in_model(seed=args.seed)
+    model.save(args.out)
+    print(f"Wrote {args.out} ({model.count_params()} parameters)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+import backends
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A small float32 Keras classifier and its .tflite export"""
+    inputs = tf.keras.Input((224, 224, 3))
+    x = tf.keras.layers.Conv2D(4, 3, strides=4)(inputs)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    model = tf.keras.Model(inputs, tf.keras.layers.Dense(5, activation="softmax")(x))
+    path = tmp_path_factory.mktemp("tflite") / "tiny.tflite"
+    path.write_bytes(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+    return model, str(path)
+
+
+def test_batches_are_padded_to_a_warmed_interpreter(tiny_model, monkeypatch):
+    model, path = tiny_model
+    backend = backends.TFLiteBackend(path)
+    backend.warm_up((1, 8))
+    created = []
+    runner = backends._Runner
+    monkeypatch.setattr(backends, "_Runner", lambda *args: created.append(args[-1]) or runner(*args))
+
+    batch = np.random.default_rng(0).normal(size=(20, 224, 224, 3)).astype(np.float32)
+    expected = model(batch).numpy()
+    for n in (1, 3, 8, 5, 2, 8):
+        np.testing.assert_allclose(backend.predict(batch[:n]), expected[:n], atol=1e-5)
+    assert created == []
+
+    # Larger than every warmed size: one new interpreter, reused after that
+    np.testing.assert_allclose(backend.predict(batch), expected, atol=1e-5)
+    np.testing.assert_allclose(backend.predict(batch[:17]), expected[:17], atol=1e-5)
+    assert created == [32]
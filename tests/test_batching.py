@@ -0,0 +1,102 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from batching import DynamicBatcher, QueueFull
+
+
+def identity_rows(batch):
+    """One output row per sample: the sample's first pixel"""
+    return batch.reshape(len(batch), -1)[:, :1].astype(np.float32)
+
+
+class BlockingModel:
+    """Holds the batcher's worker thread inside predict() until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def __call__(self, batch):
+        self.batches.append(len(batch))
+        self.started.set()
+        self.release.wait(5)
+        return identity_rows(batch)
+
+
+def samples(n):
+    return [np.full((2, 2, 3), i, dtype=np.uint8) for i in range(n)]
+
+
+def test_rows_come_back_in_submission_order():
+    batcher = DynamicBatcher(identity_rows, max_batch_size=4, max_wait_ms=1.0)
+    try:
+        out = batcher.predict_many(samples(10), timeout=5)
+    finally:
+        batcher.close()
+    assert out[:, 0].tolist() == list(range(10))
+    assert max(batcher.batch_sizes) <= 4
+
+
+def test_concurrent_requests_are_batched_together():
+    batcher = DynamicBatcher(identity_rows, max_batch_size=32, max_wait_ms=20.0)
+    results = {}
+
+    def worker(i):
+        results[i] = float(batcher.predict(samples(i + 1)[i], timeout=5)[0])
+
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        batcher.close()
+    assert results == {i: float(i) for i in range(16)}
+    assert batcher.batches < 16
+
+
+def test_submit_beyond_queue_limit_raises_queue_full():
+    model = BlockingModel()
+    batcher = DynamicBatcher(model, max_batch_size=1, max_queue=2)
+    try:
+        batcher.submit(samples(1)[0])
+        assert model.started.wait(5)
+        batcher.submit(samples(1)[0])
+        batcher.submit(samples(1)[0])
+        with pytest.raises(QueueFull):
+            batcher.submit(samples(1)[0])
+        assert batcher.stats()["rejected"] == 1
+    finally:
+        model.release.set()
+        batcher.close()
+
+
+def test_upload_larger_than_queue_is_chunked():
+    batcher = DynamicBatcher(identity_rows, max_batch_size=4, max_queue=6)
+    try:
+        out = batcher.predict_many(samples(25), timeout=5)
+    finally:
+        batcher.close()
+    assert out[:, 0].tolist() == list(range(25))
+    assert batcher.stats()["rejected"] == 0
+
+
+def test_timed_out_requests_are_not_run():
+    model = BlockingModel()
+    batcher = DynamicBatcher(model, max_batch_size=1)
+    try:
+        batcher.submit(samples(1)[0])
+        assert model.started.wait(5)
+        with pytest.raises(TimeoutError):
+            batcher.predict_many(samples(3), timeout=0.05)
+        model.release.set()
+        time.sleep(0.05)
+    finally:
+        model.release.set()
+        batcher.close()
+    assert model.batches == [1]
@@ -0,0 +1,74 @@
+import pytest
+
+from breed_data import BreedIndex
+from breed_kb import BreedKnowledgeBase, GroundedChat
+from chat_context import ConversationContext
+
+
+@pytest.fixture(scope="module")
+def kb():
+    return BreedKnowledgeBase(BreedIndex.from_files())
+
+
+class RecordingChat:
+    model_name = "recording"
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        return "remote"
+
+    def stream(self, prompt):
+        yield self.generate(prompt)
+
+
+@pytest.mark.parametrize("question, field", [
+    ("What is the barking level of a beagle?", "Barking Level"),
+    ("how big does a husky get", "Height"),
+    ("what colors does a pug come in", "Colors"),
+    ("what diseases are common in labradors", "Common Diseases"),
+    ("how much exercise does a border collie need", "Exercise Needs"),
+    ("tell me about the beagle", "Long Description"),
+])
+def test_answers_covered_fact_questions_locally(kb, question, field):
+    reply = kb.answer(question)
+    assert reply is not None and f"**{field}**" in reply
+
+
+def test_answers_diet_plan_locally(kb):
+    reply = kb.answer("what does a senior pug eat on monday")
+    assert reply.startswith("🍖 Senior diet plan for the pug") and "**Monday:**" in reply
+
+
+@pytest.mark.parametrize("question", [
+    "can a beagle eat chocolate",
+    "my lab is sick after eating grapes",
+    "is a pug good with small kids",
+    "is it safe to walk a husky in the heat",
+    "compare the beagle and the basset",
+])
+def test_advice_and_safety_questions_go_to_gemini(kb, question):
+    assert kb.answer(question) is None
+
+
+def test_unanswered_questions_are_grounded(kb):
+    chat = RecordingChat()
+    reply = "".join(GroundedChat(chat, kb).stream("can a beagle eat chocolate"))
+    assert reply == "remote"
+    assert chat.prompts[0].startswith("Relevant facts from the Pawdentify breed database:")
+    assert "beagle" in chat.prompts[0]
+
+
+def test_topic_breed_only_grounds_unrelated_questions(kb):
+    chat = RecordingChat()
+    grounded = GroundedChat(chat, kb)
+    context = ConversationContext(1200, 200)
+    assert "**Barking Level**" in grounded.generate("What is the barking level of a beagle?", context)
+
+    assert grounded.generate("tell me a joke about dogs", context) == "remote"
+    assert "beagle" in chat.prompts[-1]
+
+    assert "**Weight** of the beagle" in grounded.generate("how much does it weigh", context)
+    assert grounded.generate("what size", context) == "remote"
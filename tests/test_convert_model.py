@@ -0,0 +1,19 @@
+import numpy as np
+
+import inference
+from conftest import photo_bytes
+from convert_model import representative_dataset
+
+
+def test_calibration_batches_match_the_model_input(tmp_path):
+    for i in range(3):
+        (tmp_path / f"{i}.jpg").write_bytes(photo_bytes(seed=i))
+    paths = inference.list_images(str(tmp_path))
+
+    raw = [batch for batch, in representative_dataset(paths, 2, np.uint8)()]
+    float_ = [batch for batch, in representative_dataset(paths, 2, np.float32)()]
+    assert len(raw) == len(float_) == 2
+    for pixels, batch in zip(raw, float_):
+        assert pixels.dtype == np.uint8 and pixels.shape == (1, 224, 224, 3)
+        assert batch.dtype == np.float32
+        np.testing.assert_allclose(batch, inference.preprocess_pixels(pixels, np.float32))
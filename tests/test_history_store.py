@@ -0,0 +1,117 @@
+import sqlite3
+
+import pytest
+from PIL import Image
+
+from history_store import HistoryEntry, HistoryStore, SessionHistory, open_history_store
+
+
+def entry(i, breed="beagle", conf=50.0):
+    return HistoryEntry(f"key{i}", breed, conf, b"jpeg", created=1000.0 + i)
+
+
+@pytest.fixture
+def store():
+    store = HistoryStore()
+    for i in range(25):
+        store.add("me", entry(i, "beagle" if i % 2 else "pug", conf=i * 4))
+    store.add("other", entry(99))
+    return store
+
+
+def all_pages(store, **filters):
+    pages, cursor = [], None
+    while True:
+        entries, cursor = store.page("me", cursor=cursor, limit=10, **filters)
+        pages.append([e.key for e in entries])
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_the_history_once_newest_first(store):
+    pages = all_pages(store)
+    assert [len(p) for p in pages] == [10, 10, 5]
+    keys = [k for page in pages for k in page]
+    assert keys == [f"key{i}" for i in reversed(range(25))]
+
+
+def test_filters_apply_before_paging(store):
+    keys = [k for page in all_pages(store, breed="beagle", min_conf=40) for k in page]
+    assert keys == [f"key{i}" for i in reversed(range(11, 25, 2))]
+
+
+def test_re_adding_moves_an_entry_to_the_top(store):
+    store.add("me", HistoryEntry("key3", "pug", 12.0, b"jpeg", created=2000.0))
+    entries, _ = store.page("me", limit=2)
+    assert [e.key for e in entries] == ["key3", "key24"]
+    assert store.count("me") == 25
+
+
+def test_prune_keeps_the_newest_entries(monkeypatch):
+    monkeypatch.setattr(HistoryStore, "PRUNE_EVERY", 5)
+    store = HistoryStore(max_entries=3)
+    for i in range(6):
+        store.add("me", entry(i))
+    # Trimmed to max_entries on the sixth write, then allowed to grow again
+    assert store.count("me") == 3
+    store.add("me", entry(6))
+    entries, _ = store.page("me")
+    assert [e.key for e in entries] == ["key6", "key5", "key4", "key3"]
+
+
+def test_every_owner_is_pruned_when_writes_interleave(monkeypatch):
+    monkeypatch.setattr(HistoryStore, "PRUNE_EVERY", 4)
+    store = HistoryStore(max_entries=3)
+    for i in range(20):
+        for owner in ("a", "b"):
+            store.add(owner, entry(i))
+    for owner in ("a", "b"):
+        assert store.count(owner) <= store.max_entries + HistoryStore.PRUNE_EVERY - 1
+        assert store.page(owner, limit=1)[0][0].key == "key19"
+
+
+def test_existing_history_is_pruned_on_the_first_write(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    store = HistoryStore(path, max_entries=100)
+    for i in range(10):
+        store.add("me", entry(i))
+    store = HistoryStore(path, max_entries=3)
+    store.add("me", entry(10))
+    assert store.count("me") == 3
+
+
+def test_unwritable_path_falls_back_to_memory(tmp_path):
+    path = tmp_path / "missing" / "history.sqlite"
+    with pytest.raises(sqlite3.Error):
+        HistoryStore(str(path))
+    store = open_history_store(str(path))
+    store.add("me", entry(1))
+    assert store.count("me") == 1
+
+
+class CountingStore(HistoryStore):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def add(self, owner, entry):
+        self.writes += 1
+        super().add(owner, entry)
+
+
+def test_session_history_skips_recent_refresh_writes(monkeypatch):
+    import history_store
+
+    now = [1000.0]
+    monkeypatch.setattr(history_store.time, "time", lambda: now[0])
+    store = CountingStore()
+    history = SessionHistory(store=store, owner="me")
+    img = Image.new("RGB", (64, 64))
+    history.add("a", img, "beagle", 90.0)
+    now[0] += 10
+    history.add("a", img, "beagle", 90.0)
+    assert store.writes == 1
+    now[0] += SessionHistory.STORE_REFRESH_S
+    history.add("a", img, "beagle", 90.0)
+    assert store.writes == 2
+    assert store.page("me")[0][0].created == now[0]
@@ -0,0 +1,45 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from conftest import photo_bytes
+from image_ingest import MODEL_SIZE, ImageTooLarge, ingest, load_model_input
+
+
+def shapes_bytes(size, fmt):
+    """A disc over a fine checkerboard, which shows any lost resolution"""
+    w, h = size
+    cell = max(min(w, h) // 40, 1)
+    y, x = np.mgrid[0:h, 0:w]
+    checker = ((x // cell + y // cell) % 2 * 160 + 40).astype(np.uint8)
+    img = Image.fromarray(np.stack([checker, checker, 255 - checker], axis=-1))
+    r = min(w, h) // 3
+    ImageDraw.Draw(img).ellipse((w // 2 - r, h // 2 - r, w // 2 + r, h // 2 + r), fill=(240, 200, 40))
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, quality=95)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG", "WEBP"])
+@pytest.mark.parametrize("size", [(640, 480), (1920, 1080), (4032, 3024), (300, 1200)])
+def test_model_input_matches_app_path(fmt, size):
+    """serve.py, bulk_classify.py and the app must feed the model the same pixels"""
+    data = shapes_bytes(size, fmt)
+    served = np.asarray(load_model_input(data), dtype=np.float32)
+    app = np.asarray(ingest(data, 800).model_input, dtype=np.float32)
+    assert served.shape == app.shape == (MODEL_SIZE[1], MODEL_SIZE[0], 3)
+    # Only resampling noise from decoding at a different scale
+    assert np.abs(served - app).mean() < 2.0
+
+
+def test_preview_keeps_aspect_ratio():
+    result = ingest(photo_bytes((4032, 3024)), preview_size=800)
+    assert result.preview.size == (800, 600)
+    assert result.original_size == (4032, 3024)
+
+
+def test_pixel_limit_checked_before_decoding():
+    with pytest.raises(ImageTooLarge):
+        ingest(photo_bytes((640, 480)), max_pixels=1000)
@@ -0,0 +1,175 @@
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+import config
+import serve
+from breed_data import BreedIndex
+from conftest import photo_bytes
+from image_ingest import ingest
+from prediction_cache import PredictionCache
+from serve import InferenceService, RequestHandler
+
+
+class CountingModel:
+    """Stand-in model that records every forward pass"""
+
+    name = "counting"
+    path = "counting.keras"
+    input_dtype = np.uint8
+
+    def __init__(self, classes):
+        self.classes = classes
+        self.calls = 0
+
+    def predict(self, batch):
+        self.calls += 1
+        probs = np.full((len(batch), self.classes), 0.1 / (self.classes - 1), dtype=np.float32)
+        probs[:, 3] = 0.9
+        return probs
+
+
+def make_service(cache):
+    index = BreedIndex.from_files()
+    return InferenceService(CountingModel(len(index.label_map)), index, cache=cache)
+
+
+def test_repeated_image_is_served_from_cache():
+    service = make_service(PredictionCache(max_entries=8))
+    try:
+        data = photo_bytes()
+        first = service.predict([data])[0]
+        second = service.predict([data])[0]
+    finally:
+        service.batcher.close()
+    assert service.model.calls == 1
+    assert service.cache.hits == 1
+    assert first == second
+    assert first["breed"] == service.breed_index.label_map[3].strip()
+
+
+def test_health_reports_empty_cache():
+    service = make_service(PredictionCache(max_entries=8))
+    try:
+        assert service.health()["cache"] == service.cache.stats()
+    finally:
+        service.batcher.close()
+
+
+def test_timeout_cancels_the_rest_of_the_request(monkeypatch):
+    monkeypatch.setattr(config, "INFERENCE_TIMEOUT_S", 0.2)
+    service = make_service(PredictionCache(max_entries=8))
+    blocked = threading.Event()
+    release = threading.Event()
+    predict = service.model.predict
+
+    def blocking_predict(batch):
+        blocked.set()
+        release.wait(5)
+        return predict(batch)
+
+    service.batcher.predict_fn = blocking_predict
+    try:
+        # Occupy the worker so the request's images stay queued
+        service.batcher.submit(np.zeros((224, 224, 3), dtype=np.uint8))
+        assert blocked.wait(5)
+        with pytest.raises(TimeoutError):
+            service.predict([photo_bytes(seed=i) for i in range(3)])
+        release.set()
+    finally:
+        release.set()
+        service.batcher.close()
+    assert service.model.calls == 1
+    assert service.batcher.stats()["samples"] == 1
+
+
+def test_multi_image_request_decodes_every_row(monkeypatch):
+    import inference
+
+    service = make_service(None)
+    calls = []
+    decode = inference.decode_predictions
+    monkeypatch.setattr(inference, "decode_predictions",
+                        lambda probs, *args: calls.append(len(probs)) or decode(probs, *args))
+    try:
+        results = service.predict([photo_bytes(seed=i) for i in range(3)])
+    finally:
+        service.batcher.close()
+    assert calls == [3]
+    assert [r["breed"] for r in results] == [service.breed_index.label_map[3].strip()] * 3
+    assert all(len(r["top_k"]) == config.PREDICTION_TOP_K for r in results)
+
+
+@contextmanager
+def http_server(service):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RequestHandler)
+    httpd.service = service
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        yield httpd
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        service.batcher.close()
+
+
+def post(server, body, content_type="image/jpeg"):
+    conn = HTTPConnection(*server.server_address, timeout=30)
+    try:
+        conn.request("POST", "/predict", body, {"Content-Type": content_type})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def multipart(files):
+    """(body, content type) for a multipart/form-data upload of (name, bytes) pairs"""
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+        f"Content-Type: image/jpeg\r\n\r\n".encode() + data + b"\r\n"
+        for name, data in files
+    ]
+    return b"".join(parts) + f"--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+def test_request_larger_than_the_queue_is_served(monkeypatch):
+    monkeypatch.setattr(config, "BATCH_MAX_QUEUE", 8)
+    service = make_service(None)
+    predict = service.model.predict
+
+    def slow_predict(batch):
+        time.sleep(0.1)
+        return predict(batch)
+
+    # A slow model lets a request's images pile up in the queue
+    service.batcher.predict_fn = slow_predict
+    with http_server(service) as server:
+        status, body = post(server, *multipart([(f"{i}.jpg", photo_bytes(seed=i)) for i in range(20)]))
+        stats = server.service.batcher.stats()
+    assert status == 200
+    assert [r["filename"] for r in body["results"]] == [f"{i}.jpg" for i in range(20)]
+    assert stats["samples"] == 20 and stats["rejected"] == 0
+
+
+def test_oversized_image_is_413(monkeypatch):
+    monkeypatch.setattr(serve, "load_model_input",
+                        lambda data: ingest(data, preview_size=None, max_pixels=1000).model_input)
+    with http_server(make_service(None)) as server:
+        status, body = post(server, photo_bytes())
+    assert status == 413
+    assert "limit" in body["error"]
+
+
+def test_corrupt_image_is_400():
+    with http_server(make_service(None)) as server:
+        status, _ = post(server, b"not an image")
+    assert status == 400
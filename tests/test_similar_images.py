@@ -0,0 +1,91 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from predictions import Prediction
+from similar_images import ImageIndex, match_prediction
+from vector_index import VectorIndex
+
+BROWN = (60, 40, 30)
+
+
+def scene(shape, background=(120, 160, 90), seed=0):
+    """224x224 model input: a silhouette on a plain background, plus sensor noise"""
+    img = Image.new("RGB", (640, 480), background)
+    draw = ImageDraw.Draw(img)
+    if shape == "ellipse":
+        draw.ellipse((200, 150, 440, 380), fill=BROWN)
+    elif shape == "rect":
+        draw.rectangle((210, 160, 430, 370), fill=BROWN)
+    elif shape == "dog":
+        draw.ellipse((180, 200, 460, 340), fill=BROWN)
+        draw.ellipse((400, 140, 500, 240), fill=BROWN)
+        for x in (200, 250, 380, 420):
+            draw.rectangle((x, 320, x + 25, 420), fill=BROWN)
+    noisy = np.asarray(img, dtype=np.float32) + np.random.default_rng(seed).normal(0, 4, (480, 640, 3))
+    return Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8))
+
+
+def model_input(img):
+    return np.asarray(img.convert("RGB").resize((224, 224)))
+
+
+def jpeg(img, quality=40):
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(buf.getvalue()))
+
+
+@pytest.fixture
+def index():
+    index = ImageIndex(capacity=100)
+    index.add(["original"], model_input(scene("dog"))[None], [("beagle", 90.0)])
+    return index
+
+
+@pytest.mark.parametrize("copy", [
+    lambda img: jpeg(img),
+    lambda img: img.resize((320, 240)),
+    lambda img: img.crop((6, 5, 634, 475)),
+])
+def test_reencoded_resized_and_cropped_copies_match(index, copy):
+    match = index.find_duplicates(model_input(copy(scene("dog")))[None])[0]
+    assert match is not None and match.key == "original"
+
+
+@pytest.mark.parametrize("other", [
+    lambda: scene("ellipse"),
+    lambda: scene("rect"),
+    lambda: scene("dog", background=(90, 120, 170)),
+])
+def test_different_images_do_not_match(index, other):
+    assert index.find_duplicates(model_input(other())[None]) == [None]
+
+
+def test_near_copy_keeps_the_full_prediction(tmp_path):
+    prediction = Prediction(["beagle", "basset", "harrier"], [0.7, 0.2, 0.05], 0.84, 0.5)
+    index = ImageIndex(str(tmp_path), capacity=100)
+    index.add(["original"], model_input(scene("dog"))[None], [prediction])
+    index.duplicates.flush()
+    reopened = ImageIndex(str(tmp_path), capacity=100)
+    match = reopened.find_duplicates(model_input(jpeg(scene("dog")))[None])[0]
+    restored = match_prediction(match)
+    assert restored == prediction
+    assert restored.runners_up == prediction.runners_up
+    assert (restored.entropy, restored.margin) == (0.84, 0.5)
+
+
+def test_vector_index_flushes_on_interval_and_reopens(tmp_path):
+    path = str(tmp_path / "index")
+    vectors = np.random.default_rng(0).standard_normal((3, 8))
+    index = VectorIndex(path, dim=8, capacity=10, flush_interval_s=3600)
+    index.add(vectors[:1], ["a"], ["pug"], [50.0])
+    # Within the interval nothing is written, then flush() persists everything
+    assert VectorIndex(path, dim=8, capacity=10).total == 0
+    index.add(vectors[1:], ["b", "c"], ["pug", "beagle"], [60.0, 70.0])
+    index.flush()
+    reopened = VectorIndex(path, dim=8, capacity=10)
+    assert len(reopened) == 3
+    assert reopened.search(vectors[2], k=1)[0][0].key == "c"
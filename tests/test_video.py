@@ -0,0 +1,75 @@
+import sys
+
+import numpy as np
+import pytest
+
+import video
+
+LABELS = {i: f"breed{i} " for i in range(5)}
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    path = tmp_path_factory.mktemp("video") / "clip.gif"
+    video.make_test_clip(str(path))
+    return path.read_bytes()
+
+
+def predict_class(idx, p=0.8):
+    """predict_fn giving every frame probability p for class idx"""
+    def predict_fn(images):
+        probs = np.full((len(images), len(LABELS)), (1 - p) / (len(LABELS) - 1), dtype=np.float32)
+        probs[:, idx] = p
+        return probs
+    return predict_fn
+
+
+def test_only_moving_frames_reach_the_model(clip):
+    batches = []
+
+    def predict_fn(images):
+        batches.append(len(images))
+        return predict_class(2)(images)
+
+    result = video.classify_frames(video.iter_frames(clip), predict_fn, LABELS, batch_size=4)
+    # 6 s at 15 fps; the still opening and ending are repeats, the moving
+    # blob is sampled at the 5 fps limit
+    assert result.frames_decoded == 90
+    assert result.frames_classified == 9
+    assert result.skipped_rate == 27
+    assert result.skipped_similar == 54
+    assert batches == [4, 4, 1]
+    assert [t for t, _, _ in result.timeline] == sorted(t for t, _, _ in result.timeline)
+
+
+def test_consistent_frames_give_a_stable_call(clip):
+    result = video.classify_frames(video.iter_frames(clip), predict_class(2), LABELS)
+    assert (result.breed, result.majority) == ("breed2", "breed2")
+    assert result.confidence == pytest.approx(80.0)
+    assert result.agreement == 1.0
+    assert result.stable
+
+
+def test_ema_and_vote_disagreeing_is_unstable():
+    smoother = video.TemporalSmoother(alpha=0.3)
+    smoother.update(np.tile([0.6, 0.4], (3, 1)))
+    smoother.update(np.tile([0.0, 1.0], (2, 1)))
+    breed, conf, majority, agreement = smoother.call({0: "pug", 1: "beagle"})
+    assert (breed, majority) == ("beagle", "pug")
+    assert conf == pytest.approx(70.6)
+    assert agreement == pytest.approx(0.6)
+    result = video.VideoResult(breed=breed, majority=majority)
+    assert not result.stable
+
+
+def test_max_frames_stops_early(clip):
+    result = video.classify_frames(video.iter_frames(clip), predict_class(0), LABELS, max_frames=3)
+    assert result.frames_classified == 3
+    assert result.frames_decoded < 90
+
+
+def test_container_formats_need_pyav(monkeypatch):
+    # None in sys.modules makes "import av" raise ImportError
+    monkeypatch.setitem(sys.modules, "av", None)
+    with pytest.raises(video.VideoUnsupported, match="PyAV"):
+        list(video.iter_frames(b"\x00\x00\x00\x18ftypmp42 not really a video"))
@@ -0,0 +1,328 @@
+"""Stage timing spans aggregated into per-stage latency histograms.
+
+    from tracing import span, traced
+
+    with span("decode"):
+        ...
+
+    @traced("breed_details")
+    def render_breed_details(breed):
+        ...
+
+Disabled (the default) span() returns a shared no-op context manager, so
+instrumented code costs one attribute check per stage. Enabled, every
+span feeds a Prometheus-style histogram and the current rerun's
+breakdown; histograms are served in Prometheus text format on
+METRICS_PORT and finished reruns are appended to a rotating JSONL file.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from functools import wraps
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ------------------------------------------------------
+# HISTOGRAMS
+# ------------------------------------------------------
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs ending with +Inf"""
+        total = 0
+        out = []
+        for bound, n in zip((*self.buckets, float("inf")), self.counts):
+            total += n
+            out.append((bound, total))
+        return out
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+# ------------------------------------------------------
+# SPANS
+# ------------------------------------------------------
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class RerunTrace:
+    """The stages timed during one script run of one session"""
+
+    def __init__(self, tracer, page):
+        self.tracer = tracer
+        self.page = page
+        self.created = time.time()
+        self.start = time.perf_counter()
+        self.stages = []
+        self.total_ms = None
+
+    @property
+    def finished(self):
+        return self.total_ms is not None
+
+    def finish(self):
+        """Close the trace and hand it to the exporters; later calls do nothing"""
+        if self.finished:
+            return
+        self.total_ms = (time.perf_counter() - self.start) * 1000
+        self.tracer.export(self.to_dict())
+
+    def to_dict(self):
+        return {
+            "ts": self.created,
+            "page": self.page,
+            "total_ms": self.total_ms,
+            "stages": [{"stage": name, "ms": ms} for name, ms in self.stages],
+        }
+
+
+class Tracer:
+    """Process-wide registry of stage histograms"""
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS, prefix="pawdentify"):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.prefix = prefix
+        self.histograms = {}
+        self.exporters = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def traced(self, name=None):
+        """Decorator timing every call of a function as one span"""
+        def decorate(fn):
+            stage = name or fn.__name__
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, seconds):
+        """Add a measurement taken elsewhere (e.g. time to first token)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(self.buckets)
+            hist.observe(seconds)
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.stages.append((name, seconds * 1000))
+
+    # Reruns
+    def start_trace(self, page):
+        """Collect the spans of this thread into a new RerunTrace"""
+        trace = RerunTrace(self, page)
+        self._local.trace = trace
+        return trace
+
+    def export(self, record):
+        for exporter in self.exporters:
+            try:
+                exporter(record)
+            except Exception:
+                logger.exception("Trace exporter failed")
+
+    # Exposition
+    def prometheus_text(self):
+        name = f"{self.prefix}_stage_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each instrumented stage.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage, hist in sorted(self.histograms.items()):
+                for bound, total in hist.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {total}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {hist.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """{stage: {count, mean_ms, p50_ms, p99_ms}} from the histograms"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "mean_ms": h.sum / h.count * 1000 if h.count else 0.0,
+                    "p50_ms": h.quantile(0.5) * 1000,
+                    "p99_ms": h.quantile(0.99) * 1000,
+                }
+                for stage, h in sorted(self.histograms.items())
+            }
+
+
+tracer = Tracer(enabled=config.TRACING)
+span = tracer.span
+traced = tracer.traced
+
+
+# ------------------------------------------------------
+# EXPORTERS
+# ------------------------------------------------------
+class JsonlExporter:
+    """Append one JSON line per finished rerun, rotating at max_bytes"""
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=3):
+        self._log = logging.getLogger(f"{__name__}.jsonl.{path}")
+        self._log.propagate = False
+        self._log.setLevel(logging.INFO)
+        if not self._log.handlers:
+            self._log.addHandler(RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups))
+
+    def __call__(self, record):
+        self._log.info(json.dumps(record))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body = self.server.tracer.prometheus_text().encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(tracer, host="0.0.0.0", port=9100):
+    """Serve GET /metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.tracer = tracer
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+_setup_lock = threading.Lock()
+_setup_done = False
+
+
+def setup_exporters():
+    """Start the exporters configured in config, once per process"""
+    global _setup_done
+    with _setup_lock:
+        if _setup_done or not tracer.enabled:
+            return
+        _setup_done = True
+        if config.TRACE_LOG:
+            tracer.exporters.append(
+                JsonlExporter(config.TRACE_LOG, config.TRACE_LOG_MAX_MB * 1024 * 1024)
+            )
+        if config.METRICS_PORT:
+            try:
+                start_metrics_server(tracer, config.METRICS_HOST, config.METRICS_PORT)
+            except OSError as e:
+                logger.warning("Metrics endpoint not started on port %d: %s", config.METRICS_PORT, e)
+
+
+# ------------------------------------------------------
+# STREAMLIT HELPERS
+# ------------------------------------------------------
+def begin_rerun(state, page):
+    """Start this rerun's trace and return the session's previous one.
+
+    The previous trace is finished here rather than at the end of its own
+    run, so reruns cut short by st.stop() or st.rerun() are still exported.
+    """
+    if not tracer.enabled:
+        return None
+    previous = state.get("_trace")
+    if previous is not None:
+        previous.finish()
+    state["_trace"] = tracer.start_trace(page)
+    return previous
+
+
+def label_rerun(state, page):
+    """Name the current rerun's trace once the page is known"""
+    trace = state.get("_trace")
+    if trace is not None:
+        trace.page = page
+
+
+def debug_panel(state, previous=None):
+    """Sidebar breakdown of this rerun so far and the previous one"""
+    if not tracer.enabled:
+        return
+    import streamlit as st
+
+    with st.sidebar.expander("⏱ Stage timings"):
+        current = state.get("_trace")
+        for title, trace in (("This rerun", current), ("Previous rerun", previous)):
+            if trace is None or not trace.stages:
+                continue
+            st.markdown(f"**{title}** ({trace.page})")
+            st.table([{"stage": name, "ms": round(ms, 1)} for name, ms in trace.stages])
+        if current is not None:
+            st.caption(f"Elapsed {(time.perf_counter() - current.start) * 1000:.0f} ms")
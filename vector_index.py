@@ -0,0 +1,311 @@
+"""Fixed-capacity cosine-similarity index over memory-mapped NumPy arrays.
+
+    index = VectorIndex("embedding_index/similar", dim=256, capacity=10_000)
+    index.add(vectors, keys, breeds, confidences)
+    matches = index.search(query, k=5)
+
+Vectors are L2-normalized on the way in and stored in a ring buffer:
+once capacity is reached each append overwrites the oldest entry. With
+a directory the arrays are .npy files opened with mmap, so the index
+survives restarts and only the pages a search touches are read. Writes
+are flushed to disk at most every flush_interval_s and at exit.
+
+search() is exact (one matrix-vector product) until the index holds
+enough vectors to train an IVF quantizer; after that it scores only the
+nprobe inverted lists whose k-means centroids are closest to the query.
+"""
+import atexit
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+META_DTYPE = np.dtype([
+    ("key", "S64"),
+    ("breed", "U64"),
+    ("confidence", "f4"),
+    ("ts", "f8"),
+    ("list", "i4"),
+])
+
+
+def meta_dtype(payload_bytes=0):
+    """META_DTYPE, plus a bytes "payload" column when payload_bytes > 0"""
+    if not payload_bytes:
+        return META_DTYPE
+    return np.dtype(META_DTYPE.descr + [("payload", f"S{payload_bytes}")])
+
+
+class Match:
+    __slots__ = ("slot", "similarity", "key", "breed", "confidence", "ts", "payload")
+
+    def __init__(self, slot, similarity, key, breed, confidence, ts, payload=None):
+        self.slot = slot
+        self.similarity = similarity
+        self.key = key
+        self.breed = breed
+        self.confidence = confidence
+        self.ts = ts
+        self.payload = payload
+
+    def __repr__(self):
+        return f"Match({self.key[:12]}, {self.breed!r}, similarity={self.similarity:.3f})"
+
+
+def normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """Spherical k-means centroids (unit length) for an IVF quantizer"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty lists from random vectors rather than leaving them dead
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+# ------------------------------------------------------
+# VECTOR INDEX
+# ------------------------------------------------------
+class VectorIndex:
+    """Ring buffer of unit vectors with exact and IVF search.
+
+    path=None keeps everything in memory. An existing directory is
+    reopened as long as dim, capacity, version and payload_bytes match;
+    otherwise it is cleared, since vectors from another model are not
+    comparable. payload_bytes > 0 stores an opaque bytes value of up to
+    that length with each row, returned as Match.payload.
+    """
+
+    def __init__(self, path=None, dim=256, capacity=10_000, version="",
+                 nlist=None, nprobe=8, train_factor=39, flush_interval_s=5.0,
+                 payload_bytes=0):
+        self.path = path
+        self.payload_bytes = payload_bytes
+        self.flush_interval_s = flush_interval_s
+        self.dim = dim
+        self.capacity = capacity
+        self.version = version
+        self.nlist = nlist or max(1, int(np.sqrt(capacity)))
+        self.nprobe = nprobe
+        # Vectors needed before the quantizer is trained (as in faiss: 39 per list)
+        self.min_train = self.nlist * train_factor
+        self.total = 0
+        self.centroids = None
+        self._lock = threading.RLock()
+        self._open()
+        self._slots_by_key = {key: slot for slot, key in enumerate(self.meta["key"][:len(self)]) if key}
+        self._lists = None
+        self._last_flush = time.monotonic()
+        self._dirty = False
+        if path is not None:
+            atexit.register(self.flush)
+
+    # Storage
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _open(self):
+        if self.path is None:
+            self.vectors = np.zeros((self.capacity, self.dim), dtype=np.float32)
+            self.meta = np.zeros(self.capacity, dtype=meta_dtype(self.payload_bytes))
+            return
+        header = self._read_header()
+        if header is not None:
+            # Headers written before payloads existed had no payload column
+            header.setdefault("payload_bytes", 0)
+        expected = {"dim": self.dim, "capacity": self.capacity, "version": self.version,
+                    "payload_bytes": self.payload_bytes}
+        if header is not None and any(header.get(k) != v for k, v in expected.items()):
+            logger.info("Resetting %s: built for %s", self.path,
+                        {k: header.get(k) for k in expected})
+            shutil.rmtree(self.path)
+            header = None
+        os.makedirs(self.path, exist_ok=True)
+        mode = "r+" if header is not None else "w+"
+        self.vectors = np.lib.format.open_memmap(
+            self._file("vectors.npy"), mode, np.float32, (self.capacity, self.dim))
+        self.meta = np.lib.format.open_memmap(
+            self._file("meta.npy"), mode, meta_dtype(self.payload_bytes), (self.capacity,))
+        if header is not None:
+            self.total = header["total"]
+            if os.path.exists(self._file("centroids.npy")):
+                self.centroids = np.load(self._file("centroids.npy"))
+
+    def _read_header(self):
+        try:
+            with open(self._file("index.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_header(self):
+        tmp = self._file("index.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity,
+                       "version": self.version, "payload_bytes": self.payload_bytes,
+                       "total": self.total}, f)
+        os.replace(tmp, self._file("index.json"))
+
+    def flush(self):
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self.vectors.flush()
+            self.meta.flush()
+            self._write_header()
+            self._dirty = False
+            self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    # Writes
+    def add(self, vectors, keys, breeds, confidences, payloads=None):
+        """Append rows, evicting the oldest once full; returns their slots.
+
+        payloads are bytes of at most payload_bytes each (ignored when the
+        index has no payload column).
+        """
+        vectors = normalize(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[1]}-d")
+        keys = [k.encode() if isinstance(k, str) else k for k in keys]
+        with self._lock:
+            slots = (self.total + np.arange(len(vectors))) % self.capacity
+            if self.total + len(vectors) > self.capacity:
+                for slot in slots:
+                    old_key = self.meta["key"][slot]
+                    if self._slots_by_key.get(old_key) == slot:
+                        del self._slots_by_key[old_key]
+            self.vectors[slots] = vectors
+            self.meta["key"][slots] = keys
+            self.meta["breed"][slots] = breeds
+            self.meta["confidence"][slots] = confidences
+            self.meta["ts"][slots] = time.time()
+            self.meta["list"][slots] = -1
+            if self.payload_bytes:
+                self.meta["payload"][slots] = payloads if payloads is not None else b""
+            self._slots_by_key.update(zip(keys, slots.tolist()))
+            self.total += len(vectors)
+            if self.centroids is None and len(self) >= self.min_train:
+                self.train()
+            elif self.centroids is not None:
+                # Also invalidates the inverted lists the evicted rows were in
+                self._assign(slots)
+            # msync and a header rewrite per add would dominate small appends
+            self._dirty = True
+            if time.monotonic() - self._last_flush >= self.flush_interval_s:
+                self.flush()
+        return slots.tolist()
+
+    # IVF
+    def train(self, iterations=10, seed=0):
+        """Fit the coarse quantizer on (a sample of) the stored vectors"""
+        with self._lock:
+            n = len(self)
+            if n < self.nlist:
+                return
+            rng = np.random.default_rng(seed)
+            sample = rng.choice(n, min(n, self.min_train), replace=False)
+            self.centroids = kmeans(np.asarray(self.vectors[np.sort(sample)]),
+                                    self.nlist, iterations, seed)
+            self._assign(np.arange(n))
+            if self.path is not None:
+                np.save(self._file("centroids.npy"), self.centroids)
+
+    def _assign(self, slots, chunk=65536):
+        for start in range(0, len(slots), chunk):
+            part = slots[start:start + chunk]
+            self.meta["list"][part] = np.argmax(self.vectors[part] @ self.centroids.T, axis=1)
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            assign = np.asarray(self.meta["list"][:len(self)])
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+            self._lists = (order, bounds)
+        return self._lists
+
+    # Reads
+    def slot_of(self, key):
+        key = key.encode() if isinstance(key, str) else key
+        return self._slots_by_key.get(key)
+
+    def vector(self, slot):
+        return np.array(self.vectors[slot])
+
+    def search(self, query, k=5, exact=None, exclude=()):
+        """Top-k matches per query row, most similar first.
+
+        exact=None searches exactly until the IVF quantizer is trained;
+        exclude is a set of keys left out of the results.
+        """
+        queries = normalize(query)
+        with self._lock:
+            n = len(self)
+            if n == 0:
+                return [[] for _ in queries]
+            if exact is None:
+                exact = self.centroids is None
+            if not exact and self.centroids is None:
+                self.train()
+            exclude = {e.encode() if isinstance(e, str) else e for e in exclude}
+            fetch = k + len(exclude)
+            results = []
+            for q in queries:
+                if exact:
+                    candidates = None
+                    scores = self.vectors[:n] @ q
+                else:
+                    candidates = self._probe(q)
+                    scores = self.vectors[candidates] @ q
+                top = np.argpartition(-scores, min(fetch, len(scores)) - 1)[:fetch] \
+                    if len(scores) > fetch else np.arange(len(scores))
+                top = top[np.argsort(-scores[top])]
+                slots = top if candidates is None else candidates[top]
+                matches = []
+                for slot, score in zip(slots, scores[top]):
+                    row = self.meta[slot]
+                    if row["key"] in exclude:
+                        continue
+                    payload = bytes(row["payload"]) if self.payload_bytes else None
+                    matches.append(Match(int(slot), float(score), row["key"].decode(),
+                                         str(row["breed"]), float(row["confidence"]), float(row["ts"]),
+                                         payload))
+                    if len(matches) == k:
+                        break
+                results.append(matches)
+            return results
+
+    def _probe(self, q):
+        order, bounds = self._inverted_lists()
+        lists = np.argpartition(-(self.centroids @ q), min(self.nprobe, self.nlist) - 1)[:self.nprobe]
+        return np.sort(np.concatenate([order[bounds[i]:bounds[i + 1]] for i in lists]))
+
+    def stats(self):
+        return {
+            "vectors": len(self),
+            "capacity": self.capacity,
+            "appended": self.total,
+            "dim": self.dim,
+            "ivf_trained": self.centroids is not None,
+        }
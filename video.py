@@ -0,0 +1,300 @@
+"""Classify video clips frame by frame with frame skipping and temporal smoothing.
+
+    python video.py clip.mp4 --model stand_in.keras
+    python video.py --make-test-clip test.webp    # synthetic clip to try it on
+
+Frames are decoded in order, but only a few reach the model. A frame is
+sampled when at least 1/max_fps seconds have passed since the last
+sampled one and its 64x64 grayscale thumbnail differs enough from that
+frame's. A static scene is still re-checked every max_gap_s. Sampled
+frames are classified in batches, and their probabilities are smoothed
+into one call: an exponential moving average plus a majority vote of the
+per-frame top-1.
+
+Animated GIF/WebP/PNG clips are decoded with Pillow. mp4, mov, webm,
+mkv and avi need PyAV (`pip install av`).
+"""
+import argparse
+import io
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+from PIL import Image, ImageSequence, UnidentifiedImageError
+
+import config
+
+VIDEO_TYPES = ("mp4", "mov", "webm", "mkv", "avi", "gif", "webp", "png")
+THUMB_SIZE = (64, 64)
+
+
+class VideoUnsupported(ValueError):
+    pass
+
+
+# ------------------------------------------------------
+# DECODING
+# ------------------------------------------------------
+class Frame:
+    """One decoded frame; the thumbnail and RGB image are made on demand.
+
+    Decoders may reuse buffers, so both are only valid until the next
+    frame is read.
+    """
+
+    __slots__ = ("t", "_small", "_image")
+
+    def __init__(self, t, small, image):
+        self.t = t
+        self._small = small
+        self._image = image
+
+    def small(self):
+        """64x64 grayscale float array for change detection"""
+        return self._small()
+
+    def image(self):
+        return self._image()
+
+
+def _pillow_frames(img):
+    t = 0.0
+    for frame in ImageSequence.Iterator(img):
+        yield Frame(
+            t,
+            lambda frame=frame: np.asarray(
+                frame.convert("L").resize(THUMB_SIZE, Image.Resampling.BOX), dtype=np.float32),
+            lambda frame=frame: frame.convert("RGB"),
+        )
+        t += frame.info.get("duration", 100) / 1000
+
+
+def _pyav_frames(data):
+    try:
+        import av
+    except ImportError:
+        raise VideoUnsupported("Decoding this video format needs PyAV (pip install av)") from None
+    try:
+        container = av.open(io.BytesIO(data))
+    except (OSError, ValueError) as e:
+        raise VideoUnsupported(f"Could not read this video: {e}") from None
+    with container:
+        if not container.streams.video:
+            raise VideoUnsupported("The file has no video stream")
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        for i, frame in enumerate(container.decode(stream)):
+            t = float(frame.time) if frame.time is not None else i / float(stream.average_rate or 25)
+            yield Frame(
+                t,
+                # swscale shrinks straight to gray, without a full-size RGB copy
+                lambda frame=frame: frame.reformat(
+                    width=THUMB_SIZE[0], height=THUMB_SIZE[1], format="gray"
+                ).to_ndarray().astype(np.float32),
+                lambda frame=frame: frame.to_image(),
+            )
+
+
+def iter_frames(data):
+    """Frame objects, in order, for an encoded clip"""
+    try:
+        img = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        return _pyav_frames(data)
+    return _pillow_frames(img)
+
+
+# ------------------------------------------------------
+# SAMPLING + SMOOTHING
+# ------------------------------------------------------
+class FrameSampler:
+    """Picks the frames worth classifying.
+
+    min_change is the mean absolute difference (0-255 gray levels)
+    between thumbnails below which a frame counts as a repeat.
+    """
+
+    def __init__(self, max_fps=5.0, min_change=3.0, max_gap_s=2.0):
+        self.min_interval = 1 / max_fps if max_fps else 0.0
+        self.min_change = min_change
+        self.max_gap_s = max_gap_s
+        self.skipped_rate = 0
+        self.skipped_similar = 0
+        self._last_t = None
+        self._last_small = None
+
+    def accept(self, frame):
+        if self._last_t is not None and frame.t - self._last_t < self.min_interval:
+            self.skipped_rate += 1
+            return False
+        small = frame.small()
+        if (self._last_small is not None and frame.t - self._last_t < self.max_gap_s
+                and np.abs(small - self._last_small).mean() < self.min_change):
+            self.skipped_similar += 1
+            return False
+        self._last_t = frame.t
+        self._last_small = small
+        return True
+
+
+class TemporalSmoother:
+    """Exponential moving average of per-frame probabilities plus a top-1 vote"""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.ema = None
+        self.votes = Counter()
+        self.frames = 0
+
+    def update(self, probs):
+        for row in np.atleast_2d(probs):
+            self.ema = row.copy() if self.ema is None else self.alpha * row + (1 - self.alpha) * self.ema
+            self.votes[int(row.argmax())] += 1
+            self.frames += 1
+
+    def call(self, label_map):
+        """(breed, EMA confidence %, majority breed, share of frames voting for it)"""
+        if self.ema is None:
+            return None
+        idx = int(self.ema.argmax())
+        majority, count = self.votes.most_common(1)[0]
+        return (label_map[idx].strip(), float(self.ema[idx] * 100),
+                label_map[majority].strip(), count / self.frames)
+
+
+class VideoResult:
+    __slots__ = ("breed", "confidence", "majority", "agreement", "timeline",
+                 "frames_decoded", "frames_classified", "skipped_rate", "skipped_similar", "elapsed_s")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @property
+    def stable(self):
+        """EMA and majority vote name the same breed"""
+        return self.breed is not None and self.breed == self.majority
+
+    @property
+    def fps(self):
+        """Frames of video processed per second of wall time"""
+        return self.frames_decoded / self.elapsed_s if self.elapsed_s else 0.0
+
+
+def classify_frames(frames, predict_fn, label_map, batch_size=8, sampler=None, smoother=None,
+                    max_frames=None):
+    """Sample, batch-classify and smooth a frame stream into a VideoResult.
+
+    predict_fn takes a list of PIL images and returns a (N, classes)
+    probability array.
+    """
+    sampler = sampler or FrameSampler()
+    smoother = smoother or TemporalSmoother()
+    start = time.perf_counter()
+    pending, timeline = [], []
+    decoded = classified = 0
+
+    def flush():
+        probs = np.asarray(predict_fn([img for _, img in pending]))
+        smoother.update(probs)
+        for (t, _), row in zip(pending, probs):
+            idx = int(row.argmax())
+            timeline.append((t, label_map[idx].strip(), float(row[idx] * 100)))
+        pending.clear()
+
+    for frame in frames:
+        decoded += 1
+        if not sampler.accept(frame):
+            continue
+        pending.append((frame.t, frame.image()))
+        classified += 1
+        if len(pending) >= batch_size:
+            flush()
+        if max_frames and classified >= max_frames:
+            break
+    if pending:
+        flush()
+
+    call = smoother.call(label_map) or (None, 0.0, None, 0.0)
+    breed, confidence, majority, agreement = call
+    return VideoResult(
+        breed=breed, confidence=confidence, majority=majority, agreement=agreement,
+        timeline=timeline, frames_decoded=decoded, frames_classified=classified,
+        skipped_rate=sampler.skipped_rate, skipped_similar=sampler.skipped_similar,
+        elapsed_s=time.perf_counter() - start,
+    )
+
+
+def classify_clip(data, predict_fn, label_map, batch_size=None, max_frames=None):
+    """classify_frames() for an encoded clip with the config.VIDEO_* settings"""
+    return classify_frames(
+        iter_frames(data),
+        predict_fn,
+        label_map,
+        batch_size=batch_size or config.VIDEO_BATCH_SIZE,
+        sampler=FrameSampler(config.VIDEO_MAX_FPS, config.VIDEO_MIN_CHANGE, config.VIDEO_MAX_GAP_S),
+        smoother=TemporalSmoother(config.VIDEO_EMA_ALPHA),
+        max_frames=max_frames or config.VIDEO_MAX_FRAMES,
+    )
+
+
+# ------------------------------------------------------
+# SYNTHETIC TEST CLIPS
+# ------------------------------------------------------
+def make_test_clip(path, seconds=6.0, fps=15, size=(320, 240), seed=0):
+    """Write an animated clip: a still opening, a moving blob, a still ending"""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    background = np.stack([x / w, y / h, (x + y) / (w + h)], axis=-1) * 180 + 40
+    frames = []
+    n = int(seconds * fps)
+    for i in range(n):
+        phase = i / n
+        frame = background.copy()
+        if 0.3 < phase < 0.7:
+            cx = w * (phase - 0.3) / 0.4
+            mask = (x - cx) ** 2 + (y - h / 2) ** 2 < (h / 4) ** 2
+            frame[mask] = (200, 120, 60)
+        frame += rng.normal(0, 2, frame.shape)
+        frames.append(Image.fromarray(np.clip(frame, 0, 255).astype(np.uint8)))
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=int(1000 / fps), loop=0)
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("clip", nargs="?")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--make-test-clip", metavar="PATH", help="write a synthetic clip and exit")
+    args = parser.parse_args(argv)
+
+    if args.make_test_clip:
+        n = make_test_clip(args.make_test_clip)
+        print(f"Wrote {args.make_test_clip} ({n} frames)")
+        return 0
+    if not args.clip:
+        parser.error("a clip is required")
+
+    import inference
+    from breed_data import load_labels
+
+    model = inference.load_compiled_model(args.model)
+    with open(args.clip, "rb") as f:
+        data = f.read()
+    result = classify_clip(
+        data,
+        lambda images: model.predict(inference.preprocess_images(images, model.input_dtype)),
+        load_labels(),
+    )
+    print(f"{result.breed} ({result.confidence:.1f}%), majority {result.majority} "
+          f"in {result.agreement:.0%} of frames{'' if result.stable else ' - UNSTABLE'}")
+    print(f"{result.frames_decoded} frames decoded, {result.frames_classified} classified, "
+          f"{result.skipped_rate} skipped by rate, {result.skipped_similar} as repeats; "
+          f"{result.fps:.1f} frames/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())